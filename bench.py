@@ -0,0 +1,261 @@
+"""
+Synthetic-load benchmark for the ranking pipeline.
+
+Generates AnswerSubmission sets of configurable size from the values in
+round2/answers.json, writes them to a temporary directory and times every phase
+of rank.py separately: load, validate, score, frame, render and CSV export.
+
+    python bench.py --submissions 100,1000 --questions 100 --refs 0,3 --output bench.json
+
+Comma separated options are swept as a grid. Results are written as JSON, so runs
+of different versions can be compared.
+
+With --pages the page retrievers of retrieval.py are timed too, on synthetic
+reports drawn from the words of questions.json: index build, then all questions
+as one batch.
+
+    python bench.py --submissions "" --pages 10000,50000 --dim 1024
+"""
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import click
+from rich.console import Console
+
+import rank
+import retrieval
+from main import DeterministicRNG
+
+KINDS = ["number", "name", "boolean", "names"]
+
+
+def synthetic_ground_truth(rand: DeterministicRNG, questions: int, kinds: List[str]) -> Dict[str, rank.CanonicData]:
+    """
+    Picks `questions` questions of the given kinds from answers.json. Questions are
+    repeated with a numbered suffix if more are requested than exist.
+    """
+    source = [(q, d) for q, d in rank.load_canonic_file().root.items() if d.kind in kinds and d.answers]
+    if not source:
+        raise click.BadParameter(f"answers.json has no ranked questions of kind {kinds}")
+
+    result = {}
+    for i in range(questions):
+        q, data = source[rand.random(len(source))] if i >= len(source) else source[i]
+        text = q if q not in result else f"{q} #{i}"
+        result[text] = data
+    return result
+
+
+def synthetic_answer(rand: DeterministicRNG, text: str, data: rank.CanonicData, values: Dict[str, list],
+                     all_refs: List[str], refs: int) -> dict:
+    # 60% right, otherwise a value another question of the same kind expects
+    if rand.random(100) < 60:
+        value = data.answers[0]
+    else:
+        value = rand.choice(values[data.kind])
+
+    if data.kind == "number" and value != "N/A" and rand.random(100) < 20:
+        try:
+            value = float(value) * (1 + rand.random(5) / 100)
+        except ValueError:
+            pass
+    elif data.kind == "names" and value != "N/A":
+        value = [v.strip() for v in value.split(",")]
+    elif data.kind == "boolean":
+        value = value == "True"
+
+    pool_refs = [r for pool in data.reference_pools for r in pool]
+    chosen = []
+    for _ in range(refs):
+        source = pool_refs if pool_refs and rand.random(100) < 70 else all_refs
+        chosen.append(rand.choice(source))
+
+    references = [{"pdf_sha1": r.split(":")[0], "page_index": int(r.split(":")[1])} for r in chosen]
+    return {"question_text": text, "kind": data.kind, "value": value, "references": references}
+
+
+def write_submissions(folder: Path, seed: int, submissions: int, schemas: Dict[str, rank.CanonicData],
+                      refs: int) -> List[Path]:
+    rand = DeterministicRNG(seed)
+
+    values = {k: [] for k in KINDS}
+    all_refs = []
+    for data in rank.load_canonic_file().root.values():
+        values[data.kind].extend(data.answers)
+        for pool in data.reference_pools:
+            all_refs.extend(pool)
+    values = {k: v or ["N/A"] for k, v in values.items()}
+    all_refs = all_refs or ["0000000000000000000000000000000000000000:0"]
+
+    files = []
+    for i in range(submissions):
+        answers = [synthetic_answer(rand, q, d, values, all_refs, refs) for q, d in schemas.items()]
+        # some submissions skip questions
+        answers = [a for a in answers if rand.random(100) >= 2]
+        obj = {
+            "answers": answers,
+            "team_email": f"team_{i % 50}@example.com",
+            "submission_name": f"synthetic {i}",
+            "signature": f"{i:08x}",
+            "time": f"2025-02-27, {13 + i % 10}:{i % 60:02d}:00",
+        }
+        file = folder / f"submission_{i:08x}.json"
+        file.write_text(json.dumps(obj))
+        files.append(file)
+    return files
+
+
+@contextmanager
+def timed(timings: Dict[str, float], phase: str):
+    start = time.perf_counter()
+    yield
+    timings[phase] = time.perf_counter() - start
+
+
+def run_case(folder: Path, engine: str, schemas: Dict[str, rank.CanonicData], files: List[Path]) -> Dict[str, float]:
+    timings = {}
+
+    with timed(timings, "load"):
+        texts = [(f.name, f.read_text()) for f in files]
+
+    with timed(timings, "validate"):
+        submissions = []
+        for name, text in texts:
+            v = rank.AnswerSubmission.model_validate_json(text)
+            v.file_name = name
+            submissions.append(v)
+
+    with timed(timings, "score"):
+        rankings = rank.ENGINES[engine](submissions, schemas)
+        rankings.sort(key=lambda x: x.score, reverse=True)
+
+    with timed(timings, "frame"):
+        frame = rank.ranking_frame(rankings)
+
+    with timed(timings, "render"):
+        console = Console(width=120, file=io.StringIO())
+        console.print(rank.ranking_table(frame, top=50))
+
+    with timed(timings, "export"):
+        rank.write_ranking_csv(frame, folder / "ranking.csv")
+
+    timings["total"] = sum(timings.values())
+    return timings
+
+
+def synthetic_reports(rand: DeterministicRNG, pages: int, vocab: List[str], words: int = 400,
+                      pages_per_report: int = 100) -> List[Tuple[str, List[str]]]:
+    draws = rand.randoms(len(vocab), pages * words).reshape(pages, words)
+    texts = [" ".join(vocab[i] for i in row) for row in draws.tolist()]
+    return [(f"{i:040x}", texts[start:start + pages_per_report])
+            for i, start in enumerate(range(0, pages, pages_per_report))]
+
+
+def run_retrieval_case(folder: Path, reports: List[Tuple[str, List[str]]], queries: List[str], dim: int,
+                       k: int) -> Dict[str, float]:
+    timings = {}
+
+    with timed(timings, "bm25 build"):
+        bm25 = retrieval.BM25Index.from_pages(reports)
+    with timed(timings, "bm25 query"):
+        bm25.search(queries, k)
+
+    with timed(timings, "dense append"):
+        dense = retrieval.DenseIndex(folder / "dense", dim)
+        dense.append(reports)
+    with timed(timings, "dense query"):
+        dense.search(queries, k)
+    return timings
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _version() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@click.command()
+@click.option("--submissions", default="100,1000", help="Submission counts to sweep")
+@click.option("--questions", default="100", help="Question counts to sweep")
+@click.option("--refs", default="3", help="References per answer to sweep")
+@click.option("--kinds", default=",".join(KINDS), help="Answer kinds to draw questions from")
+@click.option("--engine", default="matrix", type=click.Choice(list(rank.ENGINES)), help="Scoring engine")
+@click.option("--seed", default=42, help="Seed for the synthetic data")
+@click.option("--repeat", default=1, help="Runs per case, the fastest one is reported")
+@click.option("--pages", default="", help="Synthetic page counts to time the retrievers on (empty = skip)")
+@click.option("--dim", default=1024, help="Hash buckets of the dense retriever")
+@click.option("--output", default="bench.json", help="Where to write the results")
+def cli(submissions: str = "100,1000", questions: str = "100", refs: str = "3", kinds: str = ",".join(KINDS),
+        engine: str = "matrix", seed: int = 42, repeat: int = 1, pages: str = "", dim: int = 1024,
+        output: str = "bench.json"):
+    kinds = [k.strip() for k in kinds.split(",")]
+    results = []
+
+    for n_sub, n_q, n_refs in product(_ints(submissions), _ints(questions), _ints(refs)):
+        schemas = synthetic_ground_truth(DeterministicRNG(seed), n_q, kinds)
+        with tempfile.TemporaryDirectory() as tmp:
+            files = write_submissions(Path(tmp), seed, n_sub, schemas, n_refs)
+            runs = [run_case(Path(tmp), engine, schemas, files) for _ in range(repeat)]
+
+        timings = min(runs, key=lambda t: t["total"])
+        results.append({
+            "submissions": n_sub,
+            "questions": n_q,
+            "refs": n_refs,
+            "kinds": kinds,
+            "engine": engine,
+            "timings": timings,
+        })
+        print(f"{n_sub:>7} subs {n_q:>5} questions {n_refs:>3} refs: " +
+              " ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items()))
+
+    queries = [q["text"] for q in json.loads((rank.DIR / "questions.json").read_text())]
+    vocab = sorted({t for q in queries for t in retrieval.tokenize(q)})
+    retrievers = []
+    for n_pages in _ints(pages):
+        reports = synthetic_reports(DeterministicRNG(seed), n_pages, vocab)
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                runs.append(run_retrieval_case(Path(tmp), reports, queries, dim, k=5))
+
+        timings = {phase: min(r[phase] for r in runs) for phase in runs[0]}
+        throughput = {name: len(queries) / max(timings[f"{name} query"], 1e-9) for name in ("bm25", "dense")}
+        retrievers.append({
+            "pages": n_pages,
+            "queries": len(queries),
+            "dim": dim,
+            "timings": timings,
+            "queries_per_s": throughput,
+        })
+        print(f"{n_pages:>7} pages {len(queries):>5} queries: " +
+              " ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items()) + " " +
+              " ".join(f"{k}={v:.0f}q/s" for k, v in throughput.items()))
+
+    report = {
+        "version": _version(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+        "retrieval": retrievers,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,258 @@
+"""
+Enumerated question catalog for a subset.
+
+Every question the step2 generators can ask about a subset gets an index: each
+generator is a family of consecutive indices, split into one block per company
+(or currency, for the comparisons), and an index inside a block is decoded as
+a mixed-radix number over metrics and variations. Nothing is materialised, so
+the size of the space is exact even where it runs into billions.
+
+Draws pick a family through an alias table over the step2 generator weights
+and then a distinct index inside it, so no draw is ever rejected as a duplicate.
+
+    python catalog.py --subset subset.csv --count 0           # size of the space
+    python catalog.py --subset subset.csv --count 5000 --seed 42
+"""
+import json
+import sys
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+from typing import Callable, List, Tuple
+
+import click
+import numpy as np
+
+from main import (DeterministicRNG, SubsetIndex, Question, GENERATORS, QUESTION_BLOCKS, FINANCIAL_METRICS,
+                  INDUSTRY_METRICS, INDICATOR_COMPARE_COMPANIES, INDICATOR_COMPARE_QUESTION, INDICATOR_COMPARE_REFS,
+                  INDICATOR_COMPARE_METRICS, FIN_METRIC_QUESTIONS, MERGER_QUESTIONS, COMPENSATION_QUESTION,
+                  LEADERSHIP_QUESTIONS, LAYOFF_QUESTIONS, PRODUCT_LAUNCH_QUESTIONS, METADATA_BOOLEAN_FIELDS,
+                  INDUSTRY_METRIC_QUESTIONS, ask_indicator_compare, ask_fin_metric, ask_latest_merger_entity,
+                  ask_about_compensation, ask_about_leadership_changes, ask_layoffs, ask_about_product_launches,
+                  ask_metadata_boolean, ask_industry_metric)
+from profiling import profiler, profiled
+
+
+class Family:
+    """
+    The questions of one generator. Block b covers indices offsets[b]..offsets[b + 1]
+    and renders them with render(keys[b], local index).
+    """
+
+    def __init__(self, generator: Callable, weight: int, keys: list, counts: List[int],
+                 render: Callable[[object, int], Question]):
+        self.generator = generator
+        self.weight = weight
+        self.keys = keys
+        self.offsets = list(accumulate(counts, initial=0))
+        self.render = render
+
+    @property
+    def name(self) -> str:
+        return self.generator.__name__
+
+    @property
+    def size(self) -> int:
+        return self.offsets[-1]
+
+    def question(self, i: int) -> Question:
+        if not 0 <= i < self.size:
+            raise IndexError(f"{self.name} has {self.size} questions, not {i}")
+        block = bisect_right(self.offsets, i) - 1
+        return self.render(self.keys[block], i - self.offsets[block])
+
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(values))
+
+
+def _unrank_permutation(pool: list, k: int, rank: int) -> list:
+    # rank-th ordered pick of k items, as a mixed-radix number over n, n-1, ...
+    pool = list(pool)
+    picked = []
+    for base in range(len(pool), len(pool) - k, -1):
+        rank, digit = divmod(rank, base)
+        picked.append(pool.pop(digit))
+    return picked
+
+
+def _family(generator: Callable, subset: SubsetIndex, render: Callable[[object, int], Question]) -> Family:
+    # blocks and their sizes come from main.QUESTION_BLOCKS, the same numbers step2 checks against
+    keys, counts = QUESTION_BLOCKS[generator](subset)
+    return Family(generator, Counter(GENERATORS)[generator], keys, counts, render)
+
+
+def _company_family(generator: Callable, subset: SubsetIndex,
+                    variations: Callable[[object], List[Tuple[str, str]]]) -> Family:
+    # one index per (text, kind) variation of the block's company
+    def render(company, local: int) -> Question:
+        text, kind = variations(company)[local]
+        return Question(text=text, kind=kind)
+
+    return _family(generator, subset, render)
+
+
+def build_families(subset: SubsetIndex) -> List[Family]:
+    # comparisons: ordered pick of companies x ref x metric, one block per currency
+    groups = {cur: _unique(names) for cur, names in subset.currency_groups.items()}
+
+    def render_compare(cur, local: int) -> Question:
+        local, metric = divmod(local, len(INDICATOR_COMPARE_METRICS))
+        rank, ref = divmod(local, len(INDICATOR_COMPARE_REFS))
+        picked = _unrank_permutation(groups[cur], INDICATOR_COMPARE_COMPANIES, rank)
+        text = INDICATOR_COMPARE_QUESTION.format(
+            ref=INDICATOR_COMPARE_REFS[ref], metric=INDICATOR_COMPARE_METRICS[metric], cur=cur,
+            companies=", ".join(f'"{c}"' for c in picked))
+        return Question(text=text, kind="name")
+
+    def fin_metric(company):
+        metrics = _unique(m.format(cur=subset.currency(company)) for m in FINANCIAL_METRICS)
+        return [(q.format(metric=m, company=company), "number") for m in metrics for q in FIN_METRIC_QUESTIONS]
+
+    def industry_metric(company):
+        metrics = _unique(INDUSTRY_METRICS[subset.industry(company)])
+        return [(q.format(metric=m, company=company), "number") for m in metrics for q in INDUSTRY_METRIC_QUESTIONS]
+
+    def templates(table):
+        return lambda company: [(t.format(company=company), kind) for t, kind in table]
+
+    return [
+        _family(ask_indicator_compare, subset, render_compare),
+        _company_family(ask_latest_merger_entity, subset, templates(MERGER_QUESTIONS)),
+        _company_family(ask_industry_metric, subset, industry_metric),
+        _company_family(ask_fin_metric, subset, fin_metric),
+        _company_family(ask_about_compensation, subset,
+                        lambda c: [(COMPENSATION_QUESTION.format(company=c, currency=subset.currency(c)), "number")]),
+        _company_family(ask_about_leadership_changes, subset, templates(LEADERSHIP_QUESTIONS)),
+        _company_family(ask_about_product_launches, subset, templates(PRODUCT_LAUNCH_QUESTIONS)),
+        _company_family(ask_metadata_boolean, subset,
+                        lambda key: [(METADATA_BOOLEAN_FIELDS[key[0]].format(company=key[1]) +
+                                      " If there is no mention, return False.", "boolean")]),
+        _company_family(ask_layoffs, subset, lambda c: [(q.format(company=c), "number") for q in LAYOFF_QUESTIONS]),
+    ]
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table: one uniform column and one 32-bit coin per draw.
+    """
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.threshold = np.full(n, 2 ** 32, dtype=np.uint64)
+        self.alias = np.arange(n, dtype=np.int64)
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.threshold[s] = int(scaled[s] * 2 ** 32)
+            self.alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+
+    def sample(self, rng: DeterministicRNG, k: int) -> np.ndarray:
+        states = rng.states(2 * k)
+        # high bits for the column, the LCG's low bits are weak
+        columns = ((states[0::2] * np.uint64(len(self.alias))) >> np.uint64(32)).astype(np.int64)
+        return np.where(states[1::2] < self.threshold[columns], columns, self.alias[columns])
+
+
+def _randbelow(rng: DeterministicRNG, n: int) -> int:
+    if n <= 2 ** 32:
+        return rng.random(n)
+    return ((rng.random(2 ** 32) << 32) | rng.random(2 ** 32)) % n
+
+
+def _distinct(rng: DeterministicRNG, n: int, k: int) -> List[int]:
+    # Floyd's algorithm: k distinct indices below n in k draws
+    chosen = {}
+    for j in range(n - k, n):
+        t = _randbelow(rng, j + 1)
+        chosen[j if t in chosen else t] = None
+    return list(chosen)
+
+
+class QuestionCatalog:
+    def __init__(self, subset: SubsetIndex):
+        with profiler.phase("enumerate catalog"):
+            self.families = build_families(subset)
+            self.offsets = list(accumulate((f.size for f in self.families), initial=0))
+
+    @property
+    def size(self) -> int:
+        return self.offsets[-1]
+
+    def question(self, i: int) -> Question:
+        f = bisect_right(self.offsets, i) - 1
+        return self.families[f].question(i - self.offsets[f])
+
+    def sample(self, count: int, seed: int) -> List[int]:
+        """
+        `count` distinct catalog indices. Families are drawn by weight until they
+        run out, questions within a family uniformly.
+        """
+        if count > self.size:
+            raise ValueError(f"Requested {count} questions, the catalog has {self.size}")
+        rng = DeterministicRNG(seed)
+
+        slots = []
+        left = [f.size for f in self.families]
+        with profiler.phase("draw families"):
+            while len(slots) < count:
+                # exhausted families drop out, the rest keep their relative weights
+                active = [i for i, n in enumerate(left) if n]
+                table = AliasTable([self.families[i].weight for i in active])
+                for column in table.sample(rng, count - len(slots)).tolist():
+                    f = active[column]
+                    if left[f]:
+                        left[f] -= 1
+                        slots.append(f)
+
+        with profiler.phase("draw questions"):
+            drawn = Counter(slots)
+            picks = {f: iter(_distinct(rng, self.families[f].size, k)) for f, k in sorted(drawn.items())}
+            return [self.offsets[f] + next(picks[f]) for f in slots]
+
+    def coverage(self, indices: List[int]) -> str:
+        drawn = Counter(bisect_right(self.offsets, i) - 1 for i in indices)
+        lines = [f"{len(indices)} questions drawn from a catalog of {self.size}:"]
+        for f, family in enumerate(self.families):
+            share = drawn[f] / family.size * 100 if family.size else 0.0
+            lines.append(f"  {family.name:<32} {drawn[f]:>8} of {family.size:>12} ({share:.4g}%)")
+        return "\n".join(lines)
+
+
+@click.command()
+@click.option("--subset", default="subset.csv", help="Subset of files")
+@click.option("--count", default=10, help="Number of questions to draw, 0 only reports the catalog size")
+@click.option("--seed", default=42, help="Seed for random number generation")
+@click.option("--questions", default="questions.json", help="Output file")
+@click.option("--strict/--no-strict", default=True,
+              help="Fail if the catalog has fewer than --count questions, instead of drawing all of them")
+@profiled
+def cli(subset: str = "subset.csv", count: int = 10, seed: int = 42, questions: str = "questions.json",
+        strict: bool = True):
+    with profiler.phase("load subset"):
+        catalog = QuestionCatalog(SubsetIndex.from_csv(subset))
+
+    if count > catalog.size:
+        if strict:
+            raise click.ClickException(f"Requested {count} questions, but the catalog has {catalog.size}")
+        count = catalog.size
+
+    indices = catalog.sample(count, seed)
+    print(catalog.coverage(indices), file=sys.stderr)
+    if not count:
+        return
+
+    with profiler.phase("write questions"):
+        results = [catalog.question(i) for i in indices]
+        with open(questions, "w") as f:
+            json.dump([q.model_dump() for q in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    cli()
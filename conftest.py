@@ -0,0 +1,91 @@
+"""
+Shared fixtures. The tree ships no round2/dataset.json, so tests that need one
+get a synthetic dataset from a fixed seed. Tests that read PDFs get small ones
+written here instead of the megabyte reports in round*/pdfs.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import main
+
+try:
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+except ImportError:
+    PdfWriter = None
+
+CURRENCIES = ["USD", "EUR", "GBP", "AUD", "CAD"]
+
+
+def synthetic_dataset(reports: int, seed: int = 1) -> dict:
+    rand = main.DeterministicRNG(seed)
+    flags = [f for f in main.AnnualReportInfo.model_fields if f.startswith(("has_", "mentions_"))]
+    result = {}
+    for i in range(reports):
+        sha1 = hashlib.sha1(f"report {i}".encode()).hexdigest()
+        meta = {f: rand.random(3) == 0 for f in flags}
+        meta.update(company_name=f"Company {i} {'Inc.' if i % 2 else 'plc'}",
+                    major_industry=main.industries[rand.random(len(main.industries))],
+                    end_of_period={"year": 2020 + rand.random(4), "month": 1 + rand.random(12)})
+        currency = {CURRENCIES[rand.random(len(CURRENCIES))]: 1 + rand.random(50) for _ in range(rand.random(3))}
+        result[sha1] = {"letters": 1000 + rand.random(10 ** 6), "pages": 1 + rand.random(300), "sha1": sha1,
+                        "meta": meta, "currency": currency}
+    return result
+
+
+@pytest.fixture
+def dataset(monkeypatch, tmp_path) -> Path:
+    file = tmp_path / "dataset.json"
+    file.write_text(json.dumps(synthetic_dataset(200)))
+    monkeypatch.setattr(main, "DATASET", file)
+    monkeypatch.setattr(main, "DATASET_CACHE", tmp_path / "dataset.cache")
+    return file
+
+
+# page texts of the reports in the pdfs fixture
+REPORTS = [
+    ["Annual report 2022\nTotal revenue USD 1,200 million", "Net income USD 85 million\nEmployees 4,100"],
+    ["Group revenue EUR 310 million\nDividend EUR 0.40 per share", "", "Total assets EUR 2,050 million"],
+    ["Revenue GBP 75 million", "Layoffs 120 employees\nGBP 3 million restructuring"],
+]
+
+
+def write_pdf(path: Path, pages: List[str]) -> Path:
+    """
+    A PDF with one line of Helvetica text per line of each page.
+    """
+    if PdfWriter is None:
+        pytest.skip("needs pypdf")
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        content = DecodedStreamObject()
+        lines = " ".join(f"({line}) Tj T*" for line in text.splitlines())
+        content.set_data(f"BT /F1 10 Tf 14 TL 72 720 Td {lines} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+@pytest.fixture
+def pdfs(tmp_path) -> Path:
+    """
+    A folder with the REPORTS, each named <sha1>.pdf like round*/pdfs.
+    """
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    for pages in REPORTS:
+        file = write_pdf(folder / "report.pdf", pages)
+        file.rename(folder / f"{hashlib.sha1(file.read_bytes()).hexdigest()}.pdf")
+    return folder
@@ -0,0 +1,275 @@
+"""
+Finds the pages that can back a number answer.
+
+Every number on every page is normalized: thousand separators (",", "'", thin
+and non-breaking spaces) dropped, "(1,234)" read as -1234, "12.5%" also as
+0.125, "4.2 billion" also as 4.2e9. Pages that state a unit for their tables
+("in thousands", "$m", "€bn", ...) get their plain numbers scaled as well. The
+values go into one array sorted by (report, value), so looking up an answer is
+a binary search for the interval compare() accepts: within 1% of the answer,
+by magnitude, since losses are often asked for as positive numbers.
+
+    python evidence.py locate                     # number questions of answers.json
+    python evidence.py find 406100000 682de8e45fd9688f3452bc0e18257132a8f3cff6
+"""
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import click
+import numpy as np
+
+import rank
+from pages import PAGE_STORE, PageStore
+from profiling import profiler, profiled
+
+INDEX_FILE = rank.DIR / "retrieval/numbers.npz"
+
+NUMBER = re.compile(r"""
+    (?P<open>\(\s?)?
+    (?P<minus>[-−–]\s?)?
+    (?<![\d.,])
+    (?P<int>\d{1,3}(?:[,'’\u00a0\u202f]\d{3})+|\d+)
+    (?P<frac>\.\d+)?
+    (?![\d])
+    (?:\s?(?P<unit>%|per\s?cent\b|thousand\b|k\b|million\b|mn\b|m\b|billion\b|bn\b|trillion\b|tn\b))?
+    (?P<close>\s?\))?
+    (?:(?<=\))\s?(?P<unit_after>%|per\s?cent\b|thousand\b|k\b|million\b|mn\b|m\b|billion\b|bn\b|trillion\b|tn\b))?
+""", re.X | re.I)
+
+UNITS = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mn": 1e6, "m": 1e6, "billion": 1e9, "bn": 1e9,
+         "trillion": 1e12, "tn": 1e12}
+
+# table units stated somewhere on the page
+PAGE_SCALES = [
+    (re.compile(r"\bthousands\b|['’]000\b", re.I), 1e3),
+    (re.compile(r"\bmillions\b|[$€£]\s?m\b|\bUS\$\s?m\b", re.I), 1e6),
+    (re.compile(r"\bbillions\b|[$€£]\s?bn\b", re.I), 1e9),
+]
+_SEPARATORS = str.maketrans("", "", ",'’\u00a0\u202f")
+
+
+def page_numbers(text: str) -> Tuple[List[float], List[int]]:
+    """
+    Every reading of every number on the page, with the offset it starts at.
+    """
+    scales = [s for pattern, s in PAGE_SCALES if pattern.search(text)]
+    values, offsets = [], []
+    for m in NUMBER.finditer(text):
+        x = float(m["int"].translate(_SEPARATORS) + (m["frac"] or ""))
+        if m["minus"] or (m["open"] and m["close"]):
+            x = -x
+        unit = re.sub(r"\s", "", (m["unit"] or m["unit_after"] or "").lower())
+        readings = [x]
+        if unit in ("%", "percent"):
+            readings.append(x / 100)
+        elif unit in UNITS:
+            readings.append(x * UNITS[unit])
+        else:
+            readings.extend(x * s for s in scales)
+        values.extend(readings)
+        offsets.extend([m.start("int")] * len(readings))
+    return values, offsets
+
+
+def accepted(values: np.ndarray, answer: float) -> np.ndarray:
+    # compare() for the magnitudes, so a page number of -1234 backs an answer of 1234
+    a = abs(answer)
+    return np.abs(np.abs(values) - a) < 0.01 * a
+
+
+class NumberIndex:
+    def __init__(self, sha1s: List[str], bounds: np.ndarray, values: np.ndarray, pages: np.ndarray,
+                 offsets: np.ndarray, store: List[int]):
+        # values of sha1s[i] are values[bounds[i]:bounds[i + 1]], sorted
+        self.docs = {sha1: (int(bounds[i]), int(bounds[i + 1])) for i, sha1 in enumerate(sha1s)}
+        self.bounds = bounds
+        self.values = values
+        self.pages = pages
+        self.offsets = offsets
+        # PageStore.fingerprint() of the store the index was built from
+        self.store = store
+
+    @classmethod
+    @profiler.timed("build number index")
+    def build(cls, store: PageStore, sha1s: List[str]) -> "NumberIndex":
+        doc, values, pages, offsets = [], [], [], []
+        for i, sha1 in enumerate(sha1s):
+            for page, text in enumerate(store.document(sha1)):
+                vs, offs = page_numbers(text)
+                values.extend(vs)
+                offsets.extend(offs)
+                pages.extend([page] * len(vs))
+                doc.extend([i] * len(vs))
+
+        doc = np.array(doc, dtype=np.int32)
+        values = np.array(values, dtype=np.float64)
+        order = np.lexsort((values, doc))
+        bounds = np.zeros(len(sha1s) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc, minlength=len(sha1s)), out=bounds[1:])
+        return cls(sha1s, bounds, values[order], np.array(pages, dtype=np.int32)[order],
+                   np.array(offsets, dtype=np.int32)[order], store.fingerprint())
+
+    def save(self, file: Path):
+        file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(file, sha1s=np.array(list(self.docs)), bounds=self.bounds, values=self.values, pages=self.pages,
+                 offsets=self.offsets, store=np.array(self.store, dtype=np.int64))
+
+    @classmethod
+    def load(cls, file: Path) -> "NumberIndex":
+        with np.load(file) as data:
+            # indexes saved before the fingerprint was kept never match a store
+            store = data["store"].tolist() if "store" in data.files else []
+            return cls(data["sha1s"].tolist(), data["bounds"], data["values"], data["pages"], data["offsets"], store)
+
+    def find(self, sha1: str, answer: float) -> np.ndarray:
+        """
+        Positions in the index of the numbers of sha1 that compare() would accept for answer.
+        """
+        start, end = self.docs.get(sha1, (0, 0))
+        values = self.values[start:end]
+        # a slightly wider interval, then the exact test
+        lo, hi = 0.99 * abs(answer) * (1 - 1e-9), 1.01 * abs(answer) * (1 + 1e-9)
+        hits = []
+        for a, b in ((lo, hi), (-hi, -lo)):
+            hits.append(start + np.arange(np.searchsorted(values, a, side="left"),
+                                          np.searchsorted(values, b, side="right")))
+        hits = np.concatenate(hits)
+        return hits[accepted(self.values[hits], answer)]
+
+    def candidates(self, sha1s: List[str], answer: float) -> List[Tuple[str, int, int]]:
+        """
+        (sha1:page, hits, offset of the first hit) of every page with a matching
+        number, most hits first.
+        """
+        result = []
+        for sha1 in sha1s:
+            found = self.find(sha1, answer)
+            if not len(found):
+                continue
+            counts = Counter(self.pages[found].tolist())
+            first = {}
+            for page, offset in sorted(zip(self.pages[found].tolist(), self.offsets[found].tolist())):
+                first.setdefault(page, offset)
+            result.extend((f"{sha1}:{page}", n, first[page]) for page, n in counts.items())
+        return sorted(result, key=lambda c: (-c[1], c[0].partition(":")[0], int(c[0].partition(":")[2])))
+
+
+def best_candidates(index: NumberIndex, sha1s: List[str], answers: List[float]) -> List[Tuple[str, int, int]]:
+    """
+    candidates() for several accepted answers: a page keeps the hits of the answer it
+    backs best, whatever the order of the answers.
+    """
+    best = {}
+    for answer in answers:
+        for ref, hits, offset in index.candidates(sha1s, answer):
+            if hits > best.get(ref, (0, 0))[0]:
+                best[ref] = (hits, offset)
+    return sorted(((ref, hits, offset) for ref, (hits, offset) in best.items()),
+                  key=lambda c: (-c[1], c[0].partition(":")[0], int(c[0].partition(":")[2])))
+
+
+def load_or_build(store: PageStore, sha1s: List[str], file: Path, rebuild: bool = False) -> NumberIndex:
+    sha1s = [s for s in sha1s if store.pages(s)]
+    if file.exists() and not rebuild:
+        index = NumberIndex.load(file)
+        # a rebuilt store may hold other text for the same reports
+        if sorted(index.docs) == sorted(sha1s) and index.store == store.fingerprint():
+            return index
+    index = NumberIndex.build(store, sha1s)
+    index.save(file)
+    return index
+
+
+def context(store: PageStore, ref: str, offset: int, width: int = 60) -> str:
+    text = store[ref]
+    return " ".join(text[max(0, offset - width):offset + width].split())
+
+
+def _answer_value(answer: str) -> Optional[float]:
+    try:
+        return float(answer)
+    except ValueError:
+        return None
+
+
+_options = [
+    click.option("--subset", default=str(rank.DIR / "subset.json"), help="Reports to index"),
+    click.option("--store", default=str(PAGE_STORE), help="Page store folder"),
+    click.option("--index", default=str(INDEX_FILE), help="Where the number index is kept"),
+    click.option("--rebuild/--no-rebuild", default=False, help="Rebuild the index even if it covers the subset"),
+    click.option("--top", default=10, help="Candidate pages per answer"),
+]
+
+
+def evidence_options(fn):
+    for option in reversed(_options):
+        fn = option(fn)
+    return fn
+
+
+def _open(subset: str, store: str, index: str, rebuild: bool) -> Tuple[PageStore, NumberIndex]:
+    pages = PageStore(Path(store))
+    sha1s = [r["sha1"] for r in json.loads(Path(subset).read_text())]
+    return pages, load_or_build(pages, sha1s, Path(index), rebuild)
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@evidence_options
+@click.option("--output", default="number_evidence.json", help="Candidate pages per number question")
+@profiled
+def locate(subset: str, store: str, index: str, rebuild: bool = False, top: int = 10,
+           output: str = "number_evidence.json"):
+    """Candidate pages for the number answers of answers.json"""
+    from router import CompanyRouter
+
+    pages, numbers = _open(subset, store, index, rebuild)
+    router = CompanyRouter.from_subset(Path(subset))
+
+    result = []
+    pooled = found = 0
+    with profiler.phase("locate numbers"):
+        for text, data in rank.load_canonic_file().root.items():
+            values = [v for v in map(_answer_value, data.answers) if v is not None]
+            if data.kind != "number" or not values:
+                continue
+            sha1s = [s for s in router.route(text) if s in numbers.docs] or list(numbers.docs)
+            cands = best_candidates(numbers, sha1s, values)
+            pool_refs = {ref for pool in data.reference_pools for ref in pool}
+            pooled += bool(pool_refs)
+            found += bool(pool_refs & {ref for ref, _, _ in cands})
+            result.append({
+                "question_text": text,
+                "answers": data.answers,
+                "sha1s": sha1s,
+                "candidates": [{"ref": ref, "hits": hits, "context": context(pages, ref, offset)}
+                               for ref, hits, offset in cands[:top]],
+                "reference_pools": data.reference_pools,
+            })
+
+    Path(output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"{len(result)} number questions, {sum(bool(r['candidates']) for r in result)} with candidate pages, "
+          f"{found} of {pooled} with pools have a pooled page among them. Written to {output}")
+
+
+@cli.command()
+@click.argument("value", type=float)
+@click.argument("sha1s", nargs=-1)
+@evidence_options
+def find(value: float, sha1s: Tuple[str, ...], subset: str, store: str, index: str, rebuild: bool = False,
+         top: int = 10):
+    """Pages with a number within 1% of VALUE"""
+    pages, numbers = _open(subset, store, index, rebuild)
+    for ref, hits, offset in numbers.candidates(list(sha1s) or list(numbers.docs), value)[:top]:
+        print(f"{ref}  {hits} hits  ...{context(pages, ref, offset)}...")
+
+
+if __name__ == "__main__":
+    cli()
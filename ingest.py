@@ -0,0 +1,190 @@
+"""
+Builds round2/dataset.json from the PDFs in round*/pdfs.
+
+Every new PDF is text-extracted and measured across a process pool: pages,
+letters (characters of extracted text) and currency mentions. PDFs are hashed
+first and reports whose sha1 is already in dataset.json are skipped, so
+re-running after adding a few PDFs only extracts the new ones. The PDFs here are
+named <sha1>.pdf, which is trusted unless --verify is given.
+
+`meta` (AnnualReportInfo) is not something the PDF text gives directly. It is
+kept from the existing entry or taken from --meta: a dict of sha1 -> meta, or a
+list of records with sha1 and the AnnualReportInfo fields. Entries without meta
+are written anyway and skipped by load_dataset until their meta is filled in.
+
+    python ingest.py --meta extracted_meta.json
+
+Needs pypdf (pip install pypdf).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import click
+
+from main import DATASET, AnnualReportInfo
+from profiling import profiler, profiled
+from scanner import scan_pages
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# font and encoding warnings for every other page of a report
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+PDF_DIRS = sorted(Path(__file__).parent.glob("round*/pdfs"))
+
+SHA1_NAME = re.compile(r"^[0-9a-f]{40}$")
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def extract_pages(path: Path) -> List[str]:
+    """
+    Text of every page, in order. A page without a text layer is an empty string.
+    """
+    reader = PdfReader(path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _ingest_pdf(path: Path, sha1: str) -> Tuple[Optional[dict], Optional[str]]:
+    # runs in a worker process
+    try:
+        pages = extract_pages(path)
+    except Exception as e:  # pypdf raises a wide range of errors on broken files
+        return None, f"{type(e).__name__}: {e}"
+
+    return {
+        "letters": sum(len(text) for text in pages),
+        "pages": len(pages),
+        "currency": scan_pages(pages).currency,
+        "sha1": sha1,
+    }, None
+
+
+def pdf_files(dirs: List[Path]) -> List[Path]:
+    return sorted(f for d in dirs for f in d.glob("*.pdf"))
+
+
+def unknown_pdfs(files: List[Path], known: Set[str], verify: bool = False,
+                 workers: int = 0) -> List[Tuple[Path, str]]:
+    """
+    (file, sha1) of the PDFs whose sha1 is not known yet, first file of each sha1.
+    Files are hashed only when --verify is given or they are not named <sha1>.pdf,
+    and always before any text is extracted.
+    """
+    trusted = {f: f.stem for f in files if not verify and SHA1_NAME.match(f.stem)}
+    hash_todo = [f for f in files if f not in trusted]
+    with profiler.phase("hash pdfs"), ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        hashed = dict(zip(hash_todo, pool.map(file_sha1, hash_todo)))
+
+    result, seen = [], set(known)
+    for f in files:
+        sha1 = trusted.get(f) or hashed[f]
+        if sha1 not in seen:
+            seen.add(sha1)
+            result.append((f, sha1))
+    return result
+
+
+def load_meta(file: Optional[str]) -> Dict[str, dict]:
+    if file is None:
+        return {}
+    obj = json.loads(Path(file).read_text())
+    records = obj.items() if isinstance(obj, dict) else [(r["sha1"], r) for r in obj]
+
+    result = {}
+    for sha1, record in records:
+        # records may carry sha1/cur next to the meta fields
+        meta = {k: v for k, v in record.items() if k in AnnualReportInfo.model_fields}
+        try:
+            AnnualReportInfo.model_validate(meta)
+        except ValueError as e:
+            raise click.BadParameter(f"meta of {sha1}: {e}", param_hint="--meta")
+        result[sha1] = meta
+    return result
+
+
+def ingest(files: List[Path], dataset: Dict[str, dict], meta: Dict[str, dict], workers: int = 0,
+           verify: bool = False) -> Tuple[List[str], List[Tuple[Path, str]]]:
+    """
+    Adds the PDFs that are not in `dataset` yet, in place. Returns the new sha1s
+    and the files that failed.
+    """
+    known = {v["sha1"] for v in dataset.values() if "sha1" in v}
+    todo = unknown_pdfs(files, known, verify, workers)
+    paths, sha1s = [f for f, _ in todo], [sha1 for _, sha1 in todo]
+
+    added, failed = [], []
+    workers = workers or os.cpu_count() or 1
+    with profiler.phase("extract pdfs"):
+        if workers == 1 or len(todo) <= 1:
+            results = map(_ingest_pdf, paths, sha1s)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(todo)))
+            results = pool.map(_ingest_pdf, paths, sha1s)
+        try:
+            for f, (entry, error) in zip(paths, results):
+                if error is not None:
+                    failed.append((f, error))
+                    continue
+                dataset[entry["sha1"]] = entry
+                added.append(entry["sha1"])
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    for sha1, m in meta.items():
+        if sha1 in dataset:
+            dataset[sha1]["meta"] = m
+    return added, failed
+
+
+@click.command()
+@click.option("--pdfs", "dirs", multiple=True, type=click.Path(exists=True, file_okay=False),
+              help="Folders with PDFs (default: round*/pdfs)")
+@click.option("--dataset", default=str(DATASET), help="dataset.json to update")
+@click.option("--meta", default=None, help="JSON with AnnualReportInfo per sha1")
+@click.option("--workers", default=0, help="Worker processes (0 = all cores, 1 = in process)")
+@click.option("--verify/--no-verify", default=False, help="Hash every PDF instead of trusting <sha1>.pdf names")
+@profiled
+def cli(dirs: Tuple[str, ...] = (), dataset: str = str(DATASET), meta: Optional[str] = None, workers: int = 0,
+        verify: bool = False):
+    if PdfReader is None:
+        raise click.ClickException("PDF ingestion needs pypdf: pip install pypdf")
+
+    path = Path(dataset)
+    entries = json.loads(path.read_text()) if path.exists() else {}
+    files = pdf_files([Path(d) for d in dirs] if dirs else PDF_DIRS)
+
+    added, failed = ingest(files, entries, load_meta(meta), workers, verify)
+    for f, error in failed:
+        print(f"Skipping {f.name}: {error}", file=sys.stderr)
+
+    with profiler.phase("write dataset"):
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(entries, indent=2))
+        tmp.replace(path)
+
+    missing = sum(1 for v in entries.values() if "meta" not in v)
+    print(f"{len(added)} new reports, {len(files) - len(added) - len(failed)} known, {len(failed)} failed. "
+          f"{len(entries)} in {path}, {missing} without meta")
+
+
+if __name__ == "__main__":
+    cli()
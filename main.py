@@ -7,16 +7,28 @@ the company name extracted from that PDF.
 
 STEP2: Given the subset of files, it will generate a set of questions to ask about the companies
 """
+import functools
+import gzip
+import hashlib
+import io
 import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from random import randint
 import click
+import numpy as np
 import pandas as pd
 
-from typing import Literal, Dict, List, Optional, Union
+from typing import Literal, Dict, List, Optional, Tuple, Union
 
 from pydantic import BaseModel, RootModel, Field
 
+from profiling import profiler, profiled
+
 industries = [
     "Technology", "Financial Services", "Healthcare", "Automotive",
     "Retail", "Energy and Utilities", "Hospitality", "Telecommunications",
@@ -97,14 +109,16 @@ class SubsetFile(RootModel):
 
 
 class DeterministicRNG:
+    # LCG parameters
+    A, C, M = 1664525, 1013904223, 2 ** 32
+
     def __init__(self, seed: int):
         if seed == 0:
             seed = randint(1, 2 ** 32)
         self.state = seed
 
     def random(self, n: int) -> int:
-        # LCG parameters
-        a, c, m = 1664525, 1013904223, 2 ** 32
+        a, c, m = self.A, self.C, self.M
 
         # Update state
         self.state = (a * self.state + c) % m
@@ -112,6 +126,56 @@ class DeterministicRNG:
         # Return a number between 0 and n
         return self.state % n
 
+    @classmethod
+    def _affine(cls, steps: int) -> Tuple[int, int]:
+        """
+        (a, c) such that `steps` updates equal one update state -> (a * state + c) % m.
+        Squares the affine map, so it takes O(log steps).
+        """
+        a, c = 1, 0
+        step_a, step_c = cls.A, cls.C
+        while steps:
+            if steps & 1:
+                a, c = (a * step_a) % cls.M, (c * step_a + step_c) % cls.M
+            step_a, step_c = (step_a * step_a) % cls.M, (step_c * step_a + step_c) % cls.M
+            steps >>= 1
+        return a, c
+
+    def jump(self, steps: int):
+        """
+        Advances the state as if random() had been called `steps` times.
+        """
+        if steps < 0:
+            raise ValueError("Cannot jump backwards")
+        if steps:
+            a, c = self._affine(steps)
+            self.state = (a * self.state + c) % self.M
+
+    def states(self, k: int) -> np.ndarray:
+        """
+        The next k states as uint64, in one vectorized pass, and advances past them.
+        """
+        out = np.empty(k, dtype=np.uint64)
+        if k == 0:
+            return out
+        mask = np.uint64(self.M - 1)
+        out[0] = (self.A * self.state + self.C) % self.M
+        # out[i + filled] = a(filled) * out[i] + c(filled); products wrap mod 2^64, which keeps them right mod 2^32
+        filled = 1
+        while filled < k:
+            a, c = self._affine(filled)
+            n = min(filled, k - filled)
+            out[filled:filled + n] = (out[:n] * np.uint64(a) + np.uint64(c)) & mask
+            filled += n
+        self.state = int(out[-1])
+        return out
+
+    def randoms(self, n: int, k: int) -> np.ndarray:
+        """
+        Same values as k calls of random(n).
+        """
+        return self.states(k) % np.uint64(n)
+
     def choice(self, seq: List) -> str:
         if len(seq) == 0:
             raise ValueError("Cannot choose from an empty sequence")
@@ -135,32 +199,152 @@ def cli():
     pass
 
 
-def load_dataset() -> dict[str, ReportEntry]:
-    dataset = Path(__file__).parent / "round2/dataset.json"
+DATASET = Path(__file__).parent / "round2/dataset.json"
+DATASET_CACHE = Path(__file__).parent / "round2/dataset.cache"
+
+# AnnualReportInfo flags, stored as boolean columns in the cache
+FLAGS = [name for name, field in AnnualReportInfo.model_fields.items() if field.annotation is bool]
 
-    obj = json.loads(dataset.read_text())
 
+def _validate_dataset(obj: dict) -> dict[str, ReportEntry]:
     result = {}
 
-    for k, v in obj.items():
-        if "sha1" not in v:
-            continue
-        if "meta" not in v:
-            continue
-        result[k] = ReportEntry.model_validate(v)
+    with profiler.phase("validate dataset"):
+        for k, v in obj.items():
+            if "sha1" not in v:
+                continue
+            if "meta" not in v:
+                continue
+            result[k] = ReportEntry.model_validate(v)
+
+    return result
 
+
+def _str_dtype(values: List[str]) -> str:
+    return f"U{max([len(v) for v in values] + [1])}"
+
+
+def compile_dataset_cache(source: bytes, digest: str, cache: Path = DATASET_CACHE) -> dict[str, ReportEntry]:
+    """
+    Validates dataset.json once and stores it as memory-mappable NumPy columns:
+    one structured array with a row per report, plus the currency histograms as
+    flat (code, count) arrays with per-report offsets.
+    """
+    with profiler.phase("load dataset"):
+        obj = json.loads(source)
+    entries = _validate_dataset(obj)
+
+    with profiler.phase("compile dataset cache"):
+        keys = list(entries)
+        rows = list(entries.values())
+        dtype = [
+            ("key", _str_dtype(keys)),
+            ("sha1", _str_dtype([r.sha1 for r in rows])),
+            ("letters", "i8"),
+            ("pages", "i8"),
+            ("year", "i4"),
+            ("month", "i4"),
+            ("company_name", _str_dtype([r.meta.company_name for r in rows])),
+            ("major_industry", _str_dtype([r.meta.major_industry for r in rows])),
+        ] + [(flag, "?") for flag in FLAGS]
+
+        reports = np.array([
+            (k, r.sha1, r.letters, r.pages, r.meta.end_of_period.year, r.meta.end_of_period.month,
+             r.meta.company_name, r.meta.major_industry, *[getattr(r.meta, f) for f in FLAGS])
+            for k, r in zip(keys, rows)
+        ], dtype=dtype)
+
+        codes = [c for r in rows for c in r.currency]
+        counts = np.array([n for r in rows for n in r.currency.values()], dtype=np.int64)
+        offsets = np.cumsum([0] + [len(r.currency) for r in rows], dtype=np.int64)
+
+        cache.mkdir(parents=True, exist_ok=True)
+        # the old marker goes first: arrays are rewritten in place, and an interrupted
+        # build must not be picked up even if dataset.json goes back to the old content
+        (cache / "source.sha1").unlink(missing_ok=True)
+        np.save(cache / "reports.npy", reports)
+        np.save(cache / "currency_codes.npy", np.array(codes, dtype=_str_dtype(codes)))
+        np.save(cache / "currency_counts.npy", counts)
+        np.save(cache / "currency_offsets.npy", offsets)
+        (cache / "source.sha1").write_text(digest)
+
+    return entries
+
+
+def read_dataset_cache(cache: Path = DATASET_CACHE) -> dict[str, ReportEntry]:
+    with profiler.phase("read dataset cache"):
+        reports = np.load(cache / "reports.npy", mmap_mode="r")
+        codes = np.load(cache / "currency_codes.npy", mmap_mode="r").tolist()
+        counts = np.load(cache / "currency_counts.npy", mmap_mode="r").tolist()
+        offsets = np.load(cache / "currency_offsets.npy", mmap_mode="r").tolist()
+        columns = {name: reports[name].tolist() for name in reports.dtype.names}
+
+    result = {}
+    with profiler.phase("build dataset entries"):
+        # the cache only holds validated entries, so skip validation
+        for i, key in enumerate(columns["key"]):
+            meta = AnnualReportInfo.model_construct(
+                end_of_period=EndOfPeriod.model_construct(year=columns["year"][i], month=columns["month"][i]),
+                company_name=columns["company_name"][i],
+                major_industry=columns["major_industry"][i],
+                **{flag: columns[flag][i] for flag in FLAGS},
+            )
+            start, end = offsets[i], offsets[i + 1]
+            result[key] = ReportEntry.model_construct(
+                letters=columns["letters"][i],
+                pages=columns["pages"][i],
+                meta=meta,
+                currency=dict(zip(codes[start:end], counts[start:end])),
+                sha1=columns["sha1"][i],
+            )
     return result
 
 
+def load_dataset() -> dict[str, ReportEntry]:
+    """
+    Reads the report dataset from its columnar cache, rebuilding the cache
+    whenever the sha1 of dataset.json changes.
+    """
+    with profiler.phase("load dataset"):
+        source = DATASET.read_bytes()
+        digest = hashlib.sha1(source).hexdigest()
+
+    marker = DATASET_CACHE / "source.sha1"
+    if marker.exists() and marker.read_text() == digest:
+        return read_dataset_cache(DATASET_CACHE)
+    return compile_dataset_cache(source, digest, DATASET_CACHE)
+
+
+@cli.command()
+def compile_dataset():
+    """Rebuild the columnar cache of round2/dataset.json"""
+    source = DATASET.read_bytes()
+    entries = compile_dataset_cache(source, hashlib.sha1(source).hexdigest(), DATASET_CACHE)
+    print(f"Cached {len(entries)} reports in {DATASET_CACHE}")
+
+
 @cli.command()
 @click.option("--count", default=10, help="Number of files to sample")
 @click.option("--seed", default=42, help="Seed for random number generation")
 @click.option("--subset", default="subset", help="Output file")
+@profiled
 def step1(count: int = 10, seed: int = 42, subset: str = "subset"):
-    rand = DeterministicRNG(seed)
     dataset = load_dataset()
+    records = sample_subset(list(dataset.values()), count, seed, echo=True)
+
+    with profiler.phase("write subset"):
+        pd.DataFrame(records).to_csv(subset + ".csv", index=False)
+        json.dump(records, open(subset + ".json", "w"), indent=2)
+
+
+def sample_subset(reports: List[ReportEntry], count: int, seed: int, echo: bool = False) -> List[dict]:
+    """
+    The subset records step1 writes for a seed. `reports` are the dataset values in file order.
+    """
+    rand = DeterministicRNG(seed)
 
-    files = rand.sample(list(dataset.values()), count)
+    with profiler.phase("sample reports"):
+        files = rand.sample(reports, count)
 
     # sort by hash
     files.sort(key=lambda x: x.sha1)
@@ -168,7 +352,8 @@ def step1(count: int = 10, seed: int = 42, subset: str = "subset"):
     records = []
 
     for i, row in enumerate(files):
-        print(f"# {row.sha1} {row.meta.company_name}")
+        if echo:
+            print(f"# {row.sha1} {row.meta.company_name}")
         # flatten into a dict
 
         meta = row.meta.model_dump()
@@ -182,422 +367,725 @@ def step1(count: int = 10, seed: int = 42, subset: str = "subset"):
                 **meta  # all the other fields
             )
         )
+    return records
+
+
+# A list of common financial KPIs that can be verified from an annual report
+FINANCIAL_METRICS = [
+    "Total revenue (in {cur})",
+    "Operating income (in {cur})",
+    "Net income (in {cur})",
+    "Gross margin (%)",
+    "Operating margin (%)",
+    "EPS (earnings per share) (in {cur})",
+    "EBITDA (in {cur})",
+    "Capital expenditures (in {cur})",
+    "Cash flow from operations (in {cur})",
+    "Long-term debt (in {cur})",
+    "Shareholders' equity (in {cur})",
+    "Dividend per share (in {cur})",
+]
 
+INDUSTRY_METRICS = {
+    "Technology": [
+        "Number of patents at year-end",
+        "Total capitalized R&D expenditure",
+        "Total expensed R&D expenditure",
+        "End-of-year tech staff headcount",
+        "End-of-year total headcount",
+        "Annual recurring revenue (ARR)",
+        "Total intangible assets (IP valuation)",
+        "Number of active software licenses",
+        "Data center capacity (MW)",
+        "Data center capacity (sq. ft.)",
+        "Cloud storage capacity (TB)",
+        "End-of-period market capitalization",
+        "Year-end customer base",
+        "Year-end user base"
+    ],
+    "Financial Services": [
+        "Total assets on balance sheet at year-end",
+        "Total deposits at year-end",
+        "Loans outstanding at year-end",
+        "Assets under management (AUM)",
+        "Non-performing loan ratio (NPL) at year-end",
+        "Tier 1 capital ratio at year-end",
+        "Number of customer accounts at year-end",
+        "Branch count at year-end",
+        "End-of-year net interest margin (NIM)",
+        "Return on equity (ROE) at year-end"
+    ],
+    "Healthcare": [
+        "Number of hospital beds at year-end",
+        "Number of owned clinics at year-end",
+        "Number of managed clinics at year-end",
+        "Active patient count (registered patients)",
+        "Value of medical equipment (balance sheet)",
+        "End-of-year bed occupancy rate",
+        "Number of healthcare professionals on staff",
+        "Number of laboratories at year-end",
+        "Number of diagnostic centers at year-end",
+        "Healthcare plan memberships (if applicable)",
+        "Outstanding insurance claims (if applicable)",
+        "R&D pipeline (number of therapies in phases)"
+    ],
+    "Automotive": [
+        "Vehicle production capacity (units/year)",
+        "Inventory of finished vehicles at year-end",
+        "Global dealership network size",
+        "Number of electric models available",
+        "Number of hybrid models available",
+        "Battery production capacity (if applicable)",
+        "End-of-year automotive patent portfolio",
+        "End-of-period market share (by units sold)",
+        "Number of EV charging stations in network",
+        "Year-end fleet average CO₂ emissions",
+        "R&D workforce headcount"
+    ],
+    "Retail": [
+        "Number of stores at year-end",
+        "Total store floor area (sqm)",
+        "Total store floor area (sq. ft.)",
+        "Value of inventory on hand at year-end",
+        "Number of distribution centers at year-end",
+        "Number of fulfillment centers at year-end",
+        "Loyalty program membership at year-end",
+        "Online active customer accounts",
+        "E-commerce active customer accounts",
+        "Year-end store employee headcount",
+        "Private label SKUs in portfolio",
+        "Number of new store openings (cumulative in year)",
+        "Online order fulfillment capacity (daily)"
+    ],
+    "Energy and Utilities": [
+        "Total power generation capacity (MW)",
+        "Number of power plants at year-end",
+        "Number of facilities at year-end",
+        "Percentage of renewable energy capacity",
+        "Transmission network length",
+        "Distribution network length",
+        "Total number of customers connected",
+        "Proven oil reserves (if applicable)",
+        "Proven gas reserves (if applicable)",
+        "Refinery throughput capacity",
+        "Pipeline network length",
+        "Greenhouse gas emissions intensity (CO₂/MWh)",
+        "Year-end weighted average cost of energy production"
+    ],
+    "Hospitality": [
+        "Number of properties at year-end",
+        "Number of hotels at year-end",
+        "Total number of rooms available",
+        "Year-end occupancy rate",
+        "Average daily rate (ADR) at final period",
+        "Revenue per available room (RevPAR) at final period",
+        "Loyalty program membership at year-end",
+        "Number of restaurants",
+        "Number of bars",
+        "Conference/banquet space capacity (sq. ft.)",
+        "Franchise agreements in force",
+        "Hospitality workforce headcount"
+    ],
+    "Telecommunications": [
+        "Mobile subscriber base at year-end",
+        "Broadband subscriber base at year-end",
+        "Mobile coverage area (population %)",
+        "Mobile coverage area (geography %)",
+        "Number of broadband subscribers",
+        "Number of fiber subscribers",
+        "Fiber network length (km)",
+        "Fiber network length (miles)",
+        "Average revenue per user (ARPU) at year-end",
+        "5G coverage ratio (population %)",
+        "Data center capacity (MW)",
+        "Data center capacity (racks)",
+        "Number of retail stores",
+        "Number of service stores",
+        "Network downtime (hours) in final reporting period"
+    ],
+    "Media & Entertainment": [
+        "Number of streaming platform subscribers",
+        "Number of online platform subscribers",
+        "Broadcast coverage area (population reach)",
+        "Advertising inventory at year-end",
+        "Number of active licensing deals",
+        "Size of film/TV content library (hours)",
+        "Size of film/TV content library (titles)",
+        "Social media follower count (all platforms)",
+        "Year-end box office market share (if applicable)",
+        "Number of production facilities",
+        "In-house production capacity (titles/year)",
+        "Headcount for creative roles",
+        "Headcount for production roles"
+    ],
+    "Pharmaceuticals": [
+        "Number of drugs on the market (approved)",
+        "Number of compounds in Phase I",
+        "Number of compounds in Phase II",
+        "Number of compounds in Phase III",
+        "Manufacturing capacity (units/year)",
+        "Manufacturing capacity (liters/year)",
+        "Global distribution network (markets served)",
+        "Number of active pharmaceutical patents",
+        "Clinical trial sites operating at year-end",
+        "Inventory of active pharmaceutical ingredients",
+        "Size of sales force (year-end)",
+        "Pharmacovigilance reports (adverse events logged)",
+        "Branded product count",
+        "Generic product count"
+    ],
+    "Aerospace & Defense": [
+        "Order backlog (value) at year-end",
+        "Order backlog (units) at year-end",
+        "Production capacity (aircraft/year)",
+        "Production capacity (units/year)",
+        "Number of defense contracts active",
+        "Number of government contracts active",
+        "R&D spending on advanced programs",
+        "Number of employees with security clearance",
+        "Military products in service (units)",
+        "Defense products in service (units)",
+        "Satellite capacity in orbit",
+        "Spacecraft capacity in orbit",
+        "Facilities footprint (sq. ft.)",
+        "Facilities footprint (number of sites)",
+        "Year-end patent portfolio (aerospace tech)",
+        "Partnerships with government agencies at year-end"
+    ],
+    "Transport & Logistics": [
+        "Fleet size (vehicles) at year-end",
+        "Fleet size (aircraft) at year-end",
+        "Fleet size (vessels) at year-end",
+        "Warehouse capacity (sq. ft.)",
+        "Warehouse capacity (cubic ft.)",
+        "Number of distribution hubs",
+        "Global route coverage (countries served)",
+        "Global route coverage (regions served)",
+        "Final-period on-time delivery rate",
+        "Freight volume capacity (TEU)",
+        "Freight volume capacity (tons)",
+        "Fuel consumption rate (liters/year)",
+        "Fuel consumption rate (per mile)",
+        "CO₂ emissions from operations (ton/year)",
+        "Year-end logistics staff headcount",
+        "Infrastructure investments completed in the period"
+    ],
+    "Food & Beverage": [
+        "Production capacity (e.g., bottling liters/hour)",
+        "Number of manufacturing plants",
+        "Number of warehouses in distribution network",
+        "Number of depots in distribution network",
+        "SKU count in portfolio",
+        "Raw material supply contracts",
+        "Inventory of raw materials at year-end",
+        "Number of company-owned outlets",
+        "Number of franchised outlets",
+        "Year-end market share (by product category)",
+        "Food safety certifications (sites certified)",
+        "Brand portfolio size (distinct brands at year-end)"
+    ]
+}
 
-    pd.DataFrame(records).to_csv(subset + ".csv", index=False)
-    json.dump(records, open(subset + ".json", "w"), indent=2)
 
+class SubsetIndex:
+    """
+    Everything the question generators look up in subset.csv, computed once.
+    Lists keep the row order of the file, so draws match the DataFrame version.
+    """
 
-def ask_indicator_compare(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
-    # only companies that have financial metric
-    grouped = df[df['has_financial_performance_indicators']].groupby('cur').filter(lambda x: len(x) >= 3)
-    # currency for them
-    cur = rand.choice(list(grouped['cur'].unique()))
-    # and pick 3 companies with that currency
-    companies = rand.sample(list(grouped[grouped['cur'] == cur]['company_name']), 5)
+    def __init__(self, df: pd.DataFrame):
+        # every row, in file order
+        self.companies: List[str] = list(df['company_name'])
+        # first row of each company
+        self.rows: Dict[str, dict] = {}
+        for row in df.to_dict('records'):
+            self.rows.setdefault(row['company_name'], row)
+        # companies with a flag set, per flag
+        self.eligible: Dict[str, List[str]] = {
+            flag: list(df[df[flag] == True]['company_name']) for flag in FLAGS if flag in df.columns
+        }
+        # companies with financial metrics, per currency shared by at least 3 of them; groups
+        # smaller than INDICATOR_COMPARE_COMPANIES are still drawn, so the draws stay the same
+        grouped = df[df['has_financial_performance_indicators']].groupby('cur').filter(lambda x: len(x) >= 3)
+        self.currency_groups: Dict[str, List[str]] = {
+            cur: list(grouped[grouped['cur'] == cur]['company_name']) for cur in grouped['cur'].unique()
+        }
+
+    @classmethod
+    def from_csv(cls, subset: str) -> "SubsetIndex":
+        return cls(pd.read_csv(subset))
+
+    def currency(self, company: str):
+        return self.rows[company]['cur']
+
+    def industry(self, company: str) -> str:
+        return self.rows[company]['major_industry']
+
+
+INDICATOR_COMPARE_QUESTION = "Which of the companies had the {ref} {metric} in {cur} at the end of the period listed in annual report: {companies}? If data for the company is not available, exclude it from the comparison. If only one company is left, return this company."
+INDICATOR_COMPARE_REFS = ["highest", "lowest"]
+INDICATOR_COMPARE_METRICS = ["total revenue", "net income", "total assets"]
+INDICATOR_COMPARE_COMPANIES = 5
+
+
+def ask_indicator_compare(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    if not subset.currency_groups:
+        return None
+    # only companies that have financial metric, currency for them
+    cur = rand.choice(list(subset.currency_groups))
+    if len(subset.currency_groups[cur]) < INDICATOR_COMPARE_COMPANIES:
+        return None
+    # and pick companies with that currency
+    companies = rand.sample(subset.currency_groups[cur], INDICATOR_COMPARE_COMPANIES)
     company_list = ", ".join(f'"{c}"' for c in companies)
 
     # generate questions
-    ref = rand.choice(["highest", "lowest"])
-    metric = rand.choice(["total revenue", "net income", "total assets"])
-    question = f"Which of the companies had the {ref} {metric} in {cur} at the end of the period listed in annual report: {company_list}? If data for the company is not available, exclude it from the comparison. If only one company is left, return this company."
+    ref = rand.choice(INDICATOR_COMPARE_REFS)
+    metric = rand.choice(INDICATOR_COMPARE_METRICS)
+    question = INDICATOR_COMPARE_QUESTION.format(ref=ref, metric=metric, cur=cur, companies=company_list)
 
     return Question(text=question, kind="name")
 
 
-def ask_fin_metric(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+FIN_METRIC_QUESTIONS = [
+    "What was the {metric} for {company} according to the annual report (within the last period or at the end of the last period)? If data is not available, return 'N/A'.",
+    "According to the annual report, what is the {metric} for {company}  (within the last period or at the end of the last period)? If data is not available, return 'N/A'.",
+]
+
+
+def ask_fin_metric(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
     """
     Generate a question asking for a common financial KPI from the annual report.
     Returns a Question object with the schema set to "number".
     """
 
-    company = rand.choice(list(df['company_name']))
-    cur = df[df['company_name'] == company]['cur'].iloc[0]
-
-    # A list of common financial KPIs that can be verified from an annual report
-    financial_metrics = [
-        f"Total revenue (in {cur})",
-        f"Operating income (in {cur})",
-        f"Net income (in {cur})",
-        f"Gross margin (%)",
-        f"Operating margin (%)",
-        f"EPS (earnings per share) (in {cur})",
-        f"EBITDA (in {cur})",
-        f"Capital expenditures (in {cur})",
-        f"Cash flow from operations (in {cur})",
-        f"Long-term debt (in {cur})",
-        f"Shareholders' equity (in {cur})",
-        f"Dividend per share (in {cur})",
-    ]
+    company = rand.choice(subset.companies)
+    cur = subset.currency(company)
 
-    metric = rand.choice(financial_metrics)
+    metric = rand.choice([m.format(cur=cur) for m in FINANCIAL_METRICS])
 
-    question_variations = [
-        f"What was the {metric} for {company} according to the annual report (within the last period or at the end of the last period)? If data is not available, return 'N/A'.",
-        f"According to the annual report, what is the {metric} for {company}  (within the last period or at the end of the last period)? If data is not available, return 'N/A'.",
-    ]
+    question_variations = [q.format(metric=metric, company=company) for q in FIN_METRIC_QUESTIONS]
 
     question = rand.choice(question_variations)
 
     return Question(text=question, kind="number")
 
 
-def ask_latest_merger_entity(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+# (template, kind) pairs the company generators choose from
+MERGER_QUESTIONS = [
+    ("What was the latest merger or acquisition that {company} was involved in? Return name of the entity or 'N/A'", "name"),
+    # boolean
+    ("Did {company} mention any mergers or acquisitions in the annual report? If there is no mention, return False.", "boolean"),
+]
+
+
+def ask_latest_merger_entity(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    eligible = subset.eligible['mentions_recent_mergers_and_acquisitions']
+    if len(eligible) == 0:
+        return None
+
     # pick one company with mentions_recent_mergers_and_acquisitions
-    company = rand.choice(list(df[df['mentions_recent_mergers_and_acquisitions']]['company_name']))
-
-    questions = [
-        Question(
-            text=f"What was the latest merger or acquisition that {company} was involved in? Return name of the entity or 'N/A'",
-            kind="name"),
-        # boolean
-        Question(text=f"Did {company} mention any mergers or acquisitions in the annual report? If there is no mention, return False.", kind="boolean"),
-    ]
+    company = rand.choice(eligible)
+
+    questions = [Question(text=t.format(company=company), kind=kind) for t, kind in MERGER_QUESTIONS]
 
     return rand.choice(questions)
 
 
-def ask_about_compensation(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+COMPENSATION_QUESTION = "What was the largest single spending of {company} on executive compensation in {currency}? If data is not available in this currency, return 'N/A'."
+
+
+def ask_about_compensation(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    eligible = subset.eligible['has_executive_compensation']
+    if len(eligible) == 0:
+        return None
+
     # pick one company with has_executive_compensation
-    company = rand.choice(list(df[df['has_executive_compensation']]['company_name']))
-    currency = df[df['company_name'] == company]['cur'].iloc[0]
-    question = f"What was the largest single spending of {company} on executive compensation in {currency}? If data is not available in this currency, return 'N/A'."
+    company = rand.choice(eligible)
+    currency = subset.currency(company)
+    question = COMPENSATION_QUESTION.format(company=company, currency=currency)
     return Question(text=question, kind="number")
 
 
-def ask_about_leadership_changes(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+LEADERSHIP_QUESTIONS = [
+    ("What are the names of all executives removed from their positions in {company}?", "names"),
+    ("What are the names of all new executives that took on new leadership positions in {company}?", "names"),
+    ("Which leadership positions changed at {company} in the reporting period? If data is not available, return 'N/A'. Give me the title of the position.", "names"),
+    # boolean
+    ("Did {company} announce any changes to its executive team in the annual report? If there is no mention, return False.", "boolean"),
+]
+
+
+def ask_about_leadership_changes(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    eligible = subset.eligible['has_leadership_changes']
+    if len(eligible) == 0:
+        return None
+
     # pick company with changes
-    company = rand.choice(list(df[df['has_leadership_changes']]['company_name']))
-
-    questions = [
-        Question(text=f"What are the names of all executives removed from their positions in {company}?", kind="names"),
-        Question(text=f"What are the names of all new executives that took on new leadership positions in {company}?",
-                 kind="names"),
-        Question(
-            text=f"Which leadership positions changed at {company} in the reporting period? If data is not available, return 'N/A'. Give me the title of the position.",
-            kind="names"),
-        # boolean
-        Question(text=f"Did {company} announce any changes to its executive team in the annual report? If there is no mention, return False.",
-                 kind="boolean"),
+    company = rand.choice(eligible)
 
-    ]
+    questions = [Question(text=t.format(company=company), kind=kind) for t, kind in LEADERSHIP_QUESTIONS]
 
     return rand.choice(questions)
 
 
-def ask_layoffs(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+LAYOFF_QUESTIONS = [
+    "How many employees were laid off by {company} during the period covered by the annual report? If data is not available, return 'N/A'.",
+    "What is the total number of employees let go by {company} according to the annual report? If data is not available, return 'N/A'.",
+]
+
+
+def ask_layoffs(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
     """
     Asks about layoffs if 'has_layoffs' is True.
     """
-    eligible = df[df['has_layoffs'] == True]['company_name']
+    eligible = subset.eligible['has_layoffs']
     if len(eligible) == 0:
         return None
 
-    company = rand.choice(list(eligible))
-    question_variations = [
-        f"How many employees were laid off by {company} during the period covered by the annual report? If data is not available, return 'N/A'.",
-        f"What is the total number of employees let go by {company} according to the annual report? If data is not available, return 'N/A'."
-    ]
+    company = rand.choice(eligible)
+    question_variations = [q.format(company=company) for q in LAYOFF_QUESTIONS]
     question = rand.choice(question_variations)
     return Question(text=question, kind="number")
 
 
 # product launches
-def ask_about_product_launches(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
+PRODUCT_LAUNCH_QUESTIONS = [
+    ("What are the names of new products launched by {company} as mentioned in the annual report?", "names"),
+    ("What is the name of the last product launched by {company} as mentioned in the annual report?", "name"),
+    # boolean
+    ("Did {company} announce any new product launches in the annual report? If there is no mention, return False.", "boolean"),
+]
+
+
+def ask_about_product_launches(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    eligible = subset.eligible['has_new_product_launches']
+    if len(eligible) == 0:
+        return None
+
     # pick company with changes
-    company = rand.choice(list(df[df['has_new_product_launches']]['company_name']))
-
-    questions = [
-        Question(text=f"What are the names of new products launched by {company} as mentioned in the annual report?",
-                 kind="names"),
-        Question(text=f"What is the name of the last product launched by {company} as mentioned in the annual report?",
-                 kind="name"),
-        # boolean
-        Question(text=f"Did {company} announce any new product launches in the annual report? If there is no mention, return False.", kind="boolean"),
-    ]
+    company = rand.choice(eligible)
+
+    questions = [Question(text=t.format(company=company), kind=kind) for t, kind in PRODUCT_LAUNCH_QUESTIONS]
 
     return rand.choice(questions)
 
 
-def ask_metadata_boolean(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
-    question_templates = {
-        "has_regulatory_or_litigation_issues": "Did {company} mention any ongoing litigation or regulatory inquiries?",
-        "has_capital_structure_changes": "Did {company} report any changes to its capital structure?",
-        "has_share_buyback_plans": "Did {company} announce a share buyback plan in the annual report?",
-        "has_dividend_policy_changes": "Did {company} announce any changes to its dividend policy in the annual report?",
-        "has_strategic_restructuring": "Did {company} detail any restructuring plans in the latest filing?",
-        "has_supply_chain_disruptions": "Did {company} report any supply chain disruptions in the annual report?",
-        "has_esg_initiatives": "Did {company} outline any new ESG initiatives in the annual report?",
-    }
+METADATA_BOOLEAN_FIELDS = {
+    "has_regulatory_or_litigation_issues": "Did {company} mention any ongoing litigation or regulatory inquiries?",
+    "has_capital_structure_changes": "Did {company} report any changes to its capital structure?",
+    "has_share_buyback_plans": "Did {company} announce a share buyback plan in the annual report?",
+    "has_dividend_policy_changes": "Did {company} announce any changes to its dividend policy in the annual report?",
+    "has_strategic_restructuring": "Did {company} detail any restructuring plans in the latest filing?",
+    "has_supply_chain_disruptions": "Did {company} report any supply chain disruptions in the annual report?",
+    "has_esg_initiatives": "Did {company} outline any new ESG initiatives in the annual report?",
+}
+
 
-    field, template = rand.choice(list(question_templates.items()))
+def ask_metadata_boolean(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    field, template = rand.choice(list(METADATA_BOOLEAN_FIELDS.items()))
 
     # pick all companies with this field
-    eligible = df[df[field] == True]['company_name']
+    eligible = subset.eligible[field]
     if len(eligible) == 0:
         return None
 
-    company = rand.choice(list(eligible))
+    company = rand.choice(eligible)
     question_text = template.format(company=company) + " If there is no mention, return False."
     return Question(text=question_text, kind="boolean")
 
 
-def ask_industry_metric(rand: DeterministicRNG, df: pd.DataFrame) -> Optional[Question]:
-    company = rand.choice(df['company_name'])
-    industry = df[df['company_name'] == company]['major_industry'].iloc[0]
-
-    industry_metrics = {
-        "Technology": [
-            "Number of patents at year-end",
-            "Total capitalized R&D expenditure",
-            "Total expensed R&D expenditure",
-            "End-of-year tech staff headcount",
-            "End-of-year total headcount",
-            "Annual recurring revenue (ARR)",
-            "Total intangible assets (IP valuation)",
-            "Number of active software licenses",
-            "Data center capacity (MW)",
-            "Data center capacity (sq. ft.)",
-            "Cloud storage capacity (TB)",
-            "End-of-period market capitalization",
-            "Year-end customer base",
-            "Year-end user base"
-        ],
-        "Financial Services": [
-            "Total assets on balance sheet at year-end",
-            "Total deposits at year-end",
-            "Loans outstanding at year-end",
-            "Assets under management (AUM)",
-            "Non-performing loan ratio (NPL) at year-end",
-            "Tier 1 capital ratio at year-end",
-            "Number of customer accounts at year-end",
-            "Branch count at year-end",
-            "End-of-year net interest margin (NIM)",
-            "Return on equity (ROE) at year-end"
-        ],
-        "Healthcare": [
-            "Number of hospital beds at year-end",
-            "Number of owned clinics at year-end",
-            "Number of managed clinics at year-end",
-            "Active patient count (registered patients)",
-            "Value of medical equipment (balance sheet)",
-            "End-of-year bed occupancy rate",
-            "Number of healthcare professionals on staff",
-            "Number of laboratories at year-end",
-            "Number of diagnostic centers at year-end",
-            "Healthcare plan memberships (if applicable)",
-            "Outstanding insurance claims (if applicable)",
-            "R&D pipeline (number of therapies in phases)"
-        ],
-        "Automotive": [
-            "Vehicle production capacity (units/year)",
-            "Inventory of finished vehicles at year-end",
-            "Global dealership network size",
-            "Number of electric models available",
-            "Number of hybrid models available",
-            "Battery production capacity (if applicable)",
-            "End-of-year automotive patent portfolio",
-            "End-of-period market share (by units sold)",
-            "Number of EV charging stations in network",
-            "Year-end fleet average CO₂ emissions",
-            "R&D workforce headcount"
-        ],
-        "Retail": [
-            "Number of stores at year-end",
-            "Total store floor area (sqm)",
-            "Total store floor area (sq. ft.)",
-            "Value of inventory on hand at year-end",
-            "Number of distribution centers at year-end",
-            "Number of fulfillment centers at year-end",
-            "Loyalty program membership at year-end",
-            "Online active customer accounts",
-            "E-commerce active customer accounts",
-            "Year-end store employee headcount",
-            "Private label SKUs in portfolio",
-            "Number of new store openings (cumulative in year)",
-            "Online order fulfillment capacity (daily)"
-        ],
-        "Energy and Utilities": [
-            "Total power generation capacity (MW)",
-            "Number of power plants at year-end",
-            "Number of facilities at year-end",
-            "Percentage of renewable energy capacity",
-            "Transmission network length",
-            "Distribution network length",
-            "Total number of customers connected",
-            "Proven oil reserves (if applicable)",
-            "Proven gas reserves (if applicable)",
-            "Refinery throughput capacity",
-            "Pipeline network length",
-            "Greenhouse gas emissions intensity (CO₂/MWh)",
-            "Year-end weighted average cost of energy production"
-        ],
-        "Hospitality": [
-            "Number of properties at year-end",
-            "Number of hotels at year-end",
-            "Total number of rooms available",
-            "Year-end occupancy rate",
-            "Average daily rate (ADR) at final period",
-            "Revenue per available room (RevPAR) at final period",
-            "Loyalty program membership at year-end",
-            "Number of restaurants",
-            "Number of bars",
-            "Conference/banquet space capacity (sq. ft.)",
-            "Franchise agreements in force",
-            "Hospitality workforce headcount"
-        ],
-        "Telecommunications": [
-            "Mobile subscriber base at year-end",
-            "Broadband subscriber base at year-end",
-            "Mobile coverage area (population %)",
-            "Mobile coverage area (geography %)",
-            "Number of broadband subscribers",
-            "Number of fiber subscribers",
-            "Fiber network length (km)",
-            "Fiber network length (miles)",
-            "Average revenue per user (ARPU) at year-end",
-            "5G coverage ratio (population %)",
-            "Data center capacity (MW)",
-            "Data center capacity (racks)",
-            "Number of retail stores",
-            "Number of service stores",
-            "Network downtime (hours) in final reporting period"
-        ],
-        "Media & Entertainment": [
-            "Number of streaming platform subscribers",
-            "Number of online platform subscribers",
-            "Broadcast coverage area (population reach)",
-            "Advertising inventory at year-end",
-            "Number of active licensing deals",
-            "Size of film/TV content library (hours)",
-            "Size of film/TV content library (titles)",
-            "Social media follower count (all platforms)",
-            "Year-end box office market share (if applicable)",
-            "Number of production facilities",
-            "In-house production capacity (titles/year)",
-            "Headcount for creative roles",
-            "Headcount for production roles"
-        ],
-        "Pharmaceuticals": [
-            "Number of drugs on the market (approved)",
-            "Number of compounds in Phase I",
-            "Number of compounds in Phase II",
-            "Number of compounds in Phase III",
-            "Manufacturing capacity (units/year)",
-            "Manufacturing capacity (liters/year)",
-            "Global distribution network (markets served)",
-            "Number of active pharmaceutical patents",
-            "Clinical trial sites operating at year-end",
-            "Inventory of active pharmaceutical ingredients",
-            "Size of sales force (year-end)",
-            "Pharmacovigilance reports (adverse events logged)",
-            "Branded product count",
-            "Generic product count"
-        ],
-        "Aerospace & Defense": [
-            "Order backlog (value) at year-end",
-            "Order backlog (units) at year-end",
-            "Production capacity (aircraft/year)",
-            "Production capacity (units/year)",
-            "Number of defense contracts active",
-            "Number of government contracts active",
-            "R&D spending on advanced programs",
-            "Number of employees with security clearance",
-            "Military products in service (units)",
-            "Defense products in service (units)",
-            "Satellite capacity in orbit",
-            "Spacecraft capacity in orbit",
-            "Facilities footprint (sq. ft.)",
-            "Facilities footprint (number of sites)",
-            "Year-end patent portfolio (aerospace tech)",
-            "Partnerships with government agencies at year-end"
-        ],
-        "Transport & Logistics": [
-            "Fleet size (vehicles) at year-end",
-            "Fleet size (aircraft) at year-end",
-            "Fleet size (vessels) at year-end",
-            "Warehouse capacity (sq. ft.)",
-            "Warehouse capacity (cubic ft.)",
-            "Number of distribution hubs",
-            "Global route coverage (countries served)",
-            "Global route coverage (regions served)",
-            "Final-period on-time delivery rate",
-            "Freight volume capacity (TEU)",
-            "Freight volume capacity (tons)",
-            "Fuel consumption rate (liters/year)",
-            "Fuel consumption rate (per mile)",
-            "CO₂ emissions from operations (ton/year)",
-            "Year-end logistics staff headcount",
-            "Infrastructure investments completed in the period"
-        ],
-        "Food & Beverage": [
-            "Production capacity (e.g., bottling liters/hour)",
-            "Number of manufacturing plants",
-            "Number of warehouses in distribution network",
-            "Number of depots in distribution network",
-            "SKU count in portfolio",
-            "Raw material supply contracts",
-            "Inventory of raw materials at year-end",
-            "Number of company-owned outlets",
-            "Number of franchised outlets",
-            "Year-end market share (by product category)",
-            "Food safety certifications (sites certified)",
-            "Brand portfolio size (distinct brands at year-end)"
-        ]
-    }
-
-    metric = rand.choice(industry_metrics[industry])
-
-    question_variatons = [
-        f"What was the value of {metric} of {company} at the end of the period listed in annual report? If data is not available, return 'N/A'.",
-        f"For {company}, what was the value of {metric} at the end of the period listed in annual report? If data is not available, return 'N/A'."]
+INDUSTRY_METRIC_QUESTIONS = [
+    "What was the value of {metric} of {company} at the end of the period listed in annual report? If data is not available, return 'N/A'.",
+    "For {company}, what was the value of {metric} at the end of the period listed in annual report? If data is not available, return 'N/A'.",
+]
+
+
+def ask_industry_metric(rand: DeterministicRNG, subset: SubsetIndex) -> Optional[Question]:
+    company = rand.choice(subset.companies)
+    industry = subset.industry(company)
+
+    metric = rand.choice(INDUSTRY_METRICS[industry])
+
+    question_variatons = [q.format(metric=metric, company=company) for q in INDUSTRY_METRIC_QUESTIONS]
 
     question = rand.choice(question_variatons)
 
     return Question(text=question, kind="number")
 
 
+# step2 picks one uniformly per draw, repeats act as weights
+GENERATORS = [
+    ask_indicator_compare,
+    ask_latest_merger_entity,
+    ask_industry_metric,
+    ask_industry_metric,  # twice for more cases
+    ask_industry_metric,
+    ask_fin_metric,
+    ask_fin_metric,
+    ask_about_compensation,
+    ask_about_leadership_changes,
+    ask_about_product_launches,
+    ask_metadata_boolean,
+    ask_layoffs,
+]
+
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(values))
+
+
+def _indicator_compare_blocks(subset: SubsetIndex) -> Tuple[list, List[int]]:
+    groups = {cur: _unique(names) for cur, names in subset.currency_groups.items()}
+    # ordered pick of the compared companies x ref x metric
+    per_pick = len(INDICATOR_COMPARE_REFS) * len(INDICATOR_COMPARE_METRICS)
+    return list(groups), [math.perm(len(names), INDICATOR_COMPARE_COMPANIES) * per_pick for names in groups.values()]
+
+
+def _eligible_blocks(flag: str, per_company: int):
+    def blocks(subset: SubsetIndex) -> Tuple[list, List[int]]:
+        companies = _unique(subset.eligible[flag])
+        return companies, [per_company] * len(companies)
+    return blocks
+
+
+def _fin_metric_count(subset: SubsetIndex, company: str) -> int:
+    return len(_unique(m.format(cur=subset.currency(company)) for m in FINANCIAL_METRICS)) * len(FIN_METRIC_QUESTIONS)
+
+
+def _industry_metric_count(subset: SubsetIndex, company: str) -> int:
+    return len(_unique(INDUSTRY_METRICS[subset.industry(company)])) * len(INDUSTRY_METRIC_QUESTIONS)
+
+
+def _metadata_boolean_blocks(subset: SubsetIndex) -> Tuple[list, List[int]]:
+    keys = [(field, c) for field in METADATA_BOOLEAN_FIELDS for c in _unique(subset.eligible[field])]
+    return keys, [1] * len(keys)
+
+
+# Distinct questions each generator can produce for a subset, as (keys, counts): one
+# block per company, or per currency for the comparisons. catalog.py enumerates
+# these blocks, so the two can't disagree on the size of the space.
+QUESTION_BLOCKS = {
+    ask_indicator_compare: _indicator_compare_blocks,
+    ask_latest_merger_entity: _eligible_blocks('mentions_recent_mergers_and_acquisitions', len(MERGER_QUESTIONS)),
+    ask_industry_metric: lambda subset: (list(subset.rows),
+                                         [_industry_metric_count(subset, c) for c in subset.rows]),
+    ask_fin_metric: lambda subset: (list(subset.rows), [_fin_metric_count(subset, c) for c in subset.rows]),
+    ask_about_compensation: _eligible_blocks('has_executive_compensation', 1),
+    ask_about_leadership_changes: _eligible_blocks('has_leadership_changes', len(LEADERSHIP_QUESTIONS)),
+    ask_about_product_launches: _eligible_blocks('has_new_product_launches', len(PRODUCT_LAUNCH_QUESTIONS)),
+    ask_metadata_boolean: _metadata_boolean_blocks,
+    ask_layoffs: _eligible_blocks('has_layoffs', len(LAYOFF_QUESTIONS)),
+}
+
+
+def question_capacity(generator, subset: SubsetIndex) -> int:
+    """
+    Upper bound of distinct questions the generator can produce for a subset. It counts
+    combinations; the LCG reaches far fewer of them, the comparisons especially, so
+    generate_questions still stops on stalls.
+    """
+    return sum(QUESTION_BLOCKS[generator](subset)[1])
+
+
+class QuestionShortfall(click.ClickException):
+    """
+    Strict step2 couldn't generate --count distinct questions; carries the ones it did.
+    """
+
+    def __init__(self, message: str, questions: List[Question]):
+        super().__init__(message)
+        self.questions = questions
+
+
 @cli.command()
 @click.option("--count", default=10, help="Number of questions to generate")
 @click.option("--seed", default=42, help="Seed for random number generation")
 @click.option("--subset", default="subset.csv", help="Subset of files")
 @click.option("--questions", default="questions.json", help="Output file")
-def step2(count: int = 10, seed: int = 42, subset: str = "subset.csv", questions: str = "questions.json"):
+@click.option("--strict/--no-strict", default=True,
+              help="Fail if the subset can't produce --count distinct questions, instead of generating all it can")
+@click.option("--max-stall", default=100_000, help="Give up after this many draws in a row without a new question")
+@profiled
+def step2(count: int = 10, seed: int = 42, subset: str = "subset.csv", questions: str = "questions.json",
+          strict: bool = True, max_stall: int = 100_000):
+    with profiler.phase("load subset"):
+        index = SubsetIndex.from_csv(subset)
+
+    def write(results: List[Question]):
+        with profiler.phase("write questions"):
+            with open(questions, "w") as f:
+                json.dump([q.model_dump() for q in results], f, indent=2)
+
+    try:
+        results = generate_questions(index, count, seed, strict, max_stall, echo=True)
+    except QuestionShortfall as e:
+        # keep what was generated, the exit status still reports the failure
+        write(e.questions)
+        e.message += f"\nWrote the {len(e.questions)} generated questions to {questions}"
+        raise
+    write(results)
+
+
+def generate_questions(index: SubsetIndex, count: int, seed: int, strict: bool = True, max_stall: int = 100_000,
+                       echo: bool = False) -> List[Question]:
+    """
+    The questions step2 generates for a seed. Stops after `max_stall` draws in a row
+    without a new question, or early once the rate of new questions projects more than
+    10 * `max_stall` draws for the rest. Raises QuestionShortfall in strict mode when
+    it stops short of `count`.
+    """
     rng = DeterministicRNG(seed)
 
-    df = pd.read_csv(subset)
+    capacity = {g: question_capacity(g, index) for g in dict.fromkeys(GENERATORS)}
+    produced = {g: 0 for g in capacity}
+    total = sum(capacity.values())
+
+    def report() -> str:
+        lines = [f"  {g.__name__:<32} {produced[g]:>8} of at most {capacity[g]:>12}" for g in capacity]
+        return "\n".join([f"{len(results)} questions, the subset has at most {total} combinations "
+                          f"(a loose bound, the generator reaches fewer):"] + lines)
 
     results = []
+    target = min(count, total)
 
-    while len(results) < count:
-
-        generators = [
-            ask_indicator_compare,
-            ask_latest_merger_entity,
-            ask_industry_metric,
-            ask_industry_metric,  # twice for more cases
-            ask_industry_metric,
-            ask_fin_metric,
-            ask_fin_metric,
-            ask_about_compensation,
-            ask_about_leadership_changes,
-            ask_about_product_launches,
-            ask_metadata_boolean,
-            ask_layoffs,
-        ]
+    seen = set()
+    stall = 0
+    # new questions are counted per window of draws to project the draws still needed
+    window = max(1, max_stall // 10)
+    draws = 0
+    window_start = 0
+    stopped = None
 
+    while len(results) < target:
         try:
-            question = rng.choice(generators)(rng, df)
-            if question and question.text not in [q.text for q in results]:
-                print(question.text)
+            # over all generators even if some have nothing to ask, so the draws don't depend on the subset
+            generator = rng.choice(GENERATORS)
+            with profiler.phase(f"generate {generator.__name__}"):
+                question = generator(rng, index)
+            if question and question.text not in seen:
+                if echo:
+                    print(question.text)
+                seen.add(question.text)
                 results.append(question)
+                produced[generator] += 1
+                stall = 0
+            else:
+                stall += 1
         except Exception as e:
             raise
             print(e)
             continue
 
-    with open(questions, "w") as f:
-        json.dump([q.model_dump() for q in results], f, indent=2)
+        draws += 1
+        if stall >= max_stall:
+            stopped = f"No new question in {max_stall} draws"
+            break
+        if draws % window == 0:
+            new = len(results) - window_start
+            window_start = len(results)
+            if new and (target - len(results)) * window / new > 10 * max_stall:
+                stopped = (f"At {new} new questions in the last {window} draws, the other "
+                           f"{target - len(results)} would take about {(target - len(results)) * window // new} draws")
+                break
+
+    if len(results) < count:
+        if strict:
+            reason = stopped or f"Requested {count} questions"
+            raise QuestionShortfall(f"{reason}, {report()}", results)
+        if echo and stopped:
+            print(f"Stopped. {stopped}", file=sys.stderr)
+
+    if echo and (len(results) < count or not strict):
+        print(report(), file=sys.stderr)
+
+    return results
+
+
+# dataset values, shared with forked pipeline workers
+_REPORTS: Optional[List[ReportEntry]] = None
+
+
+def _init_pipeline_worker():
+    global _REPORTS
+    if _REPORTS is None:
+        _REPORTS = list(load_dataset().values())
+
+
+def build_instance(seed: int, files: int, count: int, strict: bool, max_stall: int) -> dict:
+    """
+    step1 and step2 for one seed, without touching the disk.
+    """
+    records = sample_subset(_REPORTS, files, seed)
+    # go through the same CSV text step2 reads, so types (NaN currencies, parsed numbers) match
+    frame = pd.read_csv(io.StringIO(pd.DataFrame(records).to_csv(index=False)))
+    try:
+        questions = generate_questions(SubsetIndex(frame), count, seed, strict, max_stall)
+    except click.ClickException as e:
+        raise click.ClickException(f"seed {seed}: {e.message}")
+    return {"seed": seed, "subset": records, "questions": [q.model_dump() for q in questions]}
+
+
+def parse_seeds(value: str) -> List[int]:
+    """
+    "1,2,10-20" -> [1, 2, 10, ..., 20]
+    """
+    seeds = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        seeds.extend(range(int(start), int(end) + 1) if sep else [int(start)])
+    if 0 in seeds:
+        raise click.BadParameter("seed 0 picks a random seed and can't be reproduced", param_hint="--seeds")
+    return seeds
+
+
+@cli.command()
+@click.option("--seeds", required=True, help="Seeds to generate, e.g. 1,2,10-20")
+@click.option("--files", default=10, help="Number of files to sample per instance (step1 --count)")
+@click.option("--count", default=10, help="Number of questions per instance (step2 --count)")
+@click.option("--output", default="instances.jsonl.gz", help="Output file, one instance per line, gzipped if .gz")
+@click.option("--workers", default=0, help="Worker processes (0 = all cores, 1 = in process)")
+@click.option("--strict/--no-strict", default=True, help="Fail if a subset can't produce --count distinct questions")
+@click.option("--max-stall", default=100_000, help="Give up after this many draws in a row without a new question")
+@profiled
+def pipeline(seeds: str, files: int = 10, count: int = 10, output: str = "instances.jsonl.gz", workers: int = 0,
+             strict: bool = True, max_stall: int = 100_000):
+    """
+    Runs step1 and step2 for many seeds. Each instance matches what the two
+    commands write for that seed.
+    """
+    global _REPORTS
+    seeds = parse_seeds(seeds)
+    _REPORTS = list(load_dataset().values())
+
+    if profiler.enabled:
+        # phases are recorded in this process only
+        workers = 1
+
+    opener = gzip.open if output.endswith(".gz") else open
+    task = functools.partial(build_instance, files=files, count=count, strict=strict, max_stall=max_stall)
+
+    workers = workers or os.cpu_count() or 1
+    with opener(output, "wt", encoding="utf-8") as out:
+        if workers == 1 or len(seeds) <= 1:
+            instances = map(task, seeds)
+            pool = None
+        else:
+            workers = min(workers, len(seeds))
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_pipeline_worker)
+            instances = pool.map(task, seeds, chunksize=max(1, len(seeds) // (8 * workers)))
+        try:
+            for instance in instances:
+                with profiler.phase("write instances"):
+                    out.write(json.dumps(instance, separators=(",", ":")) + "\n")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    print(f"Wrote {len(seeds)} instances to {output}")
 
 
 @cli.command()
@@ -614,6 +1102,31 @@ def test_rng(limit: int = 100, count: int = 100, seed: int = 42):
 
     print(arr)
 
+    # block mode and jump-ahead must replay the same sequence
+    start = time.perf_counter()
+    rng = DeterministicRNG(seed)
+    expected = [rng.random(limit) for _ in range(count)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    block_rng = DeterministicRNG(seed)
+    block = block_rng.randoms(limit, count)
+    block_time = time.perf_counter() - start
+
+    jump_rng = DeterministicRNG(seed)
+    jump_rng.jump(count)
+
+    assert block.tolist() == expected, "block mode differs from random()"
+    assert block_rng.state == rng.state, "block mode leaves a different state"
+    assert jump_rng.state == rng.state, "jump ahead lands on a different state"
+    for skip in {0, min(1, count), count // 3, count // 2, count}:
+        shard = DeterministicRNG(seed)
+        shard.jump(skip)
+        assert shard.randoms(limit, count - skip).tolist() == expected[skip:], f"shard at {skip} differs"
+
+    print(f"random(): {loop_time * 1000:.2f}ms, block: {block_time * 1000:.2f}ms, "
+          f"x{loop_time / max(block_time, 1e-9):.1f}, jump and shards match")
+
 
 if __name__ == "__main__":
     cli()
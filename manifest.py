@@ -0,0 +1,193 @@
+"""
+SHA1 integrity manifest for the PDF corpus.
+
+Every PDF is expected to be named <sha1>.pdf. Files are hashed through mmap
+across a thread pool (hashlib releases the GIL on large buffers), and
+(size, mtime, sha1) is cached per path in the manifest, so a re-run only reads
+files that changed. The check reports files whose content does not match their
+name, files of the manifest that are gone, subset PDFs absent from the corpus,
+and PDFs that neither a dataset nor a subset references. The datasets list the
+whole corpus, so their PDFs are not required to be present.
+
+    python manifest.py build     # hash and record the corpus as it is now
+    python manifest.py verify    # check against the manifest, exit 1 on problems
+"""
+import hashlib
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import click
+import pandas as pd
+
+from main import DATASET
+from profiling import profiler, profiled
+
+ROOT = Path(__file__).parent
+CORPUS_DIRS = [ROOT / "round1/pdfs", ROOT / "round2/pdfs", ROOT / "round2/samples"]
+MANIFEST_FILE = ROOT / "pdf_manifest.json"
+
+
+def mmap_sha1(path: Path) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha1().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.sha1(m).hexdigest()
+
+
+def subset_sha1s() -> Dict[str, str]:
+    """
+    sha1 -> subset file, for the PDFs a challenge round needs.
+    """
+    refs = {}
+    for subset in sorted(ROOT.glob("round*/subset.json")):
+        for record in json.loads(subset.read_text()):
+            refs.setdefault(record["sha1"], str(subset.relative_to(ROOT)))
+    return refs
+
+
+def referenced_sha1s() -> Dict[str, str]:
+    """
+    sha1 -> file that references it, for every dataset and subset that exists.
+    """
+    refs = subset_sha1s()
+    if (ROOT / "round1/dataset.csv").exists():
+        for sha1 in pd.read_csv(ROOT / "round1/dataset.csv")["sha1"]:
+            refs.setdefault(sha1, "round1/dataset.csv")
+    if DATASET.exists():
+        for entry in json.loads(DATASET.read_text()).values():
+            if "sha1" in entry:
+                refs.setdefault(entry["sha1"], "round2/dataset.json")
+    return refs
+
+
+@dataclass
+class ManifestReport:
+    files: Dict[str, dict]
+    hashed: int = 0
+    mismatched: List[Tuple[str, str]] = field(default_factory=list)
+    vanished: Dict[str, dict] = field(default_factory=dict)
+    missing: List[Tuple[str, str]] = field(default_factory=list)
+    unreferenced: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.mismatched or self.vanished or self.missing)
+
+
+def _key(path: Path) -> str:
+    path = path.absolute()
+    return str(path.relative_to(ROOT)) if path.is_relative_to(ROOT) else str(path)
+
+
+def build_manifest(dirs: List[Path], cache: Dict[str, dict], workers: int = 0, rehash: bool = False) -> ManifestReport:
+    paths = sorted(p for d in dirs if d.exists() for p in d.glob("*.pdf"))
+    scanned = {_key(d) for d in dirs}
+
+    files, todo = {}, []
+    with profiler.phase("stat files"):
+        for p in paths:
+            key = _key(p)
+            st = p.stat()
+            cached = cache.get(key)
+            if not rehash and cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+                files[key] = cached
+            else:
+                files[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                todo.append((key, p))
+
+    with profiler.phase("hash files"):
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            for (key, _), sha1 in zip(todo, pool.map(lambda t: mmap_sha1(t[1]), todo)):
+                files[key]["sha1"] = sha1
+
+    report = ManifestReport(files=files, hashed=len(todo))
+    report.vanished = {k: v for k, v in cache.items() if k not in files and str(Path(k).parent) in scanned}
+    with profiler.phase("check manifest"):
+        present = {}
+        for key, info in files.items():
+            present.setdefault(info["sha1"], key)
+            if Path(key).stem != info["sha1"]:
+                report.mismatched.append((key, info["sha1"]))
+
+        report.missing = sorted((sha1, source) for sha1, source in subset_sha1s().items() if sha1 not in present)
+        refs = referenced_sha1s()
+        report.unreferenced = sorted(key for sha1, key in present.items() if sha1 not in refs)
+    return report
+
+
+def load_cache(file: Path) -> Dict[str, dict]:
+    if not file.exists():
+        return {}
+    return json.loads(file.read_text()).get("files", {})
+
+
+def run(dirs: Tuple[str, ...], output: str, workers: int, rehash: bool, keep_vanished: bool) -> ManifestReport:
+    file = Path(output)
+    report = build_manifest([Path(d) for d in dirs] if dirs else CORPUS_DIRS, load_cache(file), workers, rehash)
+
+    # verify keeps gone files on record, so they are reported until the next build
+    files = {**report.vanished, **report.files} if keep_vanished else report.files
+    tmp = file.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({"files": dict(sorted(files.items()))}, indent=2))
+    tmp.replace(file)
+
+    for key, sha1 in report.mismatched:
+        print(f"Mismatch: {key} hashes to {sha1}", file=sys.stderr)
+    for key in report.vanished:
+        print(f"Gone: {key}", file=sys.stderr)
+    for sha1, source in report.missing:
+        print(f"Missing: {sha1} (in {source})", file=sys.stderr)
+    for key in report.unreferenced:
+        print(f"Unreferenced: {key}", file=sys.stderr)
+
+    print(f"{len(report.files)} PDFs, {report.hashed} hashed, {len(report.mismatched)} mismatched, "
+          f"{len(report.vanished)} gone, {len(report.missing)} missing, {len(report.unreferenced)} unreferenced")
+    return report
+
+
+_options = [
+    click.option("--pdfs", "dirs", multiple=True, type=click.Path(exists=True, file_okay=False),
+                 help="Folders with PDFs (default: round1/pdfs, round2/pdfs, round2/samples)"),
+    click.option("--output", default=str(MANIFEST_FILE), help="Manifest file, also the hash cache"),
+    click.option("--workers", default=0, help="Hashing threads (0 = all cores)"),
+    click.option("--rehash/--no-rehash", default=False, help="Ignore the cached hashes"),
+]
+
+
+def manifest_options(fn):
+    for option in reversed(_options):
+        fn = option(fn)
+    return fn
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@manifest_options
+@profiled
+def build(dirs: Tuple[str, ...] = (), output: str = str(MANIFEST_FILE), workers: int = 0, rehash: bool = False):
+    """Hash the corpus and write the manifest"""
+    run(dirs, output, workers, rehash, keep_vanished=False)
+
+
+@cli.command()
+@manifest_options
+@profiled
+def verify(dirs: Tuple[str, ...] = (), output: str = str(MANIFEST_FILE), workers: int = 0, rehash: bool = False):
+    """Check the corpus against the manifest, fail on mismatched, gone or missing PDFs"""
+    if not run(dirs, output, workers, rehash, keep_vanished=True).ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
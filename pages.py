@@ -0,0 +1,202 @@
+"""
+Page-level text store for the PDF corpus, addressed like references: "sha1:page"
+with zero-based physical pages.
+
+Text is extracted once per PDF and every page is zlib-compressed on its own into
+pages.bin. docs.npy maps each sha1 to its first page row and page count,
+offsets.npy holds the byte range of every row. Reads mmap pages.bin and
+decompress one page, so no PDF library is involved after the build.
+
+    python pages.py build                  # extract PDFs not in the store yet
+    python pages.py show 446545ae548543d8744f8d885ff75face3424ba4:6
+"""
+import mmap
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import click
+import numpy as np
+
+from ingest import PDF_DIRS, PdfReader, extract_pages, pdf_files, unknown_pdfs
+from profiling import profiler, profiled
+
+PAGE_STORE = Path(__file__).parent / "round2/pages"
+
+
+def parse_ref(ref: str) -> Tuple[str, int]:
+    sha1, _, page = ref.partition(":")
+    return sha1, int(page)
+
+
+class PageStore:
+    def __init__(self, folder: Path = PAGE_STORE):
+        self.folder = folder
+        docs = np.load(folder / "docs.npy")
+        self.docs: Dict[str, Tuple[int, int]] = {
+            sha1: (first, count) for sha1, first, count in zip(docs["sha1"].tolist(), docs["first"].tolist(),
+                                                                docs["count"].tolist())
+        }
+        self.offsets = np.load(folder / "offsets.npy", mmap_mode="r")
+        self._file = open(folder / "pages.bin", "rb")
+        size = int(self.offsets[-1])
+        self._data = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+
+    @classmethod
+    def exists(cls, folder: Path = PAGE_STORE) -> bool:
+        return (folder / "docs.npy").exists()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, ref: str) -> bool:
+        sha1, page = parse_ref(ref)
+        return 0 <= page < self.pages(sha1)
+
+    def __getitem__(self, ref: str) -> str:
+        return self.page(*parse_ref(ref))
+
+    def pages(self, sha1: str) -> int:
+        return self.docs.get(sha1, (0, 0))[1]
+
+    def fingerprint(self) -> List[int]:
+        """
+        Size and mtime of the index files, which every build rewrites. Caches derived
+        from the store keep it to notice a rebuilt store.
+        """
+        result = []
+        for name in ("docs.npy", "offsets.npy"):
+            st = os.stat(self.folder / name)
+            result += [st.st_size, st.st_mtime_ns]
+        return result
+
+    def page(self, sha1: str, page: int) -> str:
+        first, count = self.docs.get(sha1, (0, 0))
+        if not 0 <= page < count:
+            raise KeyError(f"{sha1}:{page}")
+        row = first + page
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return zlib.decompress(self._data[start:end]).decode("utf-8")
+
+    def document(self, sha1: str) -> Iterator[str]:
+        for page in range(self.pages(sha1)):
+            yield self.page(sha1, page)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def _extract(path: Path) -> Tuple[Optional[List[bytes]], Optional[str]]:
+    # runs in a worker process
+    try:
+        pages = extract_pages(path)
+    except Exception as e:  # pypdf raises a wide range of errors on broken files
+        return None, f"{type(e).__name__}: {e}"
+    return [zlib.compress(text.encode("utf-8")) for text in pages], None
+
+
+def build_page_store(files: List[Path], folder: Path = PAGE_STORE, workers: int = 0,
+                     verify: bool = False) -> Tuple[List[str], List[Tuple[Path, str]]]:
+    """
+    Appends the PDFs that are not in the store yet. Returns the new sha1s and
+    the files that failed.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    if PageStore.exists(folder):
+        docs = np.load(folder / "docs.npy")
+        names, firsts, counts = docs["sha1"].tolist(), docs["first"].tolist(), docs["count"].tolist()
+        offsets = np.load(folder / "offsets.npy").tolist()
+    else:
+        names, firsts, counts, offsets = [], [], [], [0]
+
+    todo = unknown_pdfs(files, set(names), verify, workers)
+    paths = [f for f, _ in todo]
+
+    added, failed = [], []
+    workers = workers or os.cpu_count() or 1
+    with open(folder / "pages.bin", "ab") as out, profiler.phase("extract pages"):
+        # drop whatever an interrupted build left behind the last indexed page
+        out.truncate(offsets[-1])
+        out.seek(offsets[-1])
+
+        if workers == 1 or len(todo) <= 1:
+            results = map(_extract, paths)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(todo)))
+            results = pool.map(_extract, paths)
+        try:
+            for (f, sha1), (pages, error) in zip(todo, results):
+                if error is not None:
+                    failed.append((f, error))
+                    continue
+                names.append(sha1)
+                firsts.append(len(offsets) - 1)
+                counts.append(len(pages))
+                for blob in pages:
+                    out.write(blob)
+                    offsets.append(offsets[-1] + len(blob))
+                added.append(sha1)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    with profiler.phase("write page index"):
+        docs = np.array(list(zip(names, firsts, counts)),
+                        dtype=[("sha1", "U40"), ("first", "i8"), ("count", "i4")])
+        # offsets first: docs.npy is what marks pages as present
+        for name, array in (("offsets.npy", np.array(offsets, dtype=np.int64)), ("docs.npy", docs)):
+            tmp = folder / f"{name}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            tmp.replace(folder / name)
+
+    return added, failed
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--pdfs", "dirs", multiple=True, type=click.Path(exists=True, file_okay=False),
+              help="Folders with PDFs (default: round*/pdfs)")
+@click.option("--store", default=str(PAGE_STORE), help="Page store folder")
+@click.option("--workers", default=0, help="Worker processes (0 = all cores, 1 = in process)")
+@click.option("--verify/--no-verify", default=False, help="Hash every PDF instead of trusting <sha1>.pdf names")
+@profiled
+def build(dirs: Tuple[str, ...] = (), store: str = str(PAGE_STORE), workers: int = 0, verify: bool = False):
+    """Extract the text of every page into the store"""
+    if PdfReader is None:
+        raise click.ClickException("Page extraction needs pypdf: pip install pypdf")
+
+    files = pdf_files([Path(d) for d in dirs] if dirs else PDF_DIRS)
+    added, failed = build_page_store(files, Path(store), workers, verify)
+    for f, error in failed:
+        print(f"Skipping {f.name}: {error}", file=sys.stderr)
+
+    pages = PageStore(Path(store))
+    print(f"{len(added)} new reports, {len(pages)} reports with {len(pages.offsets) - 1} pages in {store}")
+
+
+@cli.command()
+@click.argument("refs", nargs=-1, required=True)
+@click.option("--store", default=str(PAGE_STORE), help="Page store folder")
+def show(refs: Tuple[str, ...], store: str = str(PAGE_STORE)):
+    """Print pages given as sha1:page"""
+    pages = PageStore(Path(store))
+    for ref in refs:
+        if ref not in pages:
+            raise click.BadParameter(f"{ref} is not in the store", param_hint="REFS")
+        print(f"# {ref}")
+        print(pages[ref])
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,134 @@
+"""
+Phase-level instrumentation for rank.py and main.py.
+
+Code marks its phases with `profiler.phase("name")`. This costs next to nothing
+until a command runs with --profile, which records wall time, CPU time, call count
+and peak RSS per phase, prints a summary and writes the report as JSON.
+"""
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Optional
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class PhaseStats:
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_rss_mb: Optional[float] = None
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.phases: Dict[str, PhaseStats] = {}
+        self.started = 0.0
+
+    def start(self):
+        self.enabled = True
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.enabled = False
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return nullcontext()
+        return self._record(name)
+
+    def timed(self, name: str):
+        """
+        Decorator that records every call of a function as a phase.
+        """
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @contextmanager
+    def _record(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, PhaseStats())
+            stats.calls += 1
+            stats.wall += time.perf_counter() - wall
+            stats.cpu += time.process_time() - cpu
+            stats.peak_rss_mb = peak_rss_mb()
+
+    def report(self) -> dict:
+        return {
+            "wall": time.perf_counter() - self.started,
+            "peak_rss_mb": peak_rss_mb(),
+            "phases": {k: asdict(v) for k, v in self.phases.items()},
+        }
+
+    def summary(self) -> Table:
+        report = self.report()
+        table = Table(title=f"Profile ({report['wall']:.3f}s wall)")
+        table.add_column("Phase")
+        table.add_column("Calls", justify="right")
+        table.add_column("Wall s", justify="right")
+        table.add_column("CPU s", justify="right")
+        table.add_column("Peak RSS MB", justify="right")
+
+        for name, stats in self.phases.items():
+            rss = "-" if stats.peak_rss_mb is None else f"{stats.peak_rss_mb:.1f}"
+            table.add_row(name, str(stats.calls), f"{stats.wall:.4f}", f"{stats.cpu:.4f}", rss)
+        return table
+
+
+profiler = Profiler()
+
+
+def profiled(fn):
+    """
+    Adds --profile and --profile-output to a click command.
+    """
+
+    @click.option("--profile", is_flag=True, default=False, help="Record time and memory per phase")
+    @click.option("--profile-output", default="profile.json", help="Where --profile writes its JSON report")
+    @functools.wraps(fn)
+    def wrapper(*args, profile: bool = False, profile_output: str = "profile.json", **kwargs):
+        if not profile:
+            return fn(*args, **kwargs)
+
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            Path(profile_output).write_text(json.dumps(profiler.report(), indent=2))
+            Console(width=120, stderr=True).print(profiler.summary())
+
+    return wrapper
@@ -0,0 +1,54 @@
+"""
+Canonical question ids, shared by rank.py and round1/rank.py.
+
+Standard library only, so it can be loaded by file path from scripts that do not
+have the repository on sys.path.
+"""
+import hashlib
+import json
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+def normalize_question(text: str) -> str:
+    # some teams mangle unicode or whitespace of the question text
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def question_id(text: str) -> int:
+    """
+    Stable 63-bit id of a question, the same for any unicode form or whitespace of its text.
+    """
+    digest = hashlib.sha1(normalize_question(text).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+class QuestionRegistry:
+    """
+    Canonical question table: column j holds the question with id ids[j].
+    A question text is normalized and hashed the first time it is seen,
+    after that resolving it to a column is a single dict lookup.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts = list(texts)
+        self.ids = [question_id(t) for t in self.texts]
+        self._by_id = {i: j for j, i in enumerate(self.ids)}
+        if len(self._by_id) != len(self.texts):
+            raise ValueError("Different questions have the same normalized text")
+        self._seen: Dict[str, Optional[int]] = {t: j for j, t in enumerate(self.texts)}
+
+    @classmethod
+    def from_questions_file(cls, file: Path) -> "QuestionRegistry":
+        return cls(q["text"] for q in json.loads(file.read_text()))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def column(self, text: Optional[str]) -> Optional[int]:
+        if text is None:
+            return None
+        if text not in self._seen:
+            self._seen[text] = self._by_id.get(question_id(text))
+        return self._seen[text]
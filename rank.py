@@ -1,14 +1,26 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Literal, List, Union, Dict
+from typing import Optional, Literal, List, Union, Dict, Iterable, Iterator, Tuple
+import click
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, Field, RootModel
 
 from rich.table import Table
 from rich.console import Console
 
+from profiling import profiler, profiled
+from questions import QuestionRegistry
+
 
 class SourceReference(BaseModel):
     pdf_sha1: str = Field(..., description="SHA1 hash of the PDF file")
@@ -65,14 +77,60 @@ class Ranking:
 DIR = Path(__file__).parent / "round2"
 
 
-def load_submissions() -> List[AnswerSubmission]:
-    files = (DIR / "submissions").glob("*.json")
-    submissions = []
-    for f in files:
-        v = AnswerSubmission.model_validate_json(f.read_text())
-        v.file_name = f.name
-        submissions.append(v)
-    return submissions
+def read_submission(file: Path) -> AnswerSubmission:
+    with profiler.phase("load submissions"):
+        text = file.read_text()
+    with profiler.phase("validate submissions"):
+        v = AnswerSubmission.model_validate_json(text)
+    v.file_name = file.name
+    return v
+
+
+def _try_read_submission(file: Path) -> Tuple[Optional[AnswerSubmission], Optional[str]]:
+    # runs in a worker, so errors are returned instead of raised
+    try:
+        return read_submission(file), None
+    except (OSError, ValueError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def submission_files() -> List[Path]:
+    return list((DIR / "submissions").glob("*.json"))
+
+
+def iter_submissions(workers: int = 0, executor: Literal["process", "thread"] = "process",
+                     files: Optional[List[Path]] = None) -> Iterator[AnswerSubmission]:
+    """
+    Reads and validates submissions across a worker pool and yields them in
+    directory order as soon as they are ready, so scoring can overlap with parsing.
+    A file that fails to load is reported and skipped instead of aborting the run.
+
+    workers=0 uses all cores, workers=1 reads the files in this process.
+    """
+    files = submission_files() if files is None else files
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(files) <= 1:
+        results = map(_try_read_submission, files)
+        pool = None
+    else:
+        pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        pool = pool_cls(max_workers=min(workers, len(files)))
+        results = pool.map(_try_read_submission, files)
+
+    try:
+        for f, (submission, error) in zip(files, results):
+            if error is not None:
+                print(f"Skipping {f.name}: {error}", file=sys.stderr)
+                continue
+            yield submission
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def load_submissions(workers: int = 0) -> List[AnswerSubmission]:
+    return list(iter_submissions(workers))
 
 
 def compare(schema: Schema, actual: str, predicted: Value) -> float:
@@ -127,106 +185,485 @@ def compare(schema: Schema, actual: str, predicted: Value) -> float:
         raise Exception(f"Unknown schema {schema}")
 
 
-def load_canonic_answers():
-    file = DIR / "answers.json"
-    data = CanonicFile.model_validate_json(file.read_text())
-    schemas = data.root
-
-    console = Console(width=120)
-    rankings = []
-
-    for submission in load_submissions():
-        stats = defaultdict(int)
-        index = {a.question_text: a for a in submission.answers}
+@lru_cache(maxsize=None)
+def score_refs(stray: int, missing_pools: int) -> float:
+    # -0.1 per stray reference, -0.25 per pool without any reference, applied
+    # one by one so the float result does not depend on how it was counted
+    score = 1.0
+    for _ in range(stray):
+        score -= 0.1
+    for _ in range(missing_pools):
+        score -= 0.25
+    return max(0.0, score)
+
+
+class GroundTruthIndex:
+    """
+    Reference pools of the ground truth, compiled once per run. Every "sha1:page"
+    gets an integer id, and every question maps a ref id to the bitset of pools
+    that contain it, so a reference is checked in constant time.
+    """
+
+    @profiler.timed("compile ground truth")
+    def __init__(self, schemas: Dict[str, CanonicData]):
+        self.questions = QuestionRegistry(schemas)
+        self.ref_ids: Dict[str, int] = {}
+        self.pool_masks: List[Dict[int, int]] = []
+        self.pool_counts: List[int] = []
+
+        for data in schemas.values():
+            masks = defaultdict(int)
+            for p, pool in enumerate(data.reference_pools):
+                for ref in pool:
+                    masks[self.ref_ids.setdefault(ref, len(self.ref_ids))] |= 1 << p
+            self.pool_masks.append(dict(masks))
+            self.pool_counts.append(len(data.reference_pools))
+
+    def penalties(self, column: int, refs: Iterable[str]) -> Tuple[int, int]:
+        """
+        Returns (stray refs, pools without a ref) for the predicted refs of one question.
+        Duplicate strays are counted every time, like in the original scoring.
+        """
+        masks = self.pool_masks[column]
+        stray, found = 0, 0
+        for ref in refs:
+            mask = masks.get(self.ref_ids.get(ref, -1))
+            if mask is None:
+                stray += 1
+            else:
+                found |= mask
+        return stray, self.pool_counts[column] - bin(found).count("1")
 
-        for q, data in schemas.items():
-            predicted = index.get(q)
-            if predicted is None:
-                stats["missing"] += 1
-                continue
+    def ref_score(self, column: int, refs: Iterable[str]) -> float:
+        return score_refs(*self.penalties(column, refs))
 
-            if not data.answers:
-                stats["no_rank"] += 1
-                continue
 
-            predicted.gt_value = data.answers
-            predicted.gt_refs = data.reference_pools
-            predicted.debug = []
-
-            # if we have multiple answers possible, pick the highest score
+@profiler.timed("load answers")
+def load_canonic_file() -> CanonicFile:
+    file = DIR / "answers.json"
+    return CanonicFile.model_validate_json(file.read_text())
+
+
+def elapsed_since_start(submission: AnswerSubmission) -> float:
+    time = datetime.strptime(submission.time, "%Y-%m-%d, %H:%M:%S")
+
+    # started =  — 27/02/2025, 13:29
+    started = datetime.strptime("2025-02-27, 12:30", "%Y-%m-%d, %H:%M")
+    return (time - started).total_seconds() / 3600.0
+
+
+def score_submission(submission: AnswerSubmission, schemas: Dict[str, CanonicData],
+                     gt: Optional[GroundTruthIndex] = None) -> Ranking:
+    """
+    Scalar scoring of one submission, answer by answer. This is the reference
+    implementation, score_matrix must produce exactly the same numbers.
+    """
+    gt = gt or GroundTruthIndex(schemas)
+    stats = defaultdict(int)
+    index = {}
+    for a in submission.answers:
+        column = gt.questions.column(a.question_text)
+        if column is not None:
+            index[column] = a
+
+    for column, data in enumerate(schemas.values()):
+        predicted = index.get(column)
+        if predicted is None:
+            stats["missing"] += 1
+            continue
+
+        if not data.answers:
+            stats["no_rank"] += 1
+            continue
+
+        predicted.gt_value = data.answers
+        predicted.gt_refs = data.reference_pools
+        predicted.debug = []
+
+        # if we have multiple answers possible, pick the highest score
+        with profiler.phase(f"score {data.kind}"):
             val_score = max([compare(data.kind, a, predicted.value) for a in data.answers])
 
+        with profiler.phase("score refs"):
             # convert answer refs to hash:page format
             predicted_refs = [r.pdf_sha1 + ":" + str(r.page_index) for r in predicted.references]
+            ref_score = gt.ref_score(column, predicted_refs)
+
+        stats["val_score"] += val_score
+
+        predicted.debug.append(f"Ref_score: {ref_score:.2f}")
+
+        stats["ref_score"] += ref_score
+
+        predicted.debug.append(f"Score: {val_score}")
+
+    val_score = stats["val_score"]
+    ref_score = stats["ref_score"]
+
+    score = (val_score + ref_score / 2.0)
+
+    return Ranking(
+        submission=submission,
+        missing=stats["missing"],
+        missing_ref=stats["missing_refs"],
+        no_rank=stats["no_rank"],
+        score=score,
+        ref_score=ref_score,
+        val_score=val_score,
+        elapsed_hours=elapsed_since_start(submission)
+    )
+
+
+def score_scalar(submissions: Iterable[AnswerSubmission], schemas: Dict[str, CanonicData]) -> List[Ranking]:
+    gt = GroundTruthIndex(schemas)
+    return [score_submission(s, schemas, gt) for s in submissions]
+
+
+def _is_na(value: Value) -> bool:
+    return isinstance(value, str) and value == "N/A"
+
+
+def _to_float(value: Value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # unparseable numbers never match, same as in compare()
+        return np.nan
+
+
+def _value_key(kind: Schema, value: Value) -> str:
+    # normalisation used by compare() for boolean and name answers
+    if kind == "boolean":
+        return str(value).lower()
+    return str(value).strip().lower()
+
+
+def _names_of(value: Value) -> List[str]:
+    if isinstance(value, str):
+        value = [p.strip() for p in value.split(",")]
+    return [str(p).strip().lower() for p in value]
+
+
+def _score_values(kind: Schema, cols: np.ndarray, values: List[Value],
+                  actuals: List[List[str]]) -> np.ndarray:
+    """
+    Scores all answers of one kind at once. `cols` holds the question column of
+    every answer, `actuals` the accepted answers per question column.
+    Returns the best score over the accepted answers, per answer.
+    """
+    n, width = len(values), max([len(a) for a in actuals] + [1])
+
+    # accepted answers as a padded (question x width) grid
+    valid = np.zeros((len(actuals), width), dtype=bool)
+    act_na = np.zeros((len(actuals), width), dtype=bool)
+    for j, accepted in enumerate(actuals):
+        for k, a in enumerate(accepted):
+            valid[j, k] = True
+            act_na[j, k] = a == "N/A"
+
+    pred_na = np.array([_is_na(v) for v in values], dtype=bool)
+    valid, act_na = valid[cols], act_na[cols]
+
+    if kind == "number":
+        act = np.full((len(actuals), width), np.nan)
+        for j, accepted in enumerate(actuals):
+            for k, a in enumerate(accepted):
+                act[j, k] = _to_float(a)
+        act = act[cols]
+        pred = np.array([_to_float(v) for v in values], dtype=float).reshape(n, 1)
+        with np.errstate(invalid="ignore"):
+            # if answer is within 1 % of the expected value, give full score
+            scores = (np.abs(pred - act) < 0.01 * act).astype(float)
+
+    elif kind in ("boolean", "name"):
+        codes = {}
+        act = np.full((len(actuals), width), -1, dtype=np.int64)
+        for j, accepted in enumerate(actuals):
+            for k, a in enumerate(accepted):
+                act[j, k] = codes.setdefault(_value_key(kind, a), len(codes))
+        act = act[cols]
+        pred = np.array([codes.get(_value_key(kind, v), -2) for v in values], dtype=np.int64).reshape(n, 1)
+        scores = (pred == act).astype(float)
+
+    elif kind == "names":
+        # intern names, then compute jaccard of (answer, accepted answer) pairs
+        # through a join on (question, name)
+        codes = {}
+        act_rows = []
+        act_size = np.ones((len(actuals), width), dtype=np.int64)
+        for j, accepted in enumerate(actuals):
+            for k, a in enumerate(accepted):
+                names = {codes.setdefault(x, len(codes)) for x in str(a).strip().lower().split(",")}
+                act_size[j, k] = len(names)
+                act_rows.extend((j, k, c) for c in names)
+
+        pred_rows = []
+        pred_size = np.zeros(n, dtype=np.int64)
+        for i, v in enumerate(values):
+            if pred_na[i]:
+                continue
+            names = {codes.setdefault(x, len(codes)) for x in _names_of(v)}
+            pred_size[i] = len(names)
+            pred_rows.extend((i, cols[i], c) for c in names)
 
-            max_ref_score = 1.0
-
-            if len(data.reference_pools) == 0 and len(predicted_refs) == 0:
-                pass
-            else:
-                # flatten all pools to one array
-                expected_refs = []
-                for expected in data.reference_pools:
-                    expected_refs.extend(expected)
-
-                max_ref_score = 1.0
-
-                for p in predicted_refs:
-                    if p not in expected_refs:
-                        max_ref_score -= 0.1
-
-                for proof_neded in data.reference_pools:
-                    found_proof = len(set(predicted_refs).intersection(proof_neded)) > 0
-                    if not found_proof:
-                        max_ref_score -= 0.25
-
-            stats["val_score"] += val_score
-
-            ref_score = max(0.0, max_ref_score)
-            predicted.debug.append(f"Ref_score: {ref_score:.2f}")
-
-            stats["ref_score"] += ref_score
-
-            predicted.debug.append(f"Score: {val_score}")
-
-        val_score = stats["val_score"]
-        ref_score = stats["ref_score"]
-
-        score = (val_score + ref_score / 2.0)
+        act_df = pd.DataFrame(act_rows, columns=["col", "k", "code"])
+        pred_df = pd.DataFrame(pred_rows, columns=["i", "col", "code"])
+        hits = pred_df.merge(act_df, on=["col", "code"]).groupby(["i", "k"]).size()
 
-        time = datetime.strptime(submission.time, "%Y-%m-%d, %H:%M:%S")
+        intersection = np.zeros((n, width), dtype=np.int64)
+        if len(hits):
+            intersection[hits.index.get_level_values("i"), hits.index.get_level_values("k")] = hits.to_numpy()
+        union = pred_size.reshape(n, 1) + act_size[cols] - intersection
+        scores = 1.0 * intersection / union
 
-        # started =  — 27/02/2025, 13:29
-        started = datetime.strptime("2025-02-27, 12:30", "%Y-%m-%d, %H:%M")
-        elapsed_hours = (time - started).total_seconds() / 3600.0
+    else:
+        raise Exception(f"Unknown schema {kind}")
+
+    # N/A only matches N/A
+    na = pred_na.reshape(n, 1)
+    scores = np.where(na, act_na.astype(float), np.where(act_na, 0.0, scores))
+    scores = np.where(valid, scores, -np.inf)
+    return scores.max(axis=1)
+
+
+def score_matrix(submissions: Iterable[AnswerSubmission], schemas: Dict[str, CanonicData]) -> List[Ranking]:
+    """
+    Loads all submissions into a dense submission x question matrix and scores
+    every answer kind and all references with batched array operations.
+    """
+    gt = GroundTruthIndex(schemas)
+    questions = list(schemas.values())
+    column = gt.questions.column
+    n_q = len(questions)
+
+    # index answers while submissions are still streaming in
+    loaded, cells = [], {}
+    for i, submission in enumerate(submissions):
+        with profiler.phase("index answers"):
+            loaded.append(submission)
+            for a in submission.answers:
+                j = column(a.question_text)
+                if j is not None:
+                    cells[i, j] = a
+    submissions, n_sub = loaded, len(loaded)
+
+    with profiler.phase("index answers"):
+        answers = np.full((n_sub, n_q), None, dtype=object)
+        present = np.zeros((n_sub, n_q), dtype=bool)
+        for (i, j), a in cells.items():
+            answers[i, j] = a
+            present[i, j] = True
+
+    ranked = np.array([bool(q.answers) for q in questions], dtype=bool)
+    missing = (~present).sum(axis=1)
+    no_rank = (present & ~ranked).sum(axis=1)
+    scored = present & ranked
+
+    # value scores, one batch per answer kind
+    kinds = np.array([q.kind for q in questions])
+    actuals = [q.answers for q in questions]
+    val = np.zeros((n_sub, n_q))
+    for kind in np.unique(kinds):
+        rows, cols = np.nonzero(scored & (kinds == kind))
+        if len(rows) == 0:
+            continue
+        with profiler.phase(f"score {kind}"):
+            values = [a.value for a in answers[rows, cols]]
+            val[rows, cols] = _score_values(kind, cols, values, actuals)
+
+    # reference scores from the precompiled ground truth index
+    with profiler.phase("score refs"):
+        rows, cols = np.nonzero(scored)
+        stray = np.zeros(len(rows), dtype=np.int64)
+        missing_pools = np.zeros(len(rows), dtype=np.int64)
+        for c, (j, a) in enumerate(zip(cols, answers[rows, cols])):
+            refs = [r.pdf_sha1 + ":" + str(r.page_index) for r in a.references]
+            stray[c], missing_pools[c] = gt.penalties(j, refs)
+
+        penalties = np.array([[score_refs(s, m) for m in range(int(missing_pools.max(initial=0)) + 1)]
+                              for s in range(int(stray.max(initial=0)) + 1)])
+        ref = np.zeros((n_sub, n_q))
+        ref[rows, cols] = penalties[stray, missing_pools]
+
+    # accumulate in question order, like the scalar path does
+    val_score = np.cumsum(val, axis=1)[:, -1] if n_q else np.zeros(n_sub)
+    ref_score = np.cumsum(ref, axis=1)[:, -1] if n_q else np.zeros(n_sub)
 
+    rankings = []
+    for i, submission in enumerate(submissions):
         rankings.append(Ranking(
             submission=submission,
-            missing=stats["missing"],
-            missing_ref=stats["missing_refs"],
-            no_rank=stats["no_rank"],
-            score=score,
-            ref_score=ref_score,
-            val_score=val_score,
-            elapsed_hours=elapsed_hours
+            missing=int(missing[i]),
+            no_rank=int(no_rank[i]),
+            score=float(val_score[i] + ref_score[i] / 2.0),
+            ref_score=float(ref_score[i]),
+            val_score=float(val_score[i]),
+            elapsed_hours=elapsed_since_start(submission)
         ))
+    return rankings
+
+
+ENGINES = {
+    "matrix": score_matrix,
+    "scalar": score_scalar,
+}
+
+
+# bump whenever scoring changes, this invalidates all cached scores
+SCORING_VERSION = 2
+
+CACHE_FILE = DIR / "ranking_cache.sqlite"
+
+_CACHED_SUBMISSION = {"team_email": "TEXT", "submission_name": "TEXT", "signature": "TEXT", "time": "TEXT"}
+_CACHED_FIELDS = {"missing": "INTEGER", "missing_ref": "INTEGER", "no_rank": "INTEGER", "score": "REAL",
+                  "val_score": "REAL", "ref_score": "REAL", "elapsed_hours": "REAL"}
+
+
+def file_sha1(file: Path) -> str:
+    return hashlib.sha1(file.read_bytes()).hexdigest()
+
+
+class RankingCache:
+    """
+    Scores of already ranked submissions, keyed by the sha1 of the submission file
+    and the sha1 of the ground truth (plus SCORING_VERSION). Entries for any other
+    ground truth are dropped on open.
+    """
+
+    def __init__(self, path: Path, answers_sha1: str):
+        self.key = f"{answers_sha1}:{SCORING_VERSION}"
+        self.db = sqlite3.connect(path)
+        columns = ", ".join(f"{k} {t}" for k, t in {**_CACHED_SUBMISSION, **_CACHED_FIELDS}.items())
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS rankings (file_sha1 TEXT, answers_key TEXT, {columns}, "
+                        f"PRIMARY KEY (file_sha1, answers_key))")
+        self.db.execute("DELETE FROM rankings WHERE answers_key != ?", (self.key,))
+
+    def load(self) -> Dict[str, Ranking]:
+        columns = ", ".join([*_CACHED_SUBMISSION, *_CACHED_FIELDS])
+        result = {}
+        for row in self.db.execute(f"SELECT file_sha1, {columns} FROM rankings WHERE answers_key = ?", (self.key,)):
+            sub = dict(zip(_CACHED_SUBMISSION, row[1:1 + len(_CACHED_SUBMISSION)]))
+            fields = dict(zip(_CACHED_FIELDS, row[1 + len(_CACHED_SUBMISSION):]))
+            # answers are not needed to render the leaderboard, so skip validation entirely
+            submission = AnswerSubmission.model_construct(answers=[], file_name="", **sub)
+            result[row[0]] = Ranking(submission=submission, **fields)
+        return result
+
+    def store(self, file_sha1: str, ranking: Ranking):
+        values = [getattr(ranking.submission, f) for f in _CACHED_SUBMISSION]
+        values += [getattr(ranking, f) for f in _CACHED_FIELDS]
+        marks = ", ".join("?" * (2 + len(values)))
+        self.db.execute(f"INSERT OR REPLACE INTO rankings VALUES ({marks})", [file_sha1, self.key] + values)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def score_incremental(engine: str, workers: int, schemas: Dict[str, CanonicData], answers_sha1: str,
+                      cache_file: Path = CACHE_FILE) -> List[Ranking]:
+    """
+    Scores only new or changed submissions, the rest of the leaderboard comes
+    from the cache. Rankings are returned in directory order, like the engines do.
+    """
+    files = submission_files()
+    hashes = [file_sha1(f) for f in files]
+
+    cache = RankingCache(cache_file, answers_sha1)
+    try:
+        with profiler.phase("read cache"):
+            cached = cache.load()
+        stale = [f for f, h in zip(files, hashes) if h not in cached]
+        fresh = {r.submission.file_name: r for r in ENGINES[engine](iter_submissions(workers, files=stale), schemas)}
+
+        rankings = []
+        for f, h in zip(files, hashes):
+            if h in cached:
+                r = cached[h]
+                r.submission.file_name = f.name
+            elif f.name in fresh:
+                r = fresh[f.name]
+                cache.store(h, r)
+            else:
+                # failed to load
+                continue
+            rankings.append(r)
+    finally:
+        cache.close()
+
+    print(f"Scored {len(stale)} new submissions, {len(files) - len(stale)} from cache", file=sys.stderr)
+    return rankings
 
-        # save submission to "ranked" folder
-        ranked_dir = DIR / "ranked"
 
-        # OPTIONAL: save ranked submissions
-        # ranked_dir.mkdir(exist_ok=True)
-        # ranked_dir.joinpath(submission.file_name).write_text(
-        #     submission.model_dump_json(indent=2), encoding="utf-8"
-        # )
+def load_canonic_answers(engine: str = "matrix", workers: int = 0, cache: bool = True,
+                         top: int = 50, page: int = 1, parquet: bool = True):
+    file = DIR / "answers.json"
+    schemas = load_canonic_file().root
+
+    console = Console(width=120)
+    if cache:
+        rankings = score_incremental(engine, workers, schemas, file_sha1(file))
+    else:
+        rankings = ENGINES[engine](iter_submissions(workers), schemas)
+
+    # OPTIONAL: save ranked submissions to "ranked" folder (scalar engine fills in debug info)
+    # ranked_dir = DIR / "ranked"
+    # ranked_dir.mkdir(exist_ok=True)
+    # for r in rankings:
+    #     ranked_dir.joinpath(r.submission.file_name).write_text(
+    #         r.submission.model_dump_json(indent=2), encoding="utf-8"
+    #     )
 
     # sort by score descending
     rankings.sort(key=lambda x: x.score, reverse=True)
 
     # rankings.sort(key=lambda x: x.submission.time)
 
-    # now render to table
-    table = Table(title="Ranking", row_styles=["dim", ""])
+    with profiler.phase("build frame"):
+        frame = ranking_frame(rankings)
+    with profiler.phase("render table"):
+        console.print(ranking_table(frame, top, page))
+    with profiler.phase("write csv"):
+        write_ranking_csv(frame)
+    if parquet:
+        with profiler.phase("write parquet"):
+            write_ranking_parquet(frame)
+
+
+def ranking_frame(rankings: List[Ranking]) -> pd.DataFrame:
+    """
+    Leaderboard in typed columns, one row per ranking, in the given order.
+    Values are only turned into strings for the rows that get printed or exported.
+    """
+    val_score = np.array([r.val_score for r in rankings], dtype=float)
+    no_rank = np.array([r.no_rank for r in rankings], dtype=np.int64)
+
+    return pd.DataFrame({
+        "rank": np.arange(1, len(rankings) + 1, dtype=np.int64),
+        "team": [r.submission.submission_name.replace("\n", " ") for r in rankings],
+        "signature": [r.submission.signature[:8] for r in rankings],
+        "R": np.array([r.ref_score for r in rankings], dtype=float),
+        "G": val_score,
+        "Score": np.array([r.score for r in rankings], dtype=float),
+        "Missing": np.array([r.missing for r in rankings], dtype=np.int64),
+        "Missing Ref": np.array([r.missing_ref for r in rankings], dtype=np.int64),
+        "No rank": no_rank,
+        "Val Accuracy": 100.0 * val_score / (100 - no_rank),
+        "Elapsed": np.array([r.elapsed_hours for r in rankings], dtype=float),
+    })
+
+
+def ranking_table(frame: pd.DataFrame, top: int = 0, page: int = 1) -> Table:
+    """
+    Renders one page of `top` rows (all rows if top is 0).
+    """
+    start = (page - 1) * top if top else 0
+    rows = frame.iloc[start:start + top] if top else frame
+
+    title = "Ranking"
+    if len(rows) < len(frame):
+        title += f" ({start + 1}-{start + len(rows)} of {len(frame)})"
+    table = Table(title=title, row_styles=["dim", ""])
 
     table.add_column("Rank", width=15)
     table.add_column("Submission", width=40)
@@ -235,41 +672,44 @@ def load_canonic_answers():
     table.add_column("G", width=20)
     table.add_column("Score", width=20)
 
-    df_records = []
-
-    for i, r in enumerate(rankings):
-        team = r.submission.submission_name
-        signature = r.submission.signature[:8]
-
-        accuracy = 100.0 * r.val_score / (100 - r.no_rank)
-
-        table.add_row(
-            str(i + 1),
-            team.replace("\n", " "),
-            r.submission.signature[:8],
-            f"{r.ref_score:.1f}",
-            f"{r.val_score:.1f}",
-            f"{r.score:.1f}",
-        )
-
-        df_records.append({
-            "rank": i + 1,
-            "team": team.replace("\n", " "),
-            "signature": signature,
-            "R": f"{r.ref_score:.1f}",
-            "G": f"{r.val_score:.1f}",
-            "Score": f"{r.score:.1f}",
-            "Missing": str(r.missing),
-            "Missing Ref": str(r.missing_ref),
-            "No rank": str(r.no_rank),
-            "Val Accuracy": f"{accuracy:.2f} %",
-            "Elapsed": f"{r.elapsed_hours:.2f}"
-        })
-
-    console.print(table)
-    df = pd.DataFrame(df_records)
-    df.to_csv(DIR / "ranking.csv", index=False)
+    for rank, team, signature, r, g, score in zip(rows["rank"], rows["team"], rows["signature"],
+                                                  rows["R"], rows["G"], rows["Score"]):
+        table.add_row(str(rank), team, signature, f"{r:.1f}", f"{g:.1f}", f"{score:.1f}")
+    return table
+
+
+def write_ranking_csv(frame: pd.DataFrame, file: Path = DIR / "ranking.csv"):
+    df = frame.copy()
+    for column in ["R", "G", "Score"]:
+        df[column] = df[column].map("{:.1f}".format)
+    df["Val Accuracy"] = df["Val Accuracy"].map("{:.2f} %".format)
+    df["Elapsed"] = df["Elapsed"].map("{:.2f}".format)
+    df.to_csv(file, index=False)
+
+
+def write_ranking_parquet(frame: pd.DataFrame, file: Path = DIR / "ranking.parquet"):
+    try:
+        frame.to_parquet(file, index=False)
+    except ImportError:
+        print(f"Skipping {file.name}: install pyarrow for Parquet export", file=sys.stderr)
+
+
+@click.command()
+@click.option("--engine", default="matrix", type=click.Choice(list(ENGINES)),
+              help="Scoring engine, 'scalar' is the reference implementation")
+@click.option("--workers", default=0, help="Processes used to load submissions (0 = all cores)")
+@click.option("--cache/--no-cache", default=True, help="Reuse scores of unchanged submissions")
+@click.option("--top", default=50, help="Rows per page printed to the console (0 = all)")
+@click.option("--page", default=1, help="Page of the leaderboard to print")
+@click.option("--parquet/--no-parquet", default=True, help="Also export ranking.parquet")
+@profiled
+def cli(engine: str = "matrix", workers: int = 0, cache: bool = True, top: int = 50, page: int = 1,
+        parquet: bool = True):
+    if profiler.enabled:
+        # phases are only recorded in this process
+        workers = 1
+    load_canonic_answers(engine, workers, cache, top, page, parquet)
 
 
 if __name__ == "__main__":
-    load_canonic_answers()
+    cli()
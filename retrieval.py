@@ -0,0 +1,411 @@
+"""
+Offline page retrieval baselines over the page store.
+
+BM25 keeps an inverted index in flat integer arrays: postings sorted by term,
+with term_offsets[t]:term_offsets[t + 1] pointing at the pages and term counts
+of term t. The dense index hashes unigrams and bigrams into a fixed number of
+buckets and keeps one float32 row per page in a memmapped file that reports
+are appended to. Either way all questions are scored in one batch, and the top
+k pages per question come out as SourceReference lists.
+
+    python retrieval.py bm25 --questions round2/questions.json --k 5
+    python retrieval.py dense --dim 1024
+"""
+import json
+import re
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+import numpy as np
+
+from pages import PAGE_STORE, PageStore, parse_ref
+from profiling import profiler, profiled
+
+DIR = Path(__file__).parent / "round2"
+INDEX_DIR = DIR / "retrieval"
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from had has have if in is it its of on or return that the their "
+    "this to was were what which with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def subset_sha1s(subset: Path = DIR / "subset.json") -> List[str]:
+    return [r["sha1"] for r in json.loads(subset.read_text())]
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Column indices and scores of the k best columns per row, best first.
+    Ties go to the lower column, so results do not depend on argpartition.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((len(scores), 0), dtype=np.int64), np.zeros((len(scores), 0), dtype=scores.dtype)
+    # everything above the k-th score, then the lowest columns that tie with it
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+    above, ties = scores > kth, scores == kth
+    keep = above | (ties & (np.cumsum(ties, axis=1) <= k - above.sum(axis=1, keepdims=True)))
+    idx = np.nonzero(keep)[1].reshape(len(scores), k)
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def restrict(scores: np.ndarray, refs: List[str], routes: List[Optional[List[str]]]) -> np.ndarray:
+    """
+    Zeroes the scores of pages outside the reports a question is routed to.
+    Questions without a route keep every page.
+    """
+    page_sha1s = np.array([ref.partition(":")[0] for ref in refs])
+    for q, sha1s in enumerate(routes):
+        if sha1s:
+            scores[q, ~np.isin(page_sha1s, sha1s)] = 0
+    return scores
+
+
+class BM25Index:
+    def __init__(self, refs: List[str], vocab: List[str], term_offsets: np.ndarray, postings_page: np.ndarray,
+                 postings_tf: np.ndarray, lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.refs = refs  # "sha1:page" per page row
+        self.vocab = {t: i for i, t in enumerate(vocab)}
+        self.term_offsets = term_offsets
+        self.postings_page = postings_page
+        self.postings_tf = postings_tf
+        self.lengths = lengths
+        self.k1, self.b = k1, b
+
+        n = len(refs)
+        df = np.diff(term_offsets)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = lengths.mean() if n else 1.0
+        self._norm = (k1 * (1 - b + b * lengths / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    @profiler.timed("build bm25")
+    def build(cls, store: PageStore, sha1s: List[str]) -> "BM25Index":
+        return cls.from_pages((sha1, store.document(sha1)) for sha1 in sha1s)
+
+    @classmethod
+    def from_pages(cls, docs: Iterable[Tuple[str, Iterable[str]]]) -> "BM25Index":
+        refs, vocab, lengths = [], {}, []
+        terms, pages, tfs = [], [], []
+        for sha1, texts in docs:
+            for page, text in enumerate(texts):
+                counts = Counter(tokenize(text))
+                row = len(refs)
+                refs.append(f"{sha1}:{page}")
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    terms.append(vocab.setdefault(term, len(vocab)))
+                    pages.append(row)
+                    tfs.append(tf)
+
+        terms = np.array(terms, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return cls(refs, list(vocab), offsets, np.array(pages, dtype=np.int32)[order],
+                   np.array(tfs, dtype=np.int32)[order], np.array(lengths, dtype=np.float32))
+
+    def save(self, file: Path):
+        file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(file, refs=np.array(self.refs), vocab=np.array(list(self.vocab)), term_offsets=self.term_offsets,
+                 postings_page=self.postings_page, postings_tf=self.postings_tf, lengths=self.lengths)
+
+    @classmethod
+    def load(cls, file: Path) -> "BM25Index":
+        with np.load(file) as data:
+            return cls(data["refs"].tolist(), data["vocab"].tolist(), data["term_offsets"], data["postings_page"],
+                       data["postings_tf"], data["lengths"])
+
+    def scores(self, queries: List[str]) -> np.ndarray:
+        """
+        BM25 score of every page for every query, as a (queries, pages) matrix.
+        """
+        result = np.zeros((len(queries), len(self.refs)), dtype=np.float32)
+        by_term: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for q, text in enumerate(queries):
+            for term, n in Counter(tokenize(text)).items():
+                if term in self.vocab:
+                    by_term[self.vocab[term]].append((q, n))
+
+        k1 = self.k1
+        for term, hits in by_term.items():
+            start, end = self.term_offsets[term], self.term_offsets[term + 1]
+            pages = self.postings_page[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            weight = self.idf[term] * tf * (k1 + 1) / (tf + self._norm[pages])
+            rows = np.array([q for q, _ in hits])
+            counts = np.array([n for _, n in hits], dtype=np.float32)
+            result[np.ix_(rows, pages)] += np.outer(counts, weight)
+        return result
+
+    def search(self, queries: List[str], k: int = 5,
+               routes: Optional[List[Optional[List[str]]]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Top k (sha1:page, score) per query, pages without a matching term left out.
+        With routes, only pages of the routed sha1s count for a query.
+        """
+        scores = self.scores(queries)
+        if routes is not None:
+            restrict(scores, self.refs, routes)
+        idx, vals = top_k(scores, k)
+        return [[(self.refs[i], float(v)) for i, v in zip(row, row_vals) if v > 0]
+                for row, row_vals in zip(idx.tolist(), vals.tolist())]
+
+
+def load_or_build_bm25(store: PageStore, sha1s: List[str], file: Path, rebuild: bool = False) -> BM25Index:
+    if file.exists() and not rebuild:
+        index = BM25Index.load(file)
+        # reuse only if it covers the same reports
+        if sorted({parse_ref(r)[0] for r in index.refs}) == sorted(s for s in sha1s if store.pages(s)):
+            return index
+    index = BM25Index.build(store, sha1s)
+    index.save(file)
+    return index
+
+
+def _features(text: str) -> List[str]:
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _hashes(features: List[str]) -> np.ndarray:
+    # crc32 instead of hash(): str hashes are salted per process
+    known = {f: zlib.crc32(f.encode("utf-8")) for f in set(features)}
+    return np.fromiter(map(known.__getitem__, features), dtype=np.uint32, count=len(features))
+
+
+class HashedEmbedder:
+    """
+    Unigrams and bigrams hashed into dim signed buckets, sublinear term counts,
+    rows L2-normalized. Bit 31 of the hash picks the sign, the low bits the bucket.
+    """
+
+    def __init__(self, dim: int):
+        if dim & (dim - 1) or not 0 < dim <= 1 << 24:
+            raise ValueError(f"dim must be a power of two up to 2^24, not {dim}")
+        self.dim = dim
+
+    def embed(self, texts: List[str], idf: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectors of the texts, and how many of them touch each bucket.
+        """
+        rows, features, tfs = [], [], []
+        for row, text in enumerate(texts):
+            counts = Counter(_features(text))
+            rows.append(np.full(len(counts), row, dtype=np.int64))
+            features.extend(counts)
+            tfs.extend(counts.values())
+
+        h = _hashes(features)
+        buckets = (h & np.uint32(self.dim - 1)).astype(np.int64)
+        weight = 1 + np.log(np.array(tfs, dtype=np.float32))
+        weight[h >> np.uint32(31) == 1] *= -1
+        if idf is not None:
+            weight *= idf[buckets]
+        cells = (np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)) * self.dim + buckets
+        shape = (len(texts), self.dim)
+        out = np.bincount(cells, weights=weight, minlength=shape[0] * shape[1]).astype(np.float32).reshape(shape)
+        df = (np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape) > 0).sum(axis=0)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        out /= np.where(norms == 0, 1, norms)
+        return out, df
+
+
+class DenseIndex:
+    """
+    Hashed TF vectors of every page, float32 rows appended to vectors.f32 and
+    read through a memmap. index.npz holds the reports (sha1, first row, pages)
+    and the document frequency of every bucket; it is replaced atomically after
+    the rows are written, so it is what marks them as present. IDF is applied on
+    the query side only, so appending reports never rewrites existing rows.
+    """
+
+    def __init__(self, folder: Path = INDEX_DIR / "dense", dim: int = 1024):
+        self.folder = folder
+        self.docs: Dict[str, Tuple[int, int]] = {}
+        self.df = np.zeros(dim, dtype=np.int64)
+        if (folder / "index.npz").exists():
+            with np.load(folder / "index.npz") as data:
+                docs, self.df = data["docs"], data["df"]
+            self.docs = {sha1: (first, count) for sha1, first, count in zip(docs["sha1"].tolist(),
+                                                                            docs["first"].tolist(),
+                                                                            docs["count"].tolist())}
+        self.embedder = HashedEmbedder(len(self.df))
+        self.vectors = self._map()
+
+    @property
+    def dim(self) -> int:
+        return self.embedder.dim
+
+    @property
+    def rows(self) -> int:
+        return sum(count for _, count in self.docs.values())
+
+    def __contains__(self, sha1: str) -> bool:
+        return sha1 in self.docs
+
+    def _map(self) -> np.ndarray:
+        if not self.rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.folder / "vectors.f32", dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+    def append(self, docs: Iterable[Tuple[str, Iterable[str]]]) -> List[str]:
+        """
+        Embeds and appends the reports that are not in the index yet. Returns their sha1s.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        added = []
+        rows = self.rows
+        with open(self.folder / "vectors.f32", "ab") as out:
+            # drop rows an interrupted append left behind
+            out.truncate(rows * self.dim * 4)
+            out.seek(rows * self.dim * 4)
+            for sha1, texts in docs:
+                if sha1 in self.docs:
+                    continue
+                vectors, df = self.embedder.embed(list(texts))
+                out.write(vectors.tobytes())
+                self.docs[sha1] = (rows, len(vectors))
+                self.df += df
+                rows += len(vectors)
+                added.append(sha1)
+
+        docs = np.array([(sha1, first, count) for sha1, (first, count) in self.docs.items()],
+                        dtype=[("sha1", "U40"), ("first", "i8"), ("count", "i4")])
+        tmp = self.folder / "index.npz.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, docs=docs, df=self.df)
+        tmp.replace(self.folder / "index.npz")
+        self.vectors = self._map()
+        return added
+
+    def idf(self) -> np.ndarray:
+        return (np.log((1 + self.rows) / (1 + self.df)) + 1).astype(np.float32)
+
+    def search(self, queries: List[str], k: int = 5, sha1s: Optional[List[str]] = None,
+               routes: Optional[List[Optional[List[str]]]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Top k (sha1:page, cosine) per query over the pages of sha1s (default: all),
+        scored with one matrix product. With routes, only pages of the routed sha1s
+        count for a query.
+        """
+        docs = [(s, *self.docs[s]) for s in (self.docs if sha1s is None else sha1s) if s in self.docs]
+        refs = [f"{sha1}:{page}" for sha1, _, count in docs for page in range(count)]
+        if sha1s is None:
+            matrix = self.vectors
+        else:
+            matrix = self.vectors[np.concatenate([np.arange(first, first + count) for _, first, count in docs]
+                                                 or [np.zeros(0, dtype=np.int64)])]
+        q, _ = self.embedder.embed(queries, self.idf())
+        scores = q @ matrix.T
+        if routes is not None:
+            restrict(scores, refs, routes)
+        idx, vals = top_k(scores, k)
+        return [[(refs[i], float(v)) for i, v in zip(row, row_vals) if v > 0]
+                for row, row_vals in zip(idx.tolist(), vals.tolist())]
+
+
+def write_references(file: Path, questions: List[dict], results: List[List[Tuple[str, float]]]):
+    """
+    One answer per question with the retrieved pages as SourceReference dicts, best first.
+    """
+    answers = []
+    for q, hits in zip(questions, results):
+        refs = [parse_ref(ref) for ref, _ in hits]
+        answers.append({
+            "question_text": q["text"],
+            "kind": q["kind"],
+            "value": "N/A",
+            "references": [{"pdf_sha1": sha1, "page_index": page} for sha1, page in refs],
+            "scores": [round(score, 4) for _, score in hits],
+        })
+    file.write_text(json.dumps(answers, indent=2))
+
+
+def question_routes(questions: List[dict], subset: Path) -> List[List[str]]:
+    from router import CompanyRouter
+
+    with profiler.phase("route questions"):
+        router = CompanyRouter.from_subset(subset)
+        return [router.route(q["text"]) for q in questions]
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--questions", default=str(DIR / "questions.json"), help="Questions to retrieve pages for")
+@click.option("--subset", default=str(DIR / "subset.json"), help="Reports to index")
+@click.option("--store", default=str(PAGE_STORE), help="Page store folder")
+@click.option("--index", default=str(INDEX_DIR / "bm25.npz"), help="Where the index is kept")
+@click.option("--rebuild/--no-rebuild", default=False, help="Rebuild the index even if it covers the subset")
+@click.option("--k", default=5, help="Pages per question")
+@click.option("--route/--no-route", default=False, help="Only search the reports of the companies a question names")
+@click.option("--output", default="retrieval_bm25.json", help="Retrieved references per question")
+@profiled
+def bm25(questions: str, subset: str, store: str, index: str, rebuild: bool = False, k: int = 5,
+         route: bool = False, output: str = "retrieval_bm25.json"):
+    """Top k pages per question by BM25"""
+    pages = PageStore(Path(store))
+    sha1s = subset_sha1s(Path(subset))
+    absent = [s for s in sha1s if not pages.pages(s)]
+    if absent:
+        print(f"{len(absent)} subset reports are not in the page store, e.g. {absent[0]}")
+
+    bm = load_or_build_bm25(pages, sha1s, Path(index), rebuild)
+    qs = json.loads(Path(questions).read_text())
+    routes = question_routes(qs, Path(subset)) if route else None
+    with profiler.phase("search bm25"):
+        results = bm.search([q["text"] for q in qs], k, routes)
+    write_references(Path(output), qs, results)
+    print(f"{len(qs)} questions against {len(bm.refs)} pages of {len(sha1s) - len(absent)} reports, "
+          f"written to {output}")
+
+
+@cli.command()
+@click.option("--questions", default=str(DIR / "questions.json"), help="Questions to retrieve pages for")
+@click.option("--subset", default=str(DIR / "subset.json"), help="Reports to search")
+@click.option("--store", default=str(PAGE_STORE), help="Page store folder")
+@click.option("--index", default=str(INDEX_DIR / "dense"), help="Index folder, reports missing there are appended")
+@click.option("--dim", default=1024, help="Hash buckets of a new index (power of two)")
+@click.option("--k", default=5, help="Pages per question")
+@click.option("--route/--no-route", default=False, help="Only search the reports of the companies a question names")
+@click.option("--output", default="retrieval_dense.json", help="Retrieved references per question")
+@profiled
+def dense(questions: str, subset: str, store: str, index: str, dim: int = 1024, k: int = 5, route: bool = False,
+          output: str = "retrieval_dense.json"):
+    """Top k pages per question by hashed TF-IDF cosine"""
+    pages = PageStore(Path(store))
+    sha1s = [s for s in subset_sha1s(Path(subset)) if pages.pages(s)]
+    try:
+        vi = DenseIndex(Path(index), dim)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--dim")
+    if vi.dim != dim:
+        print(f"{index} has {vi.dim} buckets, --dim only applies to new indexes")
+
+    with profiler.phase("append dense"):
+        added = vi.append((s, pages.document(s)) for s in sha1s if s not in vi)
+    qs = json.loads(Path(questions).read_text())
+    routes = question_routes(qs, Path(subset)) if route else None
+    with profiler.phase("search dense"):
+        results = vi.search([q["text"] for q in qs], k, sha1s, routes)
+    write_references(Path(output), qs, results)
+    print(f"{len(qs)} questions against {sum(pages.pages(s) for s in sha1s)} pages of {len(sha1s)} reports "
+          f"({len(added)} newly indexed), written to {output}")
+
+
+if __name__ == "__main__":
+    cli()
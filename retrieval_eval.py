@@ -0,0 +1,190 @@
+"""
+Page retrieval metrics against the reference pools of answers.json.
+
+A run is one ranked list of "sha1:page" per question, e.g. the output of
+retrieval.py. Every run of a sweep is stacked into one bool array of the pools
+each candidate is in, (runs, questions, depth, pools), from which recall, MRR,
+full pool coverage and the ref_score rank.py would give the top k are read for
+every k at once.
+
+    python retrieval_eval.py retrieval_bm25.json retrieval_dense.json sweep/ --ks 1,3,5,10
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+import rank
+from profiling import profiler, profiled
+
+
+def load_run(file: Path) -> Dict[str, List[str]]:
+    """
+    Ranked "sha1:page" per question, from a list of answers (retrieval.py output),
+    a submission or a plain {question: [refs]} mapping.
+    """
+    data = json.loads(file.read_text())
+    if isinstance(data, dict) and "answers" in data:
+        data = data["answers"]
+    if isinstance(data, dict):
+        return {q: list(refs) for q, refs in data.items()}
+    return {a["question_text"]: [f"{r['pdf_sha1']}:{r['page_index']}" for r in a.get("references", [])]
+            for a in data}
+
+
+def run_files(paths: Tuple[str, ...]) -> List[Path]:
+    files = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.glob("*.json")) if p.is_dir() else [p])
+    return files
+
+
+@dataclass
+class RetrievalMetrics:
+    # (runs, depth), column k - 1 holds the value at k
+    recall: np.ndarray  # share of pools with a page in the top k, per question with pools
+    coverage: np.ndarray  # share of questions with pools that have every pool in the top k
+    mrr: np.ndarray  # 1 / rank of the first page in any pool, 0 beyond k
+    ref_score: np.ndarray  # mean ref_score of rank.py over ranked questions, submitting the top k
+
+
+class RetrievalEvaluator:
+    def __init__(self, schemas: Dict[str, rank.CanonicData]):
+        self.gt = rank.GroundTruthIndex(schemas)
+        # rank.py only scores refs of questions with answers
+        self.columns = np.array([j for j, d in enumerate(schemas.values()) if d.answers], dtype=np.int64)
+        self.pools = np.array(self.gt.pool_counts, dtype=np.int64)[self.columns]
+        # rank.py keeps pools as bits of a Python int, unbounded; here one bool per pool, in
+        # a table of pool rows with row 0 for refs outside every pool
+        self.width = max(int(self.pools.max(initial=0)), 1)
+        self.rows: List[Dict[int, int]] = []
+        table = [(False,) * self.width]
+        for c in self.columns.tolist():
+            masks = self.gt.pool_masks[c]
+            self.rows.append({ref: len(table) + i for i, ref in enumerate(masks)})
+            table.extend(tuple(bool(mask >> p & 1) for p in range(self.width)) for mask in masks.values())
+        self.table = np.array(table, dtype=bool)
+
+    def masks(self, runs: List[Dict[str, List[str]]], depth: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (runs, questions, depth, pools) of which pools every candidate is in, and
+        which slots hold a candidate at all.
+        """
+        shape = (len(runs), len(self.columns), depth)
+        row = {int(c): i for i, c in enumerate(self.columns)}
+        ref_ids = self.gt.ref_ids
+        starts, lengths, table_rows = [], [], []
+        for r, run in enumerate(runs):
+            for text, refs in run.items():
+                q = row.get(self.gt.questions.column(text))
+                if q is None:
+                    continue
+                rows = self.rows[q]
+                refs = refs[:depth]
+                starts.append((r * shape[1] + q) * depth)
+                lengths.append(len(refs))
+                table_rows += [rows.get(ref_ids.get(ref, -1), 0) for ref in refs]
+
+        # flat slot of every candidate: its list's first slot plus its rank in the list
+        lengths = np.array(lengths, dtype=np.int64)
+        ranks = np.arange(len(table_rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        slots = np.repeat(np.array(starts, dtype=np.int64), lengths) + ranks
+        bits = np.zeros((np.prod(shape, dtype=np.int64), self.width), dtype=bool)
+        filled = np.zeros(len(bits), dtype=bool)
+        bits[slots] = self.table[table_rows]
+        filled[slots] = True
+        return bits.reshape(*shape, self.width), filled.reshape(shape)
+
+    @profiler.timed("evaluate runs")
+    def evaluate(self, runs: List[Dict[str, List[str]]], depth: Optional[int] = None) -> RetrievalMetrics:
+        if depth is None:
+            depth = max((len(refs) for run in runs for refs in run.values()), default=0)
+        depth = max(depth, 1)
+        bits, filled = self.masks(runs, depth)
+        n_runs, n_q = bits.shape[:2]
+        pools = self.pools
+        with_pools = pools > 0
+
+        # rank at which each pool is hit first, counted per (run, question, rank)
+        hit = bits.any(axis=2)
+        first = bits.argmax(axis=2)
+        cell = (np.arange(n_runs * n_q).reshape(n_runs, n_q, 1) * depth + first)[hit]
+        pools_hit = np.cumsum(np.bincount(cell, minlength=n_runs * n_q * depth).reshape(n_runs, n_q, depth), axis=2)
+
+        relevant = bits.any(axis=3)
+        first_any = np.where(relevant.any(axis=2), relevant.argmax(axis=2), depth)
+        ks = np.arange(depth)
+        rr = np.where(first_any[..., None] <= ks, 1 / (first_any[..., None] + 1.0), 0.0)
+
+        stray = np.cumsum(filled & ~relevant, axis=2)
+        missing = pools[None, :, None] - pools_hit
+        # same floats as rank.score_refs, looked up rather than recomputed
+        table = np.array([[rank.score_refs(s, m) for m in range(int(pools.max(initial=0)) + 1)]
+                          for s in range(depth + 1)])
+        ref_score = table[stray, missing]
+
+        n_pools = max(int(with_pools.sum()), 1)
+        return RetrievalMetrics(
+            recall=(pools_hit[:, with_pools] / pools[with_pools, None]).sum(axis=1) / n_pools,
+            coverage=(missing[:, with_pools] == 0).sum(axis=1) / n_pools,
+            mrr=rr[:, with_pools].sum(axis=1) / n_pools,
+            ref_score=ref_score.mean(axis=1) if n_q else np.zeros((n_runs, depth)),
+        )
+
+
+def metrics_frame(names: List[str], metrics: RetrievalMetrics) -> pd.DataFrame:
+    # one row per run and k
+    runs, depth = metrics.recall.shape
+    return pd.DataFrame({
+        "run": np.repeat(names, depth),
+        "k": np.tile(np.arange(1, depth + 1), runs),
+        "recall": metrics.recall.ravel(),
+        "coverage": metrics.coverage.ravel(),
+        "mrr": metrics.mrr.ravel(),
+        "ref_score": metrics.ref_score.ravel(),
+    })
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option("--depth", default=0, help="Candidates per question to evaluate (0 = longest list)")
+@click.option("--ks", default="1,3,5,10", help="k values to print")
+@click.option("--top", default=20, help="Runs to print, best MRR first")
+@click.option("--output", default="retrieval_eval.csv", help="Metrics of every run at every k")
+@profiled
+def cli(paths: Tuple[str, ...], depth: int = 0, ks: str = "1,3,5,10", top: int = 20,
+        output: str = "retrieval_eval.csv"):
+    """Recall@k, MRR, pool coverage and ref_score of ranked page lists"""
+    files = run_files(paths)
+    with profiler.phase("load runs"):
+        runs = [load_run(f) for f in files]
+
+    evaluator = RetrievalEvaluator(rank.load_canonic_file().root)
+    metrics = evaluator.evaluate(runs, depth or None)
+    frame = metrics_frame([f.stem for f in files], metrics)
+    frame.to_csv(output, index=False)
+
+    depth = metrics.recall.shape[1]
+    shown = [k for k in (int(v) for v in ks.split(",") if v) if 1 <= k <= depth]
+    best_k = metrics.ref_score.argmax(axis=1)
+    table = Table(title=f"{len(files)} runs, {int((evaluator.pools > 0).sum())} questions with reference pools")
+    table.add_column("run")
+    for name in [f"R@{k}" for k in shown] + [f"cov@{k}" for k in shown] + [f"MRR@{depth}", "best k", "ref_score"]:
+        table.add_column(name, justify="right")
+    for r in np.argsort(-metrics.mrr[:, -1], kind="stable")[:top]:
+        table.add_row(files[r].stem,
+                      *[f"{metrics.recall[r, k - 1]:.3f}" for k in shown],
+                      *[f"{metrics.coverage[r, k - 1]:.3f}" for k in shown],
+                      f"{metrics.mrr[r, -1]:.3f}", str(best_k[r] + 1), f"{metrics.ref_score[r, best_k[r]]:.3f}")
+    Console(width=160).print(table)
+    print(f"Written to {output}")
+
+
+if __name__ == "__main__":
+    cli()
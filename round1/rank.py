@@ -1,14 +1,35 @@
 import importlib
+import importlib.util
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import click
 
 import pandas as pd
 
+# the question registry shared with round 2, loaded by path like teams.py
+_spec = importlib.util.spec_from_file_location("questions", Path(__file__).resolve().parent.parent / "questions.py")
+questions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(questions)
+
 VALID_NONES = ["N/A", "n/a"]
 
+# some teams read the UTF-8 questions with one of these, e.g. "DepÃ³sitos"
+MANGLED_ENCODINGS = ["cp1252", "latin-1", "cp1251"]
+
+
+def question_column(registry, question: str) -> Optional[int]:
+    column = registry.column(question)
+    for encoding in MANGLED_ENCODINGS:
+        if column is not None:
+            break
+        try:
+            column = registry.column(question.encode(encoding).decode("utf-8"))
+        except UnicodeError:
+            pass
+    return column
+
 
 def get_answer_category(expected_answers: list) -> (str, float):
     # if N/A is a valid answer, return, then it can be guessed, score it lower
@@ -83,16 +104,18 @@ def rank_team(expected, file) -> TeamRank:
         answer_list = [a["answer"] for a in submission]
         question_list = [a["question"] for a in submission]
 
+    # match answers to questions by normalized question id, not by position
+    registry = questions.QuestionRegistry(ex["question"] for ex in expected)
+    answers = [None] * len(expected)
+    for answer, question in zip(answer_list, question_list):
+        column = question_column(registry, question)
+        if column is None:
+            raise Exception(f"Unknown question: {question}")
+        answers[column] = answer
+
     score = 0
     ideal_score = 0
-    for answer, question, ex in zip(answer_list, question_list, expected):
-
-        # check if the question is the same. Use only first 20 letters, as some teams
-        # didn't handle unicode symbols correctly
-        if question[:20] != ex["question"][:20]:
-            # use red ANSI color
-            raise Exception(f"Question mismatch: {question} != {ex['question']}")
-
+    for answer, ex in zip(answers, expected):
         valid_answers = ex["answer"]
         schema = ex["schema"]
 
@@ -113,10 +136,7 @@ def rank_team(expected, file) -> TeamRank:
     if score < 0:
         score = 0
 
-    return TeamRank(team, int(score), answer_list)
-
-
-import importlib.util
+    return TeamRank(team, int(score), answers)
 
 
 @click.command()
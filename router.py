@@ -0,0 +1,137 @@
+"""
+Routes questions to the reports of the companies they name.
+
+Every subset company name is folded (NFKC, case, punctuation to spaces) and
+registered with its variants: without the legal form ("Inc.", "plc", "Limited",
+...) and without a leading "The". Variants that would point at more than one
+company are left out. All variants go into one scanner.Automaton, so a question
+is read once however many companies there are, and compare questions get every
+company they list, in order.
+
+    python router.py --questions round2/questions.json --output routes.json
+"""
+import json
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Set
+
+import click
+import pandas as pd
+
+import rank
+from scanner import Automaton, Pattern
+
+LEGAL_FORMS = frozenset(
+    "inc incorporated corp corporation co company ltd limited plc llc lp ag sa se nv spa asa ab oyj".split())
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def fold(text: str) -> str:
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def variants(name: str) -> List[str]:
+    """
+    Folded name first, then shorter forms that still identify the company.
+    """
+    words = fold(name).split()
+    result = [" ".join(words)]
+    if words[:1] == ["the"] and len(words) > 1:
+        words = words[1:]
+        result.append(" ".join(words))
+    while len(words) > 1 and words[-1] in LEGAL_FORMS:
+        words = words[:-1]
+        result.append(" ".join(words))
+    # a single short word is too likely to occur on its own
+    return [v for i, v in enumerate(result) if i == 0 or len(v) >= 3]
+
+
+class CompanyRouter:
+    def __init__(self, companies: Dict[str, List[str]]):
+        """
+        companies: company name -> sha1s of its reports
+        """
+        self.sha1s = companies
+        # folded full name -> company names, usually one
+        self.names: Dict[str, List[str]] = defaultdict(list)
+        for name in companies:
+            self.names[fold(name)].append(name)
+
+        owners: Dict[str, Set[str]] = defaultdict(set)
+        for key in self.names:
+            for v in variants(key)[1:]:
+                if v not in self.names:
+                    owners[v].add(key)
+
+        patterns = [Pattern(key, key, "company", case_sensitive=False, word_start=True, word_end=True)
+                    for key in self.names]
+        patterns += [Pattern(v, next(iter(keys)), "company", case_sensitive=False, word_start=True, word_end=True)
+                     for v, keys in owners.items() if len(keys) == 1]
+        self.automaton = Automaton(patterns)
+
+    @classmethod
+    def from_subset(cls, file: Path = rank.DIR / "subset.json") -> "CompanyRouter":
+        records = pd.read_csv(file) if file.suffix == ".csv" else pd.DataFrame(json.loads(file.read_text()))
+        companies: Dict[str, List[str]] = defaultdict(list)
+        for name, sha1 in zip(records["company_name"], records["sha1"]):
+            companies[name].append(sha1)
+        return cls(dict(companies))
+
+    def companies(self, question: str) -> List[str]:
+        """
+        Companies named in the question, in order of appearance.
+        """
+        found = []
+        for _, _, pid in self.automaton.select(fold(question)):
+            for name in self.names[self.automaton.patterns[pid].label]:
+                if name not in found:
+                    found.append(name)
+        return found
+
+    def route(self, question: str) -> List[str]:
+        return [sha1 for name in self.companies(question) for sha1 in self.sha1s[name]]
+
+
+def routing_recall(routes: Dict[str, List[str]], schemas: Dict[str, rank.CanonicData]) -> float:
+    """
+    Share of the reference pools with at least one page in a routed report.
+    """
+    registry = rank.QuestionRegistry(routes)
+    hit = total = 0
+    for text, data in schemas.items():
+        column = registry.column(text)
+        routed = set(routes[registry.texts[column]]) if column is not None else set()
+        for pool in data.reference_pools:
+            total += 1
+            hit += any(ref.partition(":")[0] in routed for ref in pool)
+    return hit / total if total else 1.0
+
+
+@click.command()
+@click.option("--questions", default=str(rank.DIR / "questions.json"), help="Questions to route")
+@click.option("--subset", default=str(rank.DIR / "subset.json"), help="Subset with company_name and sha1")
+@click.option("--output", default="routes.json", help="Companies and sha1s per question")
+def cli(questions: str, subset: str, output: str = "routes.json"):
+    """Candidate reports for every question, from the company names in it"""
+    router = CompanyRouter.from_subset(Path(subset))
+    qs = json.loads(Path(questions).read_text())
+
+    result, routes = [], {}
+    for q in qs:
+        companies = router.companies(q["text"])
+        routes[q["text"]] = [sha1 for name in companies for sha1 in router.sha1s[name]]
+        result.append({"question_text": q["text"], "companies": companies, "sha1s": routes[q["text"]]})
+    Path(output).write_text(json.dumps(result, indent=2))
+
+    sizes = Counter(len(r["sha1s"]) for r in result)
+    print("Reports per question: " + ", ".join(f"{n}: {sizes[n]}" for n in sorted(sizes)))
+    if (rank.DIR / "answers.json").exists() and Path(questions).parent == rank.DIR:
+        print(f"Reference pools in routed reports: {routing_recall(routes, rank.load_canonic_file().root):.1%}")
+    print(f"{len(result)} questions, written to {output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,258 @@
+"""
+Single-pass multi-pattern scanner for report text.
+
+One Aho-Corasick automaton holds every currency marker and flag keyword, so a
+page is read once however many patterns there are. Matches are leftmost-longest
+and non-overlapping within a group, ISO codes count as whole words only and
+symbols only when not glued to a preceding letter ("C$" is not "$"). Keywords
+ignore (ASCII) case, currency markers do not.
+
+The keyword hits are a cheap first guess for the AnnualReportInfo flags:
+
+    python scanner.py 446545ae548543d8744f8d885ff75face3424ba4    # from the page store
+"""
+import json
+import string
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+
+CURRENCY_MARKERS = {
+    "USD": ["USD", "US$", "$"],
+    "EUR": ["EUR", "€"],
+    "GBP": ["GBP", "£"],
+    "JPY": ["JPY", "¥"],
+    "CHF": ["CHF"],
+    "CAD": ["CAD", "C$"],
+    "AUD": ["AUD", "A$"],
+    "CNY": ["CNY", "RMB"],
+    "INR": ["INR", "₹"],
+    "SEK": ["SEK"],
+    "NOK": ["NOK"],
+    "DKK": ["DKK"],
+    "HKD": ["HKD", "HK$"],
+    "SGD": ["SGD", "S$"],
+    "KRW": ["KRW", "₩"],
+    "BRL": ["BRL", "R$"],
+    "ZAR": ["ZAR"],
+    "MXN": ["MXN"],
+    "ILS": ["ILS", "₪"],
+}
+
+# AnnualReportInfo flag -> phrases that suggest it
+FLAG_KEYWORDS = {
+    "mentions_recent_mergers_and_acquisitions": ["merger", "acquisition", "acquired", "business combination"],
+    "has_leadership_changes": ["appointed", "resigned", "retired as", "successor", "new chief executive"],
+    "has_layoffs": ["layoff", "laid off", "reduction in force", "workforce reduction", "headcount reduction"],
+    "has_executive_compensation": ["executive compensation", "summary compensation table", "named executive officer"],
+    "has_rnd_investment_numbers": ["research and development expense", "r&d expense", "research and development costs"],
+    "has_new_product_launches": ["launched", "product launch", "introduced new", "new product"],
+    "has_capital_expenditures": ["capital expenditure", "purchases of property and equipment", "capex"],
+    "has_financial_performance_indicators": ["total revenue", "net income", "operating income", "ebitda"],
+    "has_dividend_policy_changes": ["dividend policy", "increased dividend", "suspended dividend", "dividend increase"],
+    "has_share_buyback_plans": ["share repurchase", "stock repurchase", "buyback", "repurchase program"],
+    "has_capital_structure_changes": ["stock split", "reverse split", "convertible notes", "recapitalization"],
+    "mentions_new_risk_factors": ["new risk", "emerging risk", "risk factors"],
+    "has_guidance_updates": ["guidance", "outlook for fiscal", "we expect revenue"],
+    "has_regulatory_or_litigation_issues": ["litigation", "lawsuit", "legal proceedings", "regulatory investigation"],
+    "has_strategic_restructuring": ["restructuring", "reorganization", "strategic review"],
+    "has_supply_chain_disruptions": ["supply chain disruption", "supply chain", "shortage of components"],
+    "has_esg_initiatives": ["esg", "sustainability", "greenhouse gas", "net zero", "carbon emissions"],
+}
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_ASCII_LETTERS = frozenset(string.ascii_letters)
+
+
+@dataclass(frozen=True)
+class Pattern:
+    text: str
+    label: str  # what a hit counts towards: currency code or flag
+    group: str  # matches only exclude overlapping matches of their own group
+    case_sensitive: bool = True
+    word_start: bool = False  # no letter or digit right before
+    word_end: bool = False  # no letter or digit right after
+    letter_start: bool = False  # no ASCII letter right before
+
+
+def currency_patterns(markers: Dict[str, List[str]] = CURRENCY_MARKERS) -> List[Pattern]:
+    result = []
+    for code, ms in markers.items():
+        for m in ms:
+            if m.isalpha():
+                result.append(Pattern(m, code, "currency", word_start=True, word_end=True))
+            else:
+                result.append(Pattern(m, code, "currency", letter_start=True))
+    return result
+
+
+def keyword_patterns(keywords: Dict[str, List[str]] = FLAG_KEYWORDS) -> List[Pattern]:
+    return [Pattern(k.lower(), flag, "keywords", case_sensitive=False, word_start=True)
+            for flag, phrases in keywords.items() for k in phrases]
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class Automaton:
+    """
+    Aho-Corasick over ASCII-lowercased text, compiled into a DFA: every state has
+    the transitions of its fail chain folded in, so a character costs one dict
+    lookup. Characters that no pattern contains go straight back to the root.
+    """
+
+    def __init__(self, patterns: List[Pattern]):
+        self.patterns = patterns
+        goto: List[Dict[str, int]] = [{}]
+        ends: List[List[int]] = [[]]
+        for i, p in enumerate(patterns):
+            state = 0
+            for ch in p.text.translate(_ASCII_LOWER):
+                if ch not in goto[state]:
+                    goto.append({})
+                    ends.append([])
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            ends[state].append(i)
+
+        # breadth first, so the fail target of a state is complete before it is folded in
+        fail = [0] * len(goto)
+        self.delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        self.out: List[Tuple[int, ...]] = [tuple(ends[0])] + [()] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.delta[state] = {**self.delta[fail[state]], **goto[state]}
+            self.out[state] = tuple(ends[state]) + self.out[fail[state]]
+            for ch, child in goto[state].items():
+                fail[child] = self.delta[fail[state]].get(ch, 0)
+                queue.append(child)
+
+    def matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        (start, end, pattern) of every match that passes its boundary rules, by end.
+        """
+        folded = text.translate(_ASCII_LOWER)
+        delta, out, patterns = self.delta, self.out, self.patterns
+        found = []
+        state = 0
+        for i, ch in enumerate(folded):
+            state = delta[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            for pid in out[state]:
+                p = patterns[pid]
+                start = end - len(p.text)
+                if p.case_sensitive and text[start:end] != p.text:
+                    continue
+                before = text[start - 1] if start else ""
+                if p.word_start and before and _is_word(before):
+                    continue
+                if p.letter_start and before in _ASCII_LETTERS:
+                    continue
+                if p.word_end and end < len(text) and _is_word(text[end]):
+                    continue
+                found.append((start, end, pid))
+        return found
+
+    def select(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        (start, end, pattern) of the leftmost-longest of overlapping matches per group, by start.
+        """
+        chosen = []
+        last_end: Dict[str, int] = {}
+        for start, end, pid in sorted(self.matches(text), key=lambda m: (m[0], m[0] - m[1])):
+            group = self.patterns[pid].group
+            if start < last_end.get(group, 0):
+                continue
+            last_end[group] = end
+            chosen.append((start, end, pid))
+        return chosen
+
+    def count(self, text: str) -> Dict[str, Counter]:
+        """
+        Hits per label, per group, keeping the leftmost-longest of overlapping matches.
+        """
+        result: Dict[str, Counter] = {}
+        for _, _, pid in self.select(text):
+            p = self.patterns[pid]
+            result.setdefault(p.group, Counter())[p.label] += 1
+        return result
+
+
+class ReportScanner:
+    """
+    Streams the pages of one report and accumulates the currency histogram and
+    keyword hits.
+    """
+
+    def __init__(self, automaton: Automaton):
+        self.automaton = automaton
+        self.counts: Dict[str, Counter] = {}
+
+    def feed(self, page: str):
+        for group, counts in self.automaton.count(page).items():
+            self.counts.setdefault(group, Counter()).update(counts)
+
+    @property
+    def currency(self) -> Dict[str, int]:
+        # most mentioned first, like the histograms in dataset.json
+        return dict(self.counts.get("currency", Counter()).most_common())
+
+    @property
+    def keywords(self) -> Dict[str, int]:
+        return dict(self.counts.get("keywords", Counter()))
+
+    def flags(self, min_hits: int = 3) -> Dict[str, bool]:
+        """
+        First guess at the AnnualReportInfo flags, to be confirmed by a closer read.
+        """
+        hits = self.keywords
+        return {flag: hits.get(flag, 0) >= min_hits for flag in FLAG_KEYWORDS}
+
+
+_default: Optional[Automaton] = None
+
+
+def default_automaton() -> Automaton:
+    global _default
+    if _default is None:
+        _default = Automaton(currency_patterns() + keyword_patterns())
+    return _default
+
+
+def scan_pages(pages: Iterable[str], automaton: Optional[Automaton] = None) -> ReportScanner:
+    scanner = ReportScanner(automaton or default_automaton())
+    for page in pages:
+        scanner.feed(page)
+    return scanner
+
+
+@click.command()
+@click.argument("sha1s", nargs=-1)
+@click.option("--store", default=None, help="Page store folder (default: round2/pages)")
+@click.option("--keywords", default=None, help="JSON of flag -> phrases, replaces the built-in keywords")
+@click.option("--min-hits", default=3, help="Keyword hits that make a flag true")
+def cli(sha1s: Tuple[str, ...] = (), store: Optional[str] = None, keywords: Optional[str] = None, min_hits: int = 3):
+    """Currency histogram, keyword hits and flag guesses for reports in the page store"""
+    from pages import PAGE_STORE, PageStore
+
+    pages = PageStore(Path(store) if store else PAGE_STORE)
+    phrases = json.loads(Path(keywords).read_text()) if keywords else FLAG_KEYWORDS
+    automaton = Automaton(currency_patterns() + keyword_patterns(phrases))
+
+    result = {}
+    for sha1 in sha1s or list(pages.docs):
+        scanner = scan_pages(pages.document(sha1), automaton)
+        result[sha1] = {"currency": scanner.currency, "keywords": scanner.keywords,
+                        "flags": scanner.flags(min_hits)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
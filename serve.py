@@ -0,0 +1,252 @@
+"""
+Local submission intake and live leaderboard for the challenge window.
+
+Runs a small asyncio HTTP server (standard library only). Submissions are posted as
+AnswerSubmission JSON, validated and scored against the ground truth that every
+worker process keeps loaded, and inserted into an in-memory sorted leaderboard.
+
+    python serve.py --port 8000
+    curl -X POST --data-binary @submission.json localhost:8000/submissions
+    curl localhost:8000/leaderboard?top=10
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import click
+
+import rank
+
+MAX_BODY = 32 * 1024 * 1024
+
+# ground truth, loaded once per worker process
+_schemas = None
+_gt = None
+
+
+def _init_worker(folder: Path):
+    global _schemas, _gt
+    rank.DIR = folder
+    _schemas = rank.load_canonic_file().root
+    _gt = rank.GroundTruthIndex(_schemas)
+
+
+def _score_payload(body: bytes, digest: str, received: str,
+                   store: bool) -> Tuple[Optional[dict], Optional[str], Optional[str]]:
+    # runs in a worker process: parse, validate and score one submission.
+    # Returns (row, error, sha1 of the stored file)
+    try:
+        obj = json.loads(body)
+        if not isinstance(obj, dict):
+            return None, "Submission must be a JSON object", None
+        obj.setdefault("signature", digest[:8])
+        obj["time"] = received
+        submission = rank.AnswerSubmission.model_validate(obj)
+    except ValueError as e:
+        return None, f"{type(e).__name__}: {e}", None
+
+    stored = None
+    if store:
+        # the validated submission, so the server time is on record, named by the
+        # sha1 of exactly these bytes (the signature is client input)
+        text = submission.model_dump_json(exclude={"file_name"}, exclude_none=True).encode("utf-8")
+        stored = hashlib.sha1(text).hexdigest()
+        submission.file_name = f"submission_{stored}.json"
+        (rank.DIR / "submissions" / submission.file_name).write_bytes(text)
+
+    r = rank.score_submission(submission, _schemas, _gt)
+    return _row(r), None, stored
+
+
+def _row(r: rank.Ranking) -> dict:
+    return {
+        "team": r.submission.submission_name.replace("\n", " "),
+        "signature": r.submission.signature[:8],
+        "R": r.ref_score,
+        "G": r.val_score,
+        "Score": r.score,
+        "Missing": r.missing,
+        "No rank": r.no_rank,
+        "Elapsed": r.elapsed_hours,
+    }
+
+
+class Leaderboard:
+    """
+    Rows sorted by descending score. Ties keep arrival order, like rank.py.
+    A row is known by the sha1s of its posted body and stored file, so the same
+    submission is never ranked twice. The JSON served over GET is rendered once
+    per change.
+    """
+
+    def __init__(self):
+        self.keys: List[float] = []
+        self.rows: List[dict] = []
+        self.digests: Dict[str, dict] = {}
+        self._rendered: Dict[Optional[int], bytes] = {}
+
+    def rank(self, digest: str) -> Optional[int]:
+        row = self.digests.get(digest)
+        if row is None:
+            return None
+        # only rows with the same score can be at its position
+        start = bisect.bisect_left(self.keys, -row["Score"])
+        return next(i for i in range(start, len(self.rows)) if self.rows[i] is row) + 1
+
+    def add(self, row: dict, *digests: Optional[str]) -> int:
+        """
+        Inserts the row and returns its rank, or the rank of the row already
+        known by one of the digests.
+        """
+        digests = [d for d in digests if d]
+        for d in digests:
+            if d in self.digests:
+                position = self.rank(d)
+                self.digests.update(dict.fromkeys(digests, self.digests[d]))
+                return position
+        i = bisect.bisect_right(self.keys, -row["Score"])
+        self.keys.insert(i, -row["Score"])
+        self.rows.insert(i, row)
+        self.digests.update(dict.fromkeys(digests, row))
+        self._rendered.clear()
+        return i + 1
+
+    def render(self, top: Optional[int] = None) -> bytes:
+        if top not in self._rendered:
+            rows = self.rows if top is None else self.rows[:top]
+            self._rendered[top] = json.dumps([{"rank": i + 1, **r} for i, r in enumerate(rows)]).encode()
+        return self._rendered[top]
+
+
+class Service:
+    def __init__(self, workers: int, store: bool):
+        # forked workers would inherit the sockets open at the time, and keep the
+        # first connection from ever closing
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.pool = ProcessPoolExecutor(max_workers=workers or None, mp_context=context,
+                                        initializer=_init_worker, initargs=(rank.DIR,))
+        self.board = Leaderboard()
+        self.store = store
+        # body sha1 -> scoring in flight, so concurrent posts of one body are scored once
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def preload(self, workers: int):
+        # seed the board from the submissions already on disk
+        schemas = rank.load_canonic_file().root
+        answers_sha1 = rank.file_sha1(rank.DIR / "answers.json")
+        rankings = rank.score_incremental("matrix", workers, schemas, answers_sha1)
+        # posting a stored file again finds it by the sha1 of its bytes
+        digests = {f.name: rank.file_sha1(f) for f in rank.submission_files()}
+        for r in rankings:
+            self.board.add(_row(r), digests.get(r.submission.file_name))
+
+    async def submit(self, body: bytes) -> Tuple[int, dict]:
+        digest = hashlib.sha1(body).hexdigest()
+        position = self.board.rank(digest)
+        if position is not None:
+            return 200, {"rank": position, "duplicate": True, **self.board.digests[digest]}
+
+        pending = self.pending.get(digest)
+        if pending is None:
+            pending = self.pending[digest] = asyncio.ensure_future(self._score(body, digest))
+            pending.add_done_callback(lambda _: self.pending.pop(digest, None))
+        return await asyncio.shield(pending)
+
+    async def _score(self, body: bytes, digest: str) -> Tuple[int, dict]:
+        received = datetime.now().strftime("%Y-%m-%d, %H:%M:%S")
+        loop = asyncio.get_running_loop()
+        row, error, stored = await loop.run_in_executor(self.pool, _score_payload, body, digest, received,
+                                                        self.store)
+        if error is not None:
+            return 400, {"error": error}
+        position = self.board.add(row, digest, stored)
+        return 200, {"rank": position, **row}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                status, body = await self.dispatch(reader)
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+                status, body = 400, json.dumps({"error": str(e)}).encode()
+            except Exception as e:  # scoring, storing or the worker pool failed: still answer
+                status, body = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+
+            reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                      500: "Internal Server Error"}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + body)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line")
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+
+        if method == "GET" and url.path == "/leaderboard":
+            top = parse_qs(url.query).get("top")
+            return 200, self.board.render(int(top[0]) if top else None)
+
+        if method == "GET" and url.path == "/health":
+            return 200, json.dumps({"submissions": len(self.board.rows)}).encode()
+
+        if method == "POST" and url.path == "/submissions":
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY:
+                return 413, json.dumps({"error": f"Body exceeds {MAX_BODY} bytes"}).encode()
+            status, result = await self.submit(await reader.readexactly(length))
+            return status, json.dumps(result).encode()
+
+        return 404, json.dumps({"error": f"No route for {method} {url.path}"}).encode()
+
+
+async def serve(host: str, port: int, service: Service):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port} ({len(service.board.rows)} submissions on the board)")
+    async with server:
+        await server.serve_forever()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="Interface to bind")
+@click.option("--port", default=8000, help="Port to listen on")
+@click.option("--workers", default=0, help="Scoring processes (0 = all cores)")
+@click.option("--preload/--no-preload", default=True, help="Rank submissions already in round2/submissions")
+@click.option("--store/--no-store", default=False, help="Save accepted submissions to round2/submissions")
+def cli(host: str = "127.0.0.1", port: int = 8000, workers: int = 0, preload: bool = True, store: bool = False):
+    service = Service(workers, store)
+    if preload:
+        service.preload(workers)
+    try:
+        asyncio.run(serve(host, port, service))
+    finally:
+        service.pool.shutdown()
+
+
+if __name__ == "__main__":
+    cli()
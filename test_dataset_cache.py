@@ -0,0 +1,66 @@
+"""
+The columnar cache of dataset.json: same entries as validating the JSON, rebuilt
+when the source changes, never read after an interrupted build.
+
+    python -m pytest -q test_dataset_cache.py
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import main
+
+
+def dump(entries: dict) -> dict:
+    return {k: v.model_dump() for k, v in entries.items()}
+
+
+def validated(file: Path) -> dict:
+    return dump(main._validate_dataset(json.loads(file.read_text())))
+
+
+def test_cache_equals_validated_json(dataset):
+    assert dump(main.load_dataset()) == validated(dataset)
+    assert (main.DATASET_CACHE / "source.sha1").exists()
+    # second load comes from the cache
+    assert dump(main.read_dataset_cache(main.DATASET_CACHE)) == validated(dataset)
+    assert dump(main.load_dataset()) == validated(dataset)
+
+
+def test_rebuilt_when_source_changes(dataset):
+    main.load_dataset()
+    entries = json.loads(dataset.read_text())
+    key = next(iter(entries))
+    entries[key]["meta"]["company_name"] = "Renamed Ltd"
+    dataset.write_text(json.dumps(entries))
+
+    assert main.load_dataset()[key].meta.company_name == "Renamed Ltd"
+
+
+def test_interrupted_build_not_loaded(monkeypatch, dataset):
+    original = dataset.read_text()
+    expected = validated(dataset)
+    main.load_dataset()
+
+    entries = json.loads(original)
+    del entries[next(iter(entries))]
+    dataset.write_text(json.dumps(entries))
+    save = np.save
+    calls = []
+
+    def interrupted(file, array):
+        calls.append(file)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        save(file, array)
+
+    # the new reports.npy is written, then the build dies
+    monkeypatch.setattr(np, "save", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        main.load_dataset()
+    monkeypatch.setattr(np, "save", save)
+
+    dataset.write_text(original)
+    assert dump(main.load_dataset()) == expected
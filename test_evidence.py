@@ -0,0 +1,104 @@
+"""
+The number index of evidence.py on a page store of small generated PDFs: number
+readings, lookups against a scan of every value, candidates for several answers,
+and rebuilds when the store changes.
+
+    python -m pytest -q test_evidence.py
+"""
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+import evidence
+import ingest
+import pages
+from conftest import write_pdf
+
+pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def store(pdfs, tmp_path) -> pages.PageStore:
+    pages.build_page_store(ingest.pdf_files([pdfs]), tmp_path / "store", workers=1)
+    store = pages.PageStore(tmp_path / "store")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def builds(monkeypatch) -> List[List[str]]:
+    calls = []
+
+    def build(store, sha1s):
+        calls.append(sha1s)
+        return original(store, sha1s)
+
+    original = evidence.NumberIndex.build
+    monkeypatch.setattr(evidence.NumberIndex, "build", build)
+    return calls
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Revenue 1,234 and (56)", [1234, -56]),
+    ("margin 12.5% up 3 per cent", [12.5, 0.125, 3, 0.03]),
+    ("4.2 billion, -7m, 1\u202f000\u202f000", [4.2, 4.2e9, -7, -7e6, 1e6]),
+    ("in thousands: 250 and 2 million", [250, 250e3, 2, 2e6]),
+])
+def test_page_numbers(text, expected):
+    values, offsets = evidence.page_numbers(text)
+    assert values == pytest.approx(expected)
+    assert len(offsets) == len(values) and offsets == sorted(offsets)
+
+
+def test_find_equals_scan(store):
+    sha1s = sorted(store.docs)
+    index = evidence.NumberIndex.build(store, sha1s)
+    for i, sha1 in enumerate(sha1s):
+        start, end = index.bounds[i], index.bounds[i + 1]
+        assert (np.diff(index.values[start:end]) >= 0).all()
+        for answer in [1200, 1.2e9, 85, -85, 4100, 0.4, 2050e6, 999]:
+            expected = start + np.flatnonzero(evidence.accepted(index.values[start:end], answer))
+            assert sorted(index.find(sha1, answer).tolist()) == expected.tolist()
+    assert not len(index.find("0" * 40, 85))
+
+
+def test_best_hits_per_page_whatever_the_answer_order(tmp_path):
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    write_pdf(folder / "report.pdf", ["1,200 and 1,200 and 1,200, then 85", "85 and 85, then 1,200"])
+    pages.build_page_store([folder / "report.pdf"], tmp_path / "store", workers=1)
+    store = pages.PageStore(tmp_path / "store")
+    [sha1] = store.docs
+    index = evidence.NumberIndex.build(store, [sha1])
+
+    best = evidence.best_candidates(index, [sha1], [1200, 85])
+    assert best == evidence.best_candidates(index, [sha1], [85, 1200])
+    assert [(ref, hits) for ref, hits, _ in best] == [(f"{sha1}:0", 3), (f"{sha1}:1", 2)]
+    # the offset belongs to the answer with the most hits on the page
+    assert store[f"{sha1}:1"][best[1][2]:].startswith("85")
+    store.close()
+
+
+def test_index_rebuilt_when_store_changes(pdfs, tmp_path, store, builds):
+    file = tmp_path / "numbers.npz"
+    sha1s = sorted(store.docs)
+    first = evidence.load_or_build(store, sha1s + ["0" * 40], file)
+    assert builds == [sha1s]
+
+    assert evidence.load_or_build(store, sha1s, file).values.tolist() == first.values.tolist()
+    assert len(builds) == 1
+
+    # same reports, but the store was rebuilt around them
+    write_pdf(pdfs / "new.pdf", ["Revenue 42"])
+    pages.build_page_store(ingest.pdf_files([pdfs]), Path(store.folder), workers=1)
+    rebuilt = pages.PageStore(store.folder)
+    evidence.load_or_build(rebuilt, sha1s, file)
+    rebuilt.close()
+    assert len(builds) == 2
+
+    evidence.load_or_build(store, sha1s[:1], file)
+    assert builds[-1] == sha1s[:1]
+    evidence.load_or_build(store, sha1s[:1], file, rebuild=True)
+    assert len(builds) == 4
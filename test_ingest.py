@@ -0,0 +1,90 @@
+"""
+ingest.py on small generated PDFs: known reports are neither hashed nor
+extracted again, and --verify hashes every file.
+
+    python -m pytest -q test_ingest.py
+"""
+import shutil
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import ingest
+
+pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def hashed(monkeypatch) -> List[str]:
+    names = []
+
+    def file_sha1(path: Path) -> str:
+        names.append(path.name)
+        return original(path)
+
+    original = ingest.file_sha1
+    monkeypatch.setattr(ingest, "file_sha1", file_sha1)
+    return names
+
+
+@pytest.fixture
+def extracted(monkeypatch) -> List[str]:
+    names = []
+
+    def ingest_pdf(path: Path, sha1: str):
+        names.append(path.name)
+        return original(path, sha1)
+
+    original = ingest._ingest_pdf
+    monkeypatch.setattr(ingest, "_ingest_pdf", ingest_pdf)
+    return names
+
+
+def test_unknown_pdfs_trusts_sha1_names(pdfs, hashed):
+    files = ingest.pdf_files([pdfs])
+    shutil.copy(files[0], pdfs / "z-copy.pdf")
+    files = ingest.pdf_files([pdfs])
+
+    todo = ingest.unknown_pdfs(files, {files[1].stem}, workers=1)
+    # z-copy.pdf sorts after the sha1 names and repeats the first report
+    assert todo == [(f, f.stem) for f in files if f.stem not in (files[1].stem, "z-copy")]
+    assert hashed == ["z-copy.pdf"]
+
+
+def test_unknown_pdfs_verify_hashes_every_file(pdfs, hashed):
+    files = ingest.pdf_files([pdfs])
+    wrong = files[0].rename(pdfs / f"{'0' * 40}.pdf")
+    files = ingest.pdf_files([pdfs])
+
+    todo = ingest.unknown_pdfs(files, set(), verify=True, workers=1)
+    assert sorted(hashed) == sorted(f.name for f in files)
+    assert (wrong, wrong.stem) not in todo
+    assert {sha1 for _, sha1 in todo} == {ingest.file_sha1(f) for f in files}
+
+
+def test_ingest_extracts_only_new_reports(pdfs, extracted):
+    files = ingest.pdf_files([pdfs])
+    dataset = {}
+    added, failed = ingest.ingest(files[:2], dataset, {}, workers=1)
+    assert added == [f.stem for f in files[:2]] and not failed
+    assert extracted == [f.name for f in files[:2]]
+
+    entry = dataset[files[0].stem]
+    assert entry["pages"] == len(ingest.extract_pages(files[0]))
+    assert entry["letters"] == sum(len(t) for t in ingest.extract_pages(files[0]))
+
+    extracted.clear()
+    meta = {files[0].stem: {"company_name": "Known plc"}}
+    added, failed = ingest.ingest(files, dataset, meta, workers=1)
+    assert added == [files[2].stem] and not failed
+    assert extracted == [files[2].name]
+    assert dataset[files[0].stem]["meta"] == {"company_name": "Known plc"}
+
+
+def test_broken_pdf_fails_alone(pdfs):
+    (pdfs / "broken.pdf").write_bytes(b"%PDF-1.4 not really")
+    dataset = {}
+    added, failed = ingest.ingest(ingest.pdf_files([pdfs]), dataset, {}, workers=1)
+    assert len(added) == 3
+    assert [f.name for f, _ in failed] == ["broken.pdf"]
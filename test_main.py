@@ -0,0 +1,145 @@
+"""
+step2 question generation against digests of what the original step2 wrote for
+the same subsets and seeds, and DeterministicRNG jump-ahead and vectorized draws
+against sequential random() calls. The pipeline against step1 and step2 run one by one.
+
+    python -m pytest -q test_main.py
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+import main
+from main import DeterministicRNG
+
+HERE = Path(__file__).parent
+SEEDS = [1, 42, 3031428637, 2 ** 32 - 1]
+
+
+def digest(questions) -> str:
+    # sha1 of the file step2 writes
+    return hashlib.sha1(json.dumps([q.model_dump() for q in questions], indent=2).encode()).hexdigest()
+
+
+def no_layoffs() -> pd.DataFrame:
+    frame = pd.read_csv(HERE / "subset.csv")
+    frame["has_layoffs"] = False
+    return frame
+
+
+@pytest.mark.parametrize("subset, count, seed, expected", [
+    ("round2/subset.csv", 300, 1, "223078e272d6c131ab4ac1ce31e556118c8186ee"),
+    ("round2/subset.csv", 300, 2, "ff2f398c25123a2cdc78be4b08e8cb687841e70f"),
+    ("round2/subset.csv", 300, 3, "1d67a3357e93e332b312a7896d66bf6a8d7e7f0e"),
+    ("round2/subset.csv", 300, 42, "3ae5f6d7d772d0544452a7ba6b546e9c5c82bb89"),
+    ("round2/subset.csv", 300, 3031428637, "19a28984c23d7c65e79bf8d28fd76c734cdf8965"),
+    ("subset.csv", 100, 7, "c8ddff4003905d37998a52a48ce21e972d588ce5"),
+    ("subset.csv", 1000, 42, "1331829a0e713bb3d1eaebe8c87ae176d2de4558"),
+])
+def test_subset_index_keeps_questions(subset, count, seed, expected):
+    assert digest(main.generate_questions(main.SubsetIndex.from_csv(HERE / subset), count, seed)) == expected
+
+
+@pytest.mark.parametrize("seed, expected", [
+    (1, "1a85d9764b66f25c6b1a1902c332e8b56477485d"),
+    (2, "933c3f83240436481cca1b95cea2c0856b44e333"),
+    (3, "2db285354f6af9ef8a30a38209e6452a1cb8cd13"),
+    (42, "1d11fd3467b532e9345a883b08b0be67b86d6b9f"),
+])
+def test_generator_without_companies_keeps_draws(seed, expected):
+    # ask_layoffs has nothing to ask about, but is still drawn
+    assert digest(main.generate_questions(main.SubsetIndex(no_layoffs()), 300, seed)) == expected
+
+
+def test_small_currency_groups_stall():
+    frame = pd.read_csv(HERE / "subset.csv")
+    # 3 companies with metrics per currency, fewer than a comparison needs
+    frame["has_financial_performance_indicators"] = frame.groupby("cur").cumcount() < 3
+    questions = main.generate_questions(main.SubsetIndex(frame), 100, 42)
+    assert len(questions) == 100
+    assert not any(q.text.startswith("Which of the companies") for q in questions)
+
+
+def test_unreachable_count_fails_fast():
+    with pytest.raises(main.QuestionShortfall, match="would take about") as e:
+        main.generate_questions(main.SubsetIndex.from_csv(HERE / "subset.csv"), 20000, 42)
+    assert 0 < len(e.value.questions) < 20000
+    assert len({q.text for q in e.value.questions}) == len(e.value.questions)
+
+
+def test_strict_step2_writes_generated_questions(tmp_path):
+    subset, questions = tmp_path / "subset.csv", tmp_path / "questions.json"
+    no_layoffs().to_csv(subset, index=False)
+
+    result = CliRunner().invoke(main.cli, ["step2", "--subset", str(subset), "--count", "20000", "--seed", "42",
+                                           "--questions", str(questions)])
+    assert result.exit_code == 1
+    written = json.loads(questions.read_text())
+    assert f"Wrote the {len(written)} generated questions" in result.output
+
+    loose = tmp_path / "loose.json"
+    result = CliRunner().invoke(main.cli, ["step2", "--subset", str(subset), "--count", "20000", "--seed", "42",
+                                           "--questions", str(loose), "--no-strict"])
+    assert result.exit_code == 0
+    assert json.loads(loose.read_text()) == written
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("steps", [0, 1, 2, 7, 64, 1000])
+def test_jump_equals_sequential(seed, steps):
+    sequential, jumped = DeterministicRNG(seed), DeterministicRNG(seed)
+    for _ in range(steps):
+        sequential.random(2)
+    jumped.jump(steps)
+    assert jumped.state == sequential.state
+    assert jumped.random(1000) == sequential.random(1000)
+
+
+def test_jump_backwards():
+    with pytest.raises(ValueError):
+        DeterministicRNG(1).jump(-1)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("k", [0, 1, 2, 3, 17, 1025])
+def test_states_equal_sequential(seed, k):
+    sequential, vectorized = DeterministicRNG(seed), DeterministicRNG(seed)
+    expected = []
+    for _ in range(k):
+        sequential.random(1)
+        expected.append(sequential.state)
+    assert vectorized.states(k).tolist() == expected
+    assert vectorized.state == sequential.state
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("n", [1, 2, 10, 97, 2 ** 32])
+def test_randoms_equal_random(seed, n):
+    sequential, vectorized = DeterministicRNG(seed), DeterministicRNG(seed)
+    expected = [sequential.random(n) for _ in range(300)]
+    assert vectorized.randoms(n, 100).tolist() + vectorized.randoms(n, 200).tolist() == expected
+    # both continue with the same draws
+    assert vectorized.random(n) == sequential.random(n)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_equals_step1_step2(dataset, tmp_path, monkeypatch, workers):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    result = runner.invoke(main.cli, ["pipeline", "--seeds", "1-3,42", "--files", "20", "--count", "40",
+                                      "--output", "instances.jsonl", "--workers", str(workers), "--no-strict"])
+    assert result.exit_code == 0, result.output
+    instances = [json.loads(line) for line in Path("instances.jsonl").read_text().splitlines()]
+    assert [i["seed"] for i in instances] == [1, 2, 3, 42]
+
+    for instance in instances:
+        seed = str(instance["seed"])
+        assert runner.invoke(main.cli, ["step1", "--count", "20", "--seed", seed, "--subset", "subset"]).exit_code == 0
+        assert runner.invoke(main.cli, ["step2", "--count", "40", "--seed", seed, "--subset", "subset.csv",
+                                        "--questions", "questions.json", "--no-strict"]).exit_code == 0
+        assert instance["subset"] == json.loads(Path("subset.json").read_text())
+        assert instance["questions"] == json.loads(Path("questions.json").read_text())
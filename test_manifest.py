@@ -0,0 +1,79 @@
+"""
+The PDF manifest on a temporary corpus: cached hashes are reused until a file
+changes, and every kind of problem is reported.
+
+    python -m pytest -q test_manifest.py
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+import manifest
+
+
+@pytest.fixture
+def corpus(monkeypatch, tmp_path, pdfs) -> Path:
+    monkeypatch.setattr(manifest, "ROOT", tmp_path)
+    monkeypatch.setattr(manifest, "DATASET", tmp_path / "round2" / "dataset.json")
+    files = sorted(pdfs.glob("*.pdf"))
+    # the subset needs the first two PDFs and one that isn't there
+    (tmp_path / "round2").mkdir()
+    records = [{"sha1": f.stem} for f in files[:2]] + [{"sha1": "f" * 40}]
+    (tmp_path / "round2" / "subset.json").write_text(json.dumps(records))
+    return pdfs
+
+
+def test_mmap_sha1(corpus, tmp_path):
+    for f in corpus.glob("*.pdf"):
+        assert manifest.mmap_sha1(f) == hashlib.sha1(f.read_bytes()).hexdigest()
+    (tmp_path / "empty.pdf").touch()
+    assert manifest.mmap_sha1(tmp_path / "empty.pdf") == hashlib.sha1(b"").hexdigest()
+
+
+def test_cached_hashes_reused_until_file_changes(corpus):
+    report = manifest.build_manifest([corpus], {}, workers=1)
+    assert report.hashed == 3 and not report.mismatched
+    assert {Path(k).stem for k in report.files} == {v["sha1"] for v in report.files.values()}
+
+    assert manifest.build_manifest([corpus], report.files, workers=1).hashed == 0
+    assert manifest.build_manifest([corpus], report.files, workers=1, rehash=True).hashed == 3
+
+    changed = sorted(corpus.glob("*.pdf"))[0]
+    changed.write_bytes(changed.read_bytes() + b"\n")
+    st = changed.stat()
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    again = manifest.build_manifest([corpus], report.files, workers=1)
+    assert again.hashed == 1
+    assert again.mismatched == [(f"pdfs/{changed.name}", hashlib.sha1(changed.read_bytes()).hexdigest())]
+
+
+def test_problems_reported(corpus):
+    files = sorted(corpus.glob("*.pdf"))
+    cache = manifest.build_manifest([corpus], {}, workers=1).files
+    files[0].unlink()
+
+    report = manifest.build_manifest([corpus], cache, workers=1)
+    assert list(report.vanished) == [f"pdfs/{files[0].name}"]
+    assert report.missing == sorted([(files[0].stem, "round2/subset.json"), ("f" * 40, "round2/subset.json")])
+    assert report.unreferenced == [f"pdfs/{files[2].name}"]
+    assert not report.ok
+
+
+def test_verify_keeps_gone_files_until_build(corpus, tmp_path):
+    output = str(tmp_path / "manifest.json")
+    runner = CliRunner()
+    assert runner.invoke(manifest.cli, ["build", "--pdfs", str(corpus), "--output", output]).exit_code == 0
+
+    gone = sorted(corpus.glob("*.pdf"))[2]
+    gone.unlink()
+    for _ in range(2):
+        result = runner.invoke(manifest.cli, ["verify", "--pdfs", str(corpus), "--output", output])
+        assert result.exit_code == 1
+        assert f"Gone: pdfs/{gone.name}" in result.output
+
+    assert runner.invoke(manifest.cli, ["build", "--pdfs", str(corpus), "--output", output]).exit_code == 0
+    assert f"pdfs/{gone.name}" not in json.loads(Path(output).read_text())["files"]
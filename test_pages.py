@@ -0,0 +1,84 @@
+"""
+The page store against pypdf on small generated PDFs: every page reads back as
+extracted, and rebuilds only extract what isn't stored yet.
+
+    python -m pytest -q test_pages.py
+"""
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import ingest
+import pages
+from conftest import REPORTS, write_pdf
+
+pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def extracted(monkeypatch) -> List[str]:
+    names = []
+
+    def extract(path: Path):
+        names.append(path.name)
+        return original(path)
+
+    original = pages._extract
+    monkeypatch.setattr(pages, "_extract", extract)
+    return names
+
+
+def test_store_round_trip(pdfs, tmp_path):
+    files = ingest.pdf_files([pdfs])
+    added, failed = pages.build_page_store(files, tmp_path / "store", workers=1)
+    assert added == [f.stem for f in files] and not failed
+
+    store = pages.PageStore(tmp_path / "store")
+    assert len(store) == len(REPORTS)
+    for f in files:
+        expected = ingest.extract_pages(f)
+        assert list(store.document(f.stem)) == expected
+        assert store[f"{f.stem}:{len(expected) - 1}"] == expected[-1]
+        assert f"{f.stem}:{len(expected)}" not in store
+        with pytest.raises(KeyError):
+            store.page(f.stem, len(expected))
+    store.close()
+
+
+def test_build_skips_stored_reports(pdfs, tmp_path, extracted):
+    files = ingest.pdf_files([pdfs])
+    pages.build_page_store(files[:1], tmp_path / "store", workers=1)
+    before = (tmp_path / "store" / "pages.bin").read_bytes()
+
+    extracted.clear()
+    new = write_pdf(tmp_path / "new.pdf", ["Revenue AUD 12 million"])
+    added, _ = pages.build_page_store(files + [new], tmp_path / "store", workers=1)
+    assert extracted == [f.name for f in files[1:]] + ["new.pdf"]
+    # hashed, as the name isn't a sha1
+    assert added == [f.stem for f in files[1:]] + [ingest.file_sha1(new)]
+    # appended, the stored pages are untouched
+    assert (tmp_path / "store" / "pages.bin").read_bytes().startswith(before)
+
+    extracted.clear()
+    assert pages.build_page_store(files + [new], tmp_path / "store", workers=1) == ([], [])
+    assert not extracted
+
+    store = pages.PageStore(tmp_path / "store")
+    assert store[f"{ingest.file_sha1(new)}:0"] == ingest.extract_pages(new)[0]
+    assert list(store.document(files[0].stem)) == ingest.extract_pages(files[0])
+    store.close()
+
+
+def test_interrupted_build_leaves_no_pages(pdfs, tmp_path):
+    files = ingest.pdf_files([pdfs])
+    pages.build_page_store(files[:1], tmp_path / "store", workers=1)
+    # bytes a build wrote before it was stopped, with no index entry
+    with open(tmp_path / "store" / "pages.bin", "ab") as f:
+        f.write(b"partial page")
+
+    pages.build_page_store(files, tmp_path / "store", workers=1)
+    store = pages.PageStore(tmp_path / "store")
+    for f in files:
+        assert list(store.document(f.stem)) == ingest.extract_pages(f)
+    store.close()
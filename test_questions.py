@@ -0,0 +1,44 @@
+"""
+Question ids and the registry, and how round1/rank.py matches answers with them.
+
+    python -m pytest -q test_questions.py
+"""
+import importlib.util
+import json
+from pathlib import Path
+
+from questions import QuestionRegistry, question_id
+
+_spec = importlib.util.spec_from_file_location("round1_rank", Path(__file__).parent / "round1/rank.py")
+round1_rank = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(round1_rank)
+
+TEXTS = ['What was the revenue of "Ｘ Corp"?', 'Did "Caixa Geral de Depósitos, S.A." pay dividends?']
+
+
+def test_id_ignores_unicode_form_and_whitespace():
+    assert question_id(TEXTS[0]) == question_id(' What  was the revenue\nof "X Corp"? ')
+    assert question_id(TEXTS[0]) != question_id(TEXTS[1])
+    assert 0 <= question_id(TEXTS[0]) < 2 ** 63
+
+
+def test_registry_columns():
+    registry = QuestionRegistry(TEXTS)
+    assert registry.column(TEXTS[1]) == 1
+    assert registry.column('What was the revenue of "X Corp"?') == 0
+    assert registry.column("What was the revenue of Y?") is None
+    assert registry.column(None) is None
+
+
+def test_round1_matches_by_question_not_position(tmp_path):
+    expected = [{"question": t, "schema": "boolean" if "dividends" in t else "number", "answer": a}
+                for t, a in zip(TEXTS, [["12"], ["True"]])]
+    # reversed, with whitespace changes and the accented name read as cp1252
+    submitted = [{"question": TEXTS[1].encode("utf-8").decode("cp1252"), "answer": "True"},
+                 {"question": '  What was the revenue of "X Corp"?', "answer": "12"}]
+    file = tmp_path / "team.json"
+    file.write_text(json.dumps(submitted))
+
+    team = round1_rank.rank_team(expected, file)
+    assert team.answers == ["12", "True"]
+    assert team.score == 100
@@ -0,0 +1,79 @@
+"""
+The faster scoring paths of rank.py against the scalar reference, on synthetic
+submissions from bench.py.
+
+    python -m pytest -q test_rank.py
+"""
+import dataclasses
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import bench
+import rank
+
+
+@pytest.fixture(scope="module")
+def schemas() -> Dict[str, rank.CanonicData]:
+    return rank.load_canonic_file().root
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory, schemas) -> List[Path]:
+    return bench.write_submissions(tmp_path_factory.mktemp("submissions"), 7, 25, schemas, refs=4)
+
+
+def read(files: List[Path]) -> List[rank.AnswerSubmission]:
+    return list(rank.iter_submissions(workers=1, files=files))
+
+
+def scores(rankings: List[rank.Ranking]) -> List[tuple]:
+    return [(r.submission.file_name, *(v for k, v in dataclasses.asdict(r).items() if k != "submission"))
+            for r in rankings]
+
+
+def test_matrix_equals_scalar(schemas, files):
+    assert scores(rank.score_matrix(read(files), schemas)) == scores(rank.score_scalar(read(files), schemas))
+
+
+@pytest.mark.parametrize("engine", sorted(rank.ENGINES))
+def test_incremental_equals_uncached(monkeypatch, tmp_path, schemas, files, engine):
+    expected = scores(rank.ENGINES[engine](read(files), schemas))
+
+    cache = tmp_path / "cache.sqlite"
+    # half scored fresh, then the rest with the first half from the cache
+    monkeypatch.setattr(rank, "submission_files", lambda: files[::2])
+    rank.score_incremental(engine, 1, schemas, "answers", cache)
+    monkeypatch.setattr(rank, "submission_files", lambda: files)
+    assert scores(rank.score_incremental(engine, 1, schemas, "answers", cache)) == expected
+    # everything cached
+    assert scores(rank.score_incremental(engine, 1, schemas, "answers", cache)) == expected
+
+
+def test_cache_dropped_for_other_ground_truth(tmp_path, schemas, files):
+    ranking = rank.score_matrix(read(files[:1]), schemas)[0]
+    cache = rank.RankingCache(tmp_path / "cache.sqlite", "answers")
+    cache.store("file", ranking)
+    cache.close()
+
+    for answers_sha1, expected in [("answers", ["file"]), ("other answers", []), ("answers", [])]:
+        cache = rank.RankingCache(tmp_path / "cache.sqlite", answers_sha1)
+        assert list(cache.load()) == expected
+        cache.close()
+
+
+def test_penalties_equal_pool_loop(schemas, files):
+    gt = rank.GroundTruthIndex(schemas)
+    checked = 0
+    for submission in read(files):
+        for a in submission.answers:
+            column = gt.questions.column(a.question_text)
+            refs = [f"{r.pdf_sha1}:{r.page_index}" for r in a.references]
+            pools = list(schemas.values())[column].reference_pools
+            # every ref outside all pools is stray, every pool without a ref is missing
+            stray = sum(1 for ref in refs if not any(ref in pool for pool in pools))
+            missing = sum(1 for pool in pools if not any(ref in pool for ref in refs))
+            assert gt.penalties(column, refs) == (stray, missing)
+            checked += bool(pools)
+    assert checked
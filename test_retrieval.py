@@ -0,0 +1,22 @@
+"""
+top_k against a full (score, column) sort, on matrices with many ties.
+
+    python -m pytest -q test_retrieval.py
+"""
+import numpy as np
+import pytest
+
+from retrieval import top_k
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_equals_sort(seed):
+    rng = np.random.default_rng(seed)
+    rows, columns = rng.integers(1, 6), rng.integers(1, 40)
+    scores = rng.integers(0, 4, (rows, columns)).astype(np.float32)
+    for k in range(columns + 2):
+        idx, vals = top_k(scores, k)
+        for row in range(rows):
+            expected = sorted(range(columns), key=lambda c: (-scores[row, c], c))[:k]
+            assert idx[row].tolist() == expected
+            assert vals[row].tolist() == scores[row, expected].tolist()
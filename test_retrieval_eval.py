@@ -0,0 +1,87 @@
+"""
+RetrievalEvaluator metrics against a per-question loop over GroundTruthIndex.ref_score.
+
+    python -m pytest -q test_retrieval_eval.py
+"""
+from typing import Dict, List
+
+import pytest
+
+import bench
+import rank
+from retrieval_eval import RetrievalEvaluator, load_run
+
+DEPTH = 6
+
+
+@pytest.fixture(scope="module")
+def schemas() -> Dict[str, rank.CanonicData]:
+    return rank.load_canonic_file().root
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory, schemas) -> List[Dict[str, List[str]]]:
+    files = bench.write_submissions(tmp_path_factory.mktemp("runs"), 11, 8, schemas, refs=DEPTH)
+    return [load_run(f) for f in files]
+
+
+def expected_metrics(schemas: Dict[str, rank.CanonicData], run: Dict[str, List[str]], k: int) -> tuple:
+    gt = rank.GroundTruthIndex(schemas)
+    by_column = {gt.questions.column(text): refs for text, refs in run.items()}
+    recall = coverage = mrr = ref_score = 0.0
+    ranked = with_pools = 0
+    for column, data in enumerate(schemas.values()):
+        if not data.answers:
+            continue
+        refs = by_column.get(column, [])[:k]
+        ranked += 1
+        ref_score += gt.ref_score(column, refs)
+        pools = data.reference_pools
+        if not pools:
+            continue
+        with_pools += 1
+        hit = [any(ref in pool for ref in refs) for pool in pools]
+        recall += sum(hit) / len(pools)
+        coverage += all(hit)
+        first = next((i for i, ref in enumerate(refs) if any(ref in pool for pool in pools)), None)
+        mrr += 0.0 if first is None else 1 / (first + 1)
+    return recall / with_pools, coverage / with_pools, mrr / with_pools, ref_score / ranked
+
+
+def test_metrics_equal_loop(schemas, runs):
+    metrics = RetrievalEvaluator(schemas).evaluate(runs, DEPTH)
+    for r, run in enumerate(runs):
+        for k in range(1, DEPTH + 1):
+            recall, coverage, mrr, ref_score = expected_metrics(schemas, run, k)
+            assert metrics.recall[r, k - 1] == pytest.approx(recall)
+            assert metrics.coverage[r, k - 1] == pytest.approx(coverage)
+            assert metrics.mrr[r, k - 1] == pytest.approx(mrr)
+            assert metrics.ref_score[r, k - 1] == pytest.approx(ref_score)
+
+
+def test_pool_pages_score_full(schemas):
+    # one page of every pool, nothing else: full recall and coverage, no penalties
+    run = {text: [pool[0] for pool in d.reference_pools] for text, d in schemas.items()}
+    depth = max(len(refs) for refs in run.values())
+    metrics = RetrievalEvaluator(schemas).evaluate([run], depth)
+    assert metrics.recall[0, -1] == metrics.coverage[0, -1] == metrics.ref_score[0, -1] == 1.0
+    assert metrics.mrr[0, 0] == 1.0
+
+
+def test_more_pools_than_int64_bits(schemas):
+    # rank.py has no limit on pools per question, neither may the evaluator
+    text, data = next((t, d) for t, d in schemas.items() if d.answers)
+    pools = [[f"{i:040x}:{p}" for p in range(2)] for i in range(70)]
+    wide = {text: data.model_copy(update={"reference_pools": pools})}
+    runs = [{text: [pool[1] for pool in pools[::-1]]}, {text: [pools[69][0], "stray:0", pools[64][1]]}, {}]
+
+    metrics = RetrievalEvaluator(wide).evaluate(runs, 70)
+    for r, run in enumerate(runs):
+        for k in (1, 2, 3, 65, 70):
+            recall, coverage, mrr, ref_score = expected_metrics(wide, run, k)
+            assert metrics.recall[r, k - 1] == pytest.approx(recall)
+            assert metrics.coverage[r, k - 1] == pytest.approx(coverage)
+            assert metrics.mrr[r, k - 1] == pytest.approx(mrr)
+            assert metrics.ref_score[r, k - 1] == pytest.approx(ref_score)
+    assert metrics.coverage[0, -1] == 1.0
+    assert metrics.recall[1, -1] == pytest.approx(2 / 70)
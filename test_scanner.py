@@ -0,0 +1,92 @@
+"""
+The Aho-Corasick scanner against a brute-force scan that tries every pattern at
+every position, plus the boundary rules on hand-picked text.
+
+    python -m pytest -q test_scanner.py
+"""
+from typing import List, Tuple
+
+import pytest
+
+from main import DeterministicRNG
+from scanner import (Automaton, Pattern, _ASCII_LOWER, _is_word, currency_patterns, default_automaton,
+                     keyword_patterns, scan_pages)
+
+
+def brute_force(patterns: List[Pattern], text: str) -> List[Tuple[int, int, int]]:
+    found = []
+    for start in range(len(text)):
+        for pid, p in enumerate(patterns):
+            end = start + len(p.text)
+            piece = text[start:end]
+            if end > len(text) or (piece if p.case_sensitive else piece.translate(_ASCII_LOWER)) != p.text:
+                continue
+            before = text[start - 1] if start else ""
+            after = text[end] if end < len(text) else ""
+            if p.word_start and before and _is_word(before):
+                continue
+            if p.letter_start and before.isascii() and before.isalpha():
+                continue
+            if p.word_end and after and _is_word(after):
+                continue
+            found.append((start, end, pid))
+    # leftmost-longest, no overlaps within a group
+    chosen, last_end = [], {}
+    for start, end, pid in sorted(found, key=lambda m: (m[0], m[0] - m[1])):
+        if start >= last_end.get(patterns[pid].group, 0):
+            last_end[patterns[pid].group] = end
+            chosen.append((start, end, pid))
+    return chosen
+
+
+# pieces the random texts are made of: markers, their prefixes, keywords in mixed case, glue
+PIECES = ["USD", "US$", "$", "C$", "A$", "HK$", "€", "£", "RMB", "CAD", "EUR", "US", "HK", "A", "C",
+          "Merger", "LAYOFF", "laid off", "supply chain", "Supply Chain Disruption", "esg", "ESGs",
+          " ", " ", " ", "1", "x", "_", ",", ".", "\n", "ä"]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 42, 3031428637])
+def test_select_equals_brute_force(seed):
+    automaton = default_automaton()
+    rand = DeterministicRNG(seed)
+    for _ in range(50):
+        text = "".join(rand.choice(PIECES) for _ in range(rand.random(60)))
+        assert automaton.select(text) == brute_force(automaton.patterns, text), text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("revenue of $5 and US$ 7 and USD 9", {"USD": 3}),
+    ("C$10, A$3, HK$ 4", {"CAD": 1, "AUD": 1, "HKD": 1}),
+    ("USDollar, EURO, RMB5, eur 3", {}),
+    ("EUR-denominated, (GBP)", {"EUR": 1, "GBP": 1}),
+    ("ab$ 3 but 4$ and €5", {"USD": 1, "EUR": 1}),
+])
+def test_currency_boundaries(text, expected):
+    assert dict(default_automaton().count(text).get("currency", {})) == expected
+
+
+def test_keywords_ignore_case_and_keep_longest():
+    counts = default_automaton().count("Supply Chain Disruption; supply chain. Net Income, prelaunched")
+    assert dict(counts["keywords"]) == {"has_supply_chain_disruptions": 2,
+                                        "has_financial_performance_indicators": 1}
+
+
+def test_overlaps_only_within_a_group():
+    automaton = Automaton([Pattern("ab", "x", "one"), Pattern("abc", "y", "one"), Pattern("bc", "z", "two")])
+    assert automaton.select("abcab") == [(0, 3, 1), (1, 3, 2), (3, 5, 0)]
+
+
+def test_scan_pages_accumulates():
+    scanner = scan_pages(["USD 5 and $3, EUR 1", "", "EUR 2 layoffs, layoff, laid off"])
+    assert scanner.currency == {"USD": 2, "EUR": 2}
+    assert list(scanner.currency)[0] == "USD"
+    assert scanner.keywords == {"has_layoffs": 3}
+    assert scanner.flags()["has_layoffs"] and not scanner.flags()["has_esg_initiatives"]
+    assert not scanner.flags(min_hits=4)["has_layoffs"]
+
+
+def test_patterns():
+    currency = {p.text: p for p in currency_patterns()}
+    assert currency["USD"].word_start and currency["USD"].word_end and not currency["USD"].letter_start
+    assert currency["$"].letter_start and not currency["$"].word_start
+    assert all(p.text == p.text.lower() and not p.case_sensitive for p in keyword_patterns())
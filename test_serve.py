@@ -0,0 +1,110 @@
+"""
+The submission service over real HTTP on a free port, with round2 copied to a
+temporary folder so stored submissions and caches stay out of the tree.
+
+    python -m pytest -q test_serve.py
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+import bench
+import rank
+import serve
+
+
+@pytest.fixture
+def round2(monkeypatch, tmp_path) -> Path:
+    folder = tmp_path / "round2"
+    (folder / "submissions").mkdir(parents=True)
+    shutil.copy(rank.DIR / "answers.json", folder / "answers.json")
+    # worker processes get the folder from the service
+    monkeypatch.setattr(rank, "DIR", folder)
+    monkeypatch.setattr(rank, "score_incremental",
+                        functools.partial(rank.score_incremental, cache_file=folder / "ranking_cache.sqlite"))
+    return folder
+
+
+@pytest.fixture(scope="module")
+def bodies(tmp_path_factory) -> List[bytes]:
+    schemas = rank.load_canonic_file().root
+    files = bench.write_submissions(tmp_path_factory.mktemp("posted"), 3, 3, schemas, refs=2)
+    return [f.read_bytes() for f in files]
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"") -> Tuple[int, object]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def run(service: serve.Service, requests: List[Tuple[str, str, bytes]]) -> list:
+    async def main():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*(request(port, *r) for r in requests))
+        finally:
+            server.close()
+
+    try:
+        return asyncio.run(main())
+    finally:
+        service.pool.shutdown()
+
+
+def test_same_body_ranked_once(round2, bodies):
+    service = serve.Service(1, store=True)
+    responses = run(service, [("POST", "/submissions", bodies[0])] * 5 + [("POST", "/submissions", bodies[1])])
+
+    assert [status for status, _ in responses] == [200] * 6
+    assert len(service.board.rows) == 2
+    assert len({r["rank"] for _, r in responses[:5]}) == 1
+    assert len(list((round2 / "submissions").glob("*.json"))) == 2
+
+
+def test_stored_file_named_by_its_sha1(round2, bodies):
+    service = serve.Service(1, store=True)
+    run(service, [("POST", "/submissions", bodies[0])])
+
+    [file] = (round2 / "submissions").glob("*.json")
+    data = file.read_bytes()
+    assert file.name == f"submission_{hashlib.sha1(data).hexdigest()}.json"
+    assert json.loads(data)["time"]
+
+
+def test_preloaded_file_not_ranked_again(round2, bodies):
+    run(serve.Service(1, store=True), [("POST", "/submissions", bodies[0])])
+    [file] = (round2 / "submissions").glob("*.json")
+
+    service = serve.Service(1, store=True)
+    service.preload(1)
+    [(status, row)] = run(service, [("POST", "/submissions", file.read_bytes())])
+    assert status == 200 and row["duplicate"] and row["rank"] == 1
+    assert len(service.board.rows) == 1
+
+
+def test_leaderboard_and_errors(round2, bodies):
+    service = serve.Service(1, store=False)
+    responses = run(service, [("POST", "/submissions", b) for b in bodies] + [
+        ("POST", "/submissions", b"[1, 2]"),
+        ("POST", "/submissions", b"{not json"),
+        ("GET", "/nowhere", b""),
+    ])
+    assert [status for status, _ in responses] == [200, 200, 200, 400, 400, 404]
+    assert not list((round2 / "submissions").glob("*.json"))
+
+    board = json.loads(service.board.render())
+    assert [r["rank"] for r in board] == [1, 2, 3]
+    assert [r["Score"] for r in board] == sorted((r["Score"] for r in board), reverse=True)
+    assert json.loads(service.board.render(top=1)) == board[:1]
@@ -0,0 +1,67 @@
+"""
+The vectorized reference checks of validate_refs.py against a loop over every
+reference, on synthetic submissions from bench.py.
+
+    python -m pytest -q test_validate_refs.py
+"""
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+import bench
+import rank
+import validate_refs
+
+
+@pytest.fixture(scope="module")
+def submissions(tmp_path_factory) -> List[rank.AnswerSubmission]:
+    schemas = rank.load_canonic_file().root
+    files = bench.write_submissions(tmp_path_factory.mktemp("submissions"), 3, 10, schemas, refs=4)
+    return list(rank.iter_submissions(workers=1, files=files))
+
+
+@pytest.fixture(scope="module")
+def pages(submissions) -> Dict[str, int]:
+    highest = Counter()
+    for s in submissions:
+        for a in s.answers:
+            for r in a.references:
+                highest[r.pdf_sha1] = max(highest[r.pdf_sha1], r.page_index)
+    sha1s = sorted(highest)
+    # the first PDF is missing from the table, the second one page short
+    table = {sha1: highest[sha1] + 1 for sha1 in sha1s[2:]}
+    table[sha1s[1]] = highest[sha1s[1]]
+    return table
+
+
+def test_check_equals_reference_loop(submissions, pages):
+    expected = {"unknown_sha1": [], "out_of_range": [], "duplicate": []}
+    for s in submissions:
+        for a in s.answers:
+            seen = set()
+            for r in a.references:
+                known = r.pdf_sha1 in pages
+                expected["unknown_sha1"].append(not known)
+                expected["out_of_range"].append(known and not 0 <= r.page_index < pages[r.pdf_sha1])
+                expected["duplicate"].append((r.pdf_sha1, r.page_index) in seen)
+                seen.add((r.pdf_sha1, r.page_index))
+
+    problems = validate_refs.check(validate_refs.flatten(submissions), pages)
+    assert {k: v.tolist() for k, v in problems.items()} == expected
+    assert all(any(v) for v in expected.values())
+
+
+def test_summary_and_issues(submissions, pages):
+    refs = validate_refs.flatten(submissions)
+    problems = validate_refs.check(refs, pages)
+    frame = validate_refs.summary(submissions, refs, problems)
+
+    assert frame["refs"].tolist() == [sum(len(a.references) for a in s.answers) for s in submissions]
+    assert frame["unique"].tolist() == [sum(len(set((r.pdf_sha1, r.page_index) for r in a.references))
+                                            for a in s.answers) for s in submissions]
+    assert (frame["unique"] + frame["duplicate"]).tolist() == frame["refs"].tolist()
+
+    details = validate_refs.issues(submissions, refs, problems)
+    assert details["problem"].value_counts().to_dict() == {k: int(np.sum(v)) for k, v in problems.items() if v.any()}
@@ -0,0 +1,161 @@
+"""
+Checks the references of all submissions before scoring.
+
+Every SourceReference of every submission is flattened into one set of arrays
+and checked at once against a sha1 -> page count table of the subset:
+pdf_sha1 not in the subset, page_index outside the PDF, and the same
+reference repeated within one answer. Scoring is left as it is; duplicate
+strays still count each time there.
+
+    python validate_refs.py                   # page counts from dataset.json
+    python validate_refs.py --source store    # page counts from the page store
+"""
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import click
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+import rank
+from profiling import profiler, profiled
+
+SUMMARY_FILE = rank.DIR / "reference_report.csv"
+ISSUES_FILE = rank.DIR / "reference_issues.csv"
+
+
+def page_table(source: str = "dataset", subset: Path = rank.DIR / "subset.json") -> Dict[str, int]:
+    """
+    Page count of every PDF in the subset.
+    """
+    sha1s = [r["sha1"] for r in json.loads(subset.read_text())]
+    if source == "dataset":
+        import main
+        counts = {e.sha1: e.pages for e in main.load_dataset().values()}
+    else:
+        from pages import PageStore
+        store = PageStore()
+        counts = {sha1: store.pages(sha1) for sha1 in store.docs}
+
+    missing = [s for s in sha1s if s not in counts]
+    if missing:
+        raise click.ClickException(f"No page count for {len(missing)} subset PDFs in the {source}, e.g. {missing[0]}")
+    return {s: counts[s] for s in sha1s}
+
+
+@dataclass
+class FlatRefs:
+    submission: np.ndarray  # index into the submission list
+    answer: np.ndarray  # index into the submission's answers
+    sha1: np.ndarray  # code into sha1s
+    page: np.ndarray
+    sha1s: np.ndarray
+
+
+def flatten(submissions: List[rank.AnswerSubmission]) -> FlatRefs:
+    sub, answer, sha1, page = [], [], [], []
+    for i, s in enumerate(submissions):
+        for j, a in enumerate(s.answers):
+            for r in a.references:
+                sub.append(i)
+                answer.append(j)
+                sha1.append(r.pdf_sha1)
+                page.append(r.page_index)
+    codes, uniques = pd.factorize(pd.Series(sha1, dtype=object))
+    return FlatRefs(
+        submission=np.array(sub, dtype=np.int64),
+        answer=np.array(answer, dtype=np.int64),
+        sha1=codes.astype(np.int64),
+        page=np.array(page, dtype=np.int64),
+        sha1s=np.asarray(uniques, dtype=object),
+    )
+
+
+def check(refs: FlatRefs, pages: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """
+    One boolean mask per problem, aligned with the flattened references.
+    """
+    counts = np.array([pages.get(s, -1) for s in refs.sha1s], dtype=np.int64)[refs.sha1]
+    unknown = counts < 0
+    out_of_range = ~unknown & ((refs.page < 0) | (refs.page >= counts))
+    keys = pd.DataFrame({"s": refs.submission, "a": refs.answer, "h": refs.sha1, "p": refs.page})
+    duplicate = keys.duplicated().to_numpy()
+    return {"unknown_sha1": unknown, "out_of_range": out_of_range, "duplicate": duplicate}
+
+
+def summary(submissions: List[rank.AnswerSubmission], refs: FlatRefs, problems: Dict[str, np.ndarray]) -> pd.DataFrame:
+    n = len(submissions)
+    frame = pd.DataFrame({
+        "file": [s.file_name for s in submissions],
+        "team": [s.submission_name.replace("\n", " ") for s in submissions],
+        "signature": [s.signature[:8] for s in submissions],
+        "refs": np.bincount(refs.submission, minlength=n),
+    })
+    # what remains after collapsing duplicates
+    frame["unique"] = np.bincount(refs.submission, weights=~problems["duplicate"], minlength=n).astype(np.int64)
+    for name, mask in problems.items():
+        frame[name] = np.bincount(refs.submission, weights=mask, minlength=n).astype(np.int64)
+    return frame
+
+
+def issues(submissions: List[rank.AnswerSubmission], refs: FlatRefs, problems: Dict[str, np.ndarray]) -> pd.DataFrame:
+    # one row per flagged reference and problem
+    frames = []
+    for name, mask in problems.items():
+        idx = np.flatnonzero(mask)
+        frames.append(pd.DataFrame({
+            "file": [submissions[i].file_name for i in refs.submission[idx]],
+            "question": [submissions[i].answers[j].question_text for i, j in zip(refs.submission[idx],
+                                                                                 refs.answer[idx])],
+            "ref": [f"{h}:{p}" for h, p in zip(refs.sha1s[refs.sha1[idx]], refs.page[idx])],
+            "problem": name,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@click.command()
+@click.option("--source", default="dataset", type=click.Choice(["dataset", "store"]),
+              help="Where page counts come from: dataset.json or the page store")
+@click.option("--workers", default=0, help="Processes used to load submissions (0 = all cores)")
+@click.option("--top", default=20, help="Submissions with the most problems to print")
+@profiled
+def cli(source: str = "dataset", workers: int = 0, top: int = 20):
+    if profiler.enabled:
+        # phases are only recorded in this process
+        workers = 1
+
+    pages = page_table(source)
+    submissions = list(rank.iter_submissions(workers))
+
+    with profiler.phase("flatten refs"):
+        refs = flatten(submissions)
+    with profiler.phase("check refs"):
+        problems = check(refs, pages)
+    with profiler.phase("report refs"):
+        frame = summary(submissions, refs, problems)
+        details = issues(submissions, refs, problems)
+
+    frame.to_csv(SUMMARY_FILE, index=False)
+    details.to_csv(ISSUES_FILE, index=False)
+
+    flagged = frame[(frame[list(problems)] > 0).any(axis=1)]
+    flagged = flagged.sort_values(list(problems), ascending=False, kind="stable")
+    table = Table(title=f"{len(flagged)} of {len(frame)} submissions with reference problems")
+    for column in ["team", "signature", "refs", "unique", *problems]:
+        table.add_column(column, justify="left" if column in ("team", "signature") else "right")
+    for row in flagged.head(top).itertuples(index=False):
+        table.add_row(row.team, row.signature, *[str(getattr(row, c)) for c in ["refs", "unique", *problems]])
+    Console(width=120).print(table)
+
+    totals = ", ".join(f"{int(mask.sum())} {name}" for name, mask in problems.items())
+    print(f"{len(refs.page)} references: {totals}. Written to {SUMMARY_FILE.name} and {ISSUES_FILE.name}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cli()